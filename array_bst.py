@@ -0,0 +1,575 @@
+""" Array-backed Binary Search Tree ADT for numeric keys.
+    Stores keys, items, child links, heights and subtree sizes in parallel
+    arrays instead of one linked node per key. Slot 0 is a sentinel standing
+    for the empty tree, and deleted slots are recycled through a free list.
+    The tree is kept AVL-balanced, so every operation is O(log n).
+"""
+
+from __future__ import annotations
+
+__docformat__ = 'reStructuredText'
+
+from array import array
+from typing import Generic, Iterable, Iterator, TypeVar
+from bst import (check_orderable, count_pairs, delete_batch, insert_batch, ratio_bounds,
+                 rebuild_beats_walks, sorted_entries)
+
+# generic types
+K = TypeVar('K')
+I = TypeVar('I')
+
+# index of the sentinel slot, used wherever a linked tree would use None
+NIL = 0
+
+
+def typecode_accepts(typecode: str, key) -> bool:
+    """
+        Checks whether key can be stored exactly in an array of typecode,
+        'q' for 64-bit ints or 'd' for floats (and ints within 2**53).
+        :raises ValueError: when key is a NaN, which no sorted store can hold
+        :complexity: O(1)
+    """
+    if typecode == 'q':
+        return type(key) is int and -2 ** 63 <= key < 2 ** 63
+    if type(key) is float:
+        check_orderable(key)
+        return True
+    return type(key) is int and -2 ** 53 <= key <= 2 ** 53
+
+
+class ArrayBinarySearchTree(Generic[I]):
+    """ AVL-balanced binary search tree whose int or float keys live in an array. """
+
+    TYPECODES = ('q', 'd')
+
+    def __init__(self, typecode: str = 'd', multiset: bool = False) -> None:
+        """
+            Initialises an empty tree.
+            :param typecode: 'q' for 64-bit int keys or 'd' for float keys
+            :param multiset: whether inserting an existing key adds one more
+                copy of it instead of raising ValueError
+            :complexity: O(1)
+        """
+        if typecode not in self.TYPECODES:
+            raise ValueError('Unsupported key typecode: {0}'.format(typecode))
+        self.typecode = typecode
+        self.keys = array(typecode, [0])
+        # 1 where an int key was widened to fit a float array, so it is handed back as an int
+        self.int_keys = array('b', [0])
+        self.items = [None]
+        self.left = array('l', [NIL])
+        self.right = array('l', [NIL])
+        self.height = array('l', [0])
+        self.size = array('l', [0])
+        self.count = array('l', [0])
+        self.free = array('l')
+        self.root = NIL
+        self.length = 0
+        self.multiset = multiset
+
+    @classmethod
+    def from_items(cls, items: Iterable[tuple[K, I]], presorted: bool = False,
+                   typecode: str = 'd', multiset: bool = False) -> ArrayBinarySearchTree[I]:
+        """
+        Bulk-load a perfectly balanced tree from (key, item) pairs.
+
+        - Args:
+            - items: the (key, item) pairs to be stored
+            - presorted: whether items are already in increasing key order
+            - typecode: 'q' for int keys or 'd' for float keys
+            - multiset: whether repeated keys are kept as copies, holding the first item
+        - Returns:
+            - ArrayBinarySearchTree: a new tree holding every pair
+        - Raises:
+            - ValueError: when two pairs share a key outside a multiset, or presorted items are out of order
+        - Complexity:
+            O(n) if presorted, otherwise O(n log n) where n is the number of pairs
+        """
+        return cls.from_counts(count_pairs(items, presorted, multiset), presorted=True,
+                               typecode=typecode, multiset=multiset)
+
+    @classmethod
+    def from_counts(cls, entries: Iterable[tuple[K, I, int]], presorted: bool = False,
+                    typecode: str = 'd', multiset: bool = True) -> ArrayBinarySearchTree[I]:
+        """
+        Bulk-load a perfectly balanced tree from (key, item, count) entries.
+
+        - Args:
+            - entries: the (key, item, count) entries to be stored, with distinct keys
+            - presorted: whether entries are already in strictly increasing key order
+            - typecode: 'q' for int keys or 'd' for float keys
+            - multiset: whether the new tree accepts repeated keys
+        - Returns:
+            - ArrayBinarySearchTree: a new tree holding every entry
+        - Raises:
+            - ValueError: when two entries share a key, or presorted entries are out of order
+        - Complexity:
+            O(n) if presorted, otherwise O(n log n) where n is the number of entries
+        """
+        tree = cls(typecode, multiset)
+        tree.rebuild(sorted_entries(entries, presorted))
+        return tree
+
+    def rebuild(self, entries: list[tuple[K, I, int]]) -> None:
+        """
+            Replaces the whole tree with a balanced one holding entries, which
+            must be in strictly increasing key order. The free list is emptied.
+            :complexity: O(n) where n is the number of entries
+        """
+        n = len(entries)
+        # slot i + 1 holds entries[i], so the arrays come out in key order
+        self.keys = array(self.typecode, [0])
+        self.keys.extend(entry[0] for entry in entries)
+        self.int_keys = array('b', [0])
+        self.int_keys.extend(self.widens(entry[0]) for entry in entries)
+        self.items = [None]
+        self.items.extend(entry[1] for entry in entries)
+        self.count = array('l', [0])
+        self.count.extend(entry[2] for entry in entries)
+        self.left = array('l', [NIL] * (n + 1))
+        self.right = array('l', [NIL] * (n + 1))
+        self.height = array('l', [0] * (n + 1))
+        self.size = array('l', [0] * (n + 1))
+        self.free = array('l')
+        self.root = self.build_balanced(1, n + 1)
+        self.length = self.size[self.root]
+
+    def build_balanced(self, lo: int, hi: int) -> int:
+        """
+            Links slots lo..hi-1, which hold sorted keys, into a balanced subtree.
+            :complexity: O(hi - lo), with recursion depth O(log(hi - lo))
+        """
+        if lo >= hi:
+            return NIL
+        mid = (lo + hi) // 2
+        self.left[mid] = self.build_balanced(lo, mid)
+        self.right[mid] = self.build_balanced(mid + 1, hi)
+        self.update(mid)
+        return mid
+
+    def accepts(self, key) -> bool:
+        """
+            Checks whether key can be stored exactly in this tree's key array.
+            :complexity: O(1)
+        """
+        return typecode_accepts(self.typecode, key)
+
+    def widens(self, key: K) -> bool:
+        """
+            Checks whether key is an int that this tree's key array holds as a float.
+            :complexity: O(1)
+        """
+        return self.typecode == 'd' and type(key) is int
+
+    def key_at(self, slot: int) -> K:
+        """
+            Returns the key in slot as it was given, an int even in a float array.
+            :complexity: O(1)
+        """
+        key = self.keys[slot]
+        return int(key) if self.int_keys[slot] else key
+
+    def is_empty(self) -> bool:
+        """
+            Checks to see if the tree is empty
+            :complexity: O(1)
+        """
+        return self.root == NIL
+
+    def __len__(self) -> int:
+        """ Returns the number of keys in the tree. """
+
+        return self.length
+
+    def __contains__(self, key: K) -> bool:
+        """
+            Checks to see if the key is in the tree
+            :complexity: O(log n)
+        """
+        return self.get_slot_by_key(key) != NIL
+
+    def __getitem__(self, key: K) -> I:
+        """
+            Attempts to get an item in the tree, it uses the Key to attempt to find it
+            :complexity: O(log n)
+        """
+        slot = self.get_slot_by_key(key)
+        if slot == NIL:
+            raise KeyError('Key not found: {0}'.format(key))
+        return self.items[slot]
+
+    def get_slot_by_key(self, key: K) -> int:
+        """
+            Returns the slot holding key, or NIL if there is none.
+            :complexity: O(log n)
+        """
+        keys, left, right = self.keys, self.left, self.right
+        current = self.root
+        while current != NIL:
+            current_key = keys[current]
+            if key == current_key:
+                return current
+            current = left[current] if key < current_key else right[current]
+        return NIL
+
+    def new_slot(self, key: K, item: I) -> int:
+        """
+            Takes a slot off the free list, or appends one, and fills it in.
+            :complexity: O(1) amortised
+        """
+        if self.free:
+            slot = self.free.pop()
+            self.keys[slot] = key
+            self.int_keys[slot] = self.widens(key)
+            self.items[slot] = item
+            self.left[slot] = self.right[slot] = NIL
+        else:
+            slot = len(self.items)
+            self.keys.append(key)
+            self.int_keys.append(self.widens(key))
+            self.items.append(item)
+            self.left.append(NIL)
+            self.right.append(NIL)
+            self.height.append(0)
+            self.size.append(0)
+            self.count.append(0)
+        self.height[slot] = 1
+        self.size[slot] = 1
+        self.count[slot] = 1
+        return slot
+
+    def update(self, slot: int) -> None:
+        """
+            Recompute the height and subtree size of slot from its children,
+            where every copy of a key counts towards the size.
+            :complexity: O(1)
+        """
+        l, r = self.left[slot], self.right[slot]
+        self.height[slot] = 1 + max(self.height[l], self.height[r])
+        self.size[slot] = self.count[slot] + self.size[l] + self.size[r]
+
+    def rotate_left(self, slot: int) -> int:
+        """
+            Left rotation around slot, returning the new subtree root.
+            :complexity: O(1)
+        """
+        new_root = self.right[slot]
+        self.right[slot] = self.left[new_root]
+        self.left[new_root] = slot
+        self.update(slot)
+        self.update(new_root)
+        return new_root
+
+    def rotate_right(self, slot: int) -> int:
+        """
+            Right rotation around slot, returning the new subtree root.
+            :complexity: O(1)
+        """
+        new_root = self.left[slot]
+        self.left[slot] = self.right[new_root]
+        self.right[new_root] = slot
+        self.update(slot)
+        self.update(new_root)
+        return new_root
+
+    def rebalance(self, slot: int) -> int:
+        """
+            Restore the AVL property at slot, returning the new subtree root.
+            :complexity: O(1)
+        """
+        self.update(slot)
+        height, left, right = self.height, self.left, self.right
+        balance = height[left[slot]] - height[right[slot]]
+        if balance > 1:
+            l = left[slot]
+            if height[left[l]] < height[right[l]]:
+                left[slot] = self.rotate_left(l)
+            return self.rotate_right(slot)
+        if balance < -1:
+            r = right[slot]
+            if height[right[r]] < height[left[r]]:
+                right[slot] = self.rotate_right(r)
+            return self.rotate_left(slot)
+        return slot
+
+    def retrace(self, path: list[int]) -> None:
+        """
+            Rebalance every slot on path (root first) from the bottom up,
+            relinking each new subtree root into its parent.
+            :complexity: O(len(path))
+        """
+        for i in range(len(path) - 1, -1, -1):
+            slot = path[i]
+            new_slot = self.rebalance(slot)
+            if new_slot != slot:
+                if i == 0:
+                    self.root = new_slot
+                elif self.left[path[i - 1]] == slot:
+                    self.left[path[i - 1]] = new_slot
+                else:
+                    self.right[path[i - 1]] = new_slot
+
+    def __setitem__(self, key: K, item: I) -> None:
+        """
+            Attempts to insert an item into the tree, it uses the Key to insert it
+            :raises ValueError: when the key is already present outside a multiset, or is NaN
+            :complexity: O(log n)
+        """
+        check_orderable(key)
+        keys, left, right = self.keys, self.left, self.right
+        path = []
+        current = self.root
+        while current != NIL:
+            path.append(current)
+            current_key = keys[current]
+            if key == current_key:
+                if not self.multiset:
+                    raise ValueError('Inserting duplicate item')
+                # keep one more copy, so only the sizes on the path change
+                self.count[current] += 1
+                self.length += 1
+                self.retrace(path)
+                return
+            current = left[current] if key < current_key else right[current]
+
+        slot = self.new_slot(key, item)
+        self.length += 1
+        if not path:
+            self.root = slot
+            return
+        parent = path[-1]
+        if key < keys[parent]:
+            left[parent] = slot
+        else:
+            right[parent] = slot
+        self.retrace(path)
+
+    def __delitem__(self, key: K) -> None:
+        """
+            Attempts to delete an item from the tree, it uses the Key to
+            determine the slot to delete, and returns that slot to the free list.
+            :raises ValueError: when the key is not present
+            :complexity: O(log n)
+        """
+        keys, left, right = self.keys, self.left, self.right
+        path = []
+        target = self.root
+        while target != NIL and key != keys[target]:
+            path.append(target)
+            target = left[target] if key < keys[target] else right[target]
+        if target == NIL:  # key not found
+            raise ValueError('Deleting non-existent item')
+
+        self.length -= 1
+        if self.count[target] > 1:  # drop one copy, the slot stays
+            self.count[target] -= 1
+            path.append(target)
+            self.retrace(path)
+            return
+
+        if left[target] != NIL and right[target] != NIL:
+            # general case => move the successor up and unlink the successor instead
+            path.append(target)
+            succ = right[target]
+            while left[succ] != NIL:
+                path.append(succ)
+                succ = left[succ]
+            keys[target] = keys[succ]
+            self.int_keys[target] = self.int_keys[succ]
+            self.items[target] = self.items[succ]
+            self.count[target] = self.count[succ]
+            target = succ
+
+        replacement = left[target] if left[target] != NIL else right[target]
+        if not path:
+            self.root = replacement
+        elif left[path[-1]] == target:
+            left[path[-1]] = replacement
+        else:
+            right[path[-1]] = replacement
+        self.items[target] = None
+        self.free.append(target)
+        self.retrace(path)
+
+    def rebuild_is_cheaper(self, batch_size: int) -> bool:
+        """
+            Whether rebuilding beats one root-to-leaf walk per key, i.e. batch_size * log2(n) >= n.
+            :complexity: O(1)
+        """
+        return rebuild_beats_walks(self.length, batch_size)
+
+    def insert_many(self, items: Iterable[tuple[K, I]]) -> None:
+        """
+            Inserts a batch of (key, item) pairs, sorted once. A batch that is large
+            relative to the tree is merged with the tree's sorted entries and the
+            tree is rebuilt in one pass; a small one is inserted key by key.
+            :raises ValueError: when a key is already present outside a multiset, or is NaN
+            :complexity: O(b log b + min(b log n, n + b)) where b is the batch size
+        """
+        insert_batch(self, items)
+
+    def delete_many(self, keys: Iterable[K]) -> None:
+        """
+            Deletes one copy of every key in a batch, sorted once. A batch that is
+            large relative to the tree is applied to the tree's sorted entries and
+            the tree is rebuilt in one pass; a small one is deleted key by key.
+            :raises ValueError: when a key is not present, in which case nothing is deleted
+            :complexity: O(b log b + min(b log n, n + b)) where b is the batch size
+        """
+        delete_batch(self, keys)
+
+    def kth_smallest(self, k: int, current: int = None) -> int:
+        """
+        Finds the slot of the kth smallest key in the subtree rooted at current.
+
+        - Args:
+            - int: k, counting from 1
+            - int: slot of the subtree root, defaults to the whole tree
+        - Returns:
+            - int: the slot of the kth smallest key, or NIL if there is none
+        - Raises:
+            -None
+        - Complexity:
+            O(log n)
+        """
+        left, right, size, count = self.left, self.right, self.size, self.count
+        if current is None:
+            current = self.root
+        if k < 1:
+            return NIL
+        while current != NIL:
+            left_size = size[left[current]]
+            if k <= left_size:
+                current = left[current]
+            elif k <= left_size + count[current]:
+                return current
+            else:
+                k -= left_size + count[current]
+                current = right[current]
+        return NIL
+
+    def select(self, k: int) -> K:
+        """
+            Returns the kth smallest key, counting from 1.
+            :raises IndexError: when k is not between 1 and len(self)
+            :complexity: O(log n)
+        """
+        if not 1 <= k <= self.length:
+            raise IndexError('Rank out of range: {0}'.format(k))
+        return self.key_at(self.kth_smallest(k))
+
+    def count_less(self, key: K, inclusive: bool = False) -> int:
+        """
+            Counts the keys smaller than key (or equal to it when inclusive).
+            :complexity: O(log n)
+        """
+        keys, left, right, size = self.keys, self.left, self.right, self.size
+        count = 0
+        current = self.root
+        while current != NIL:
+            current_key = keys[current]
+            if key < current_key or (key == current_key and not inclusive):
+                current = left[current]
+            else:  # current and its whole left subtree are counted
+                count += size[left[current]] + self.count[current]
+                current = right[current]
+        return count
+
+    def rank(self, key: K) -> int:
+        """
+            Finds the position of the first copy of key in sorted order, counting from 1.
+            :raises KeyError: when key is not in the tree
+            :complexity: O(log n)
+        """
+        if key not in self:
+            raise KeyError('Key not found: {0}'.format(key))
+        return self.count_less(key) + 1
+
+    def count_between(self, lo: K, hi: K) -> int:
+        """
+            Counts the keys with lo <= key <= hi without visiting them.
+            :complexity: O(log n)
+        """
+        if hi < lo:
+            return 0
+        return self.count_less(hi, inclusive=True) - self.count_less(lo)
+
+    def iter_from_rank(self, k: int) -> Iterator[int]:
+        """
+            Yields the slot holding the kth smallest key and every later slot, in key order.
+            :complexity: O(log n) to the first slot, then O(1) amortised per slot
+        """
+        left, right, size, count = self.left, self.right, self.size, self.count
+        # stack of ancestors whose key is still to be yielded
+        stack = []
+        current = self.root
+        while current != NIL:
+            left_size = size[left[current]]
+            if k <= left_size:
+                stack.append(current)
+                current = left[current]
+            elif k <= left_size + count[current]:
+                stack.append(current)
+                break
+            else:
+                k -= left_size + count[current]
+                current = right[current]
+        while stack:
+            current = stack.pop()
+            yield current
+            current = right[current]
+            while current != NIL:
+                stack.append(current)
+                current = left[current]
+
+    def __iter__(self) -> Iterator[K]:
+        """ Yields every key in increasing order. """
+
+        key_at = self.key_at
+        for slot in self.iter_from_rank(1):
+            yield key_at(slot)
+
+    def iter_items(self) -> Iterator[tuple[K, I]]:
+        """ Yields every (key, item) pair in increasing key order, once per distinct key. """
+
+        key_at, items = self.key_at, self.items
+        for slot in self.iter_from_rank(1):
+            yield key_at(slot), items[slot]
+
+    def iter_counts(self) -> Iterator[tuple[K, I, int]]:
+        """ Yields every (key, item, count) entry in increasing key order. """
+
+        key_at, items, count = self.key_at, self.items, self.count
+        for slot in self.iter_from_rank(1):
+            yield key_at(slot), items[slot], count[slot]
+
+    def ratio(self, x: float, y: float) -> list[K]:
+        """
+        Function returns the keys above the smallest x% and below the largest y%.
+
+        - Args:
+            - float: the keys have to be greater than x% amongst them
+            - float: the keys have to be less than y% amongst them
+        - Returns:
+            - list: keys within the ratio, in increasing order
+        - Raises:
+            -None
+        - Complexity:
+            O(log n + O) where n is the number of keys and O is the length of return list
+        """
+        lb, ub = ratio_bounds(x, y, self.length)
+        result = []
+        if lb > ub:
+            return result
+        key_at, count = self.key_at, self.count
+        remaining = ub - lb + 1
+        # copies of the first key that rank below lb
+        skip = lb - 1 - self.count_less(self.keys[self.kth_smallest(lb)])
+        for slot in self.iter_from_rank(lb):
+            take = min(count[slot] - skip, remaining)
+            result.extend([key_at(slot)] * take)
+            remaining -= take
+            skip = 0
+            if remaining == 0:
+                break
+        return result
@@ -0,0 +1,156 @@
+""" AVL Tree ADT.
+    Defines a self-balancing Binary Search Tree with linked nodes.
+    Every insertion and deletion rebalances the path it touched, so the depth
+    of the tree stays O(log n) even when keys arrive in sorted order.
+"""
+
+from __future__ import annotations
+
+__docformat__ = 'reStructuredText'
+
+from typing import TypeVar
+from bst import BinarySearchTree
+from node import AVLTreeNode
+
+# generic types
+K = TypeVar('K')
+I = TypeVar('I')
+
+
+class AVLTree(BinarySearchTree[K, I]):
+    """ Self-balancing binary search tree with the same API as BinarySearchTree. """
+
+    def get_height(self, current: AVLTreeNode) -> int:
+        """
+            Get the height of current, where an empty tree has height 0.
+            :complexity: O(1)
+        """
+        if current is None:
+            return 0
+        return current.height
+
+    def new_node(self, key: K, item: I) -> AVLTreeNode:
+        """
+            Creates a detached AVL node for key and item.
+            :complexity: O(1)
+        """
+        return AVLTreeNode(key, item=item)
+
+    def get_balance(self, current: AVLTreeNode) -> int:
+        """
+            Difference between the heights of the left and right subtrees.
+            :complexity: O(1)
+        """
+        return self.get_height(current.left) - self.get_height(current.right)
+
+    def update(self, current: AVLTreeNode) -> None:
+        """
+            Recompute the height and subtree size of current from its children.
+            :complexity: O(1)
+        """
+        current.height = 1 + max(self.get_height(current.left), self.get_height(current.right))
+        current.subtree_size = current.count + self.get_size(current.left) + self.get_size(current.right)
+
+    def left_rotate(self, current: AVLTreeNode) -> AVLTreeNode:
+        """
+            Perform left rotation around current.
+
+                 current                  r
+                /       \\               /   \\
+               l         r     ==>   current  rr
+                        /  \\        /     \\
+                      rl    rr      l      rl
+
+        - Args:
+            - AVLTreeNode: root of the subtree to be rotated
+        - Returns:
+            - AVLTreeNode: the new root of the subtree
+        - Raises:
+            -None
+        - Complexity:
+            O(1)
+        """
+        new_root = current.right
+        current.right = new_root.left
+        new_root.left = current
+        self.update(current)
+        self.update(new_root)
+        return new_root
+
+    def right_rotate(self, current: AVLTreeNode) -> AVLTreeNode:
+        """
+            Perform right rotation around current.
+
+                   current            l
+                  /       \\         /   \\
+                 l         r  ==>  ll  current
+                / \\                    /     \\
+              ll   lr                 lr      r
+
+        - Args:
+            - AVLTreeNode: root of the subtree to be rotated
+        - Returns:
+            - AVLTreeNode: the new root of the subtree
+        - Raises:
+            -None
+        - Complexity:
+            O(1)
+        """
+        new_root = current.left
+        current.left = new_root.right
+        new_root.right = current
+        self.update(current)
+        self.update(new_root)
+        return new_root
+
+    def rebalance(self, current: AVLTreeNode) -> AVLTreeNode:
+        """
+            Restore the AVL property at current, assuming both children are balanced.
+
+        - Args:
+            - AVLTreeNode: root of the subtree to be rebalanced
+        - Returns:
+            - AVLTreeNode: the new root of the subtree
+        - Raises:
+            -None
+        - Complexity:
+            O(1)
+        """
+        self.update(current)
+        balance = self.get_balance(current)
+        if balance > 1:
+            if self.get_balance(current.left) < 0:
+                current.left = self.left_rotate(current.left)
+            return self.right_rotate(current)
+        if balance < -1:
+            if self.get_balance(current.right) > 0:
+                current.right = self.right_rotate(current.right)
+            return self.left_rotate(current)
+        return current
+
+    def retrace(self, path: list[AVLTreeNode], current: AVLTreeNode) -> AVLTreeNode:
+        """
+            Rebalance every node on path from the bottom up, relinking each new
+            subtree root into its parent.
+
+        - Args:
+            - list[AVLTreeNode]: nodes from current down to the modified position
+            - AVLTreeNode: root of the whole subtree
+        - Returns:
+            - AVLTreeNode: the new root of the subtree
+        - Raises:
+            -None
+        - Complexity:
+            O(len(path))
+        """
+        for i in range(len(path) - 1, -1, -1):
+            node = path[i]
+            new_node = self.rebalance(node)
+            if new_node is not node:
+                if i == 0:
+                    current = new_node
+                elif path[i - 1].left is node:
+                    path[i - 1].left = new_node
+                else:
+                    path[i - 1].right = new_node
+        return current
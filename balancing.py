@@ -67,16 +67,10 @@ def get_root(copy: list[Point]) -> Point:
     :complexity: O(N*logN) where N is the length of list
     """
     # n log n
-    # Create percentiles for using ratio
-    p = Percentiles()
-    py = Percentiles()
-    pz = Percentiles()
-
-    # Add all point into percentiles
-    for i in copy:
-        p.add_point(i)
-        py.add_point(i[1])
-        pz.add_point(i[2])
+    # Create percentiles for using ratio, bulk-loading all points at once
+    p = Percentiles.from_points(copy)
+    py = Percentiles.from_points(i[1] for i in copy)
+    pz = Percentiles.from_points(i[2] for i in copy)
 
     # Find the "median" point of whole list
     lst = p.ratio(12.5, 12.5)
@@ -1,5 +1,8 @@
-from dataclasses import dataclass
-from heap import MaxHeap
+from dataclasses import dataclass, field
+from heapq import heappop, heappush
+from itertools import count
+from heap import IndexedMaxHeap
+from threedeebeetree import MaxBeeTree, Point
 
 @dataclass
 class Beehive:
@@ -21,26 +24,69 @@ class Beehive:
         self.nutrient_factor = nutrient_factor
         self.volume = volume
 
+    def priority(self):
+        """
+        Emeralds the next harvest of this hive would yield
+        Complexity: O(1)
+        """
+        return min(self.capacity, self.volume)*self.nutrient_factor
+
     def __le__(self, other):
         """
         Comparison function less or equal
         Complexity: O(1)
         """
-        return min(self.capacity, self.volume)*self.nutrient_factor <= min(other.capacity, other.volume)*other.nutrient_factor
+        return self.priority() <= other.priority()
 
     def __gt__(self, other):
         """
         Comparison function greater
         Complexity: O(1)
         """
-        return min(self.capacity, self.volume)*self.nutrient_factor > min(other.capacity, other.volume)*other.nutrient_factor
+        return self.priority() > other.priority()
+
+
+@dataclass
+class HarvestStep:
+    """Consecutive harvests of one hive within a plan."""
+
+    hive: Beehive
+    harvests: int
+    emeralds: int
+
+
+@dataclass
+class HarvestPlan:
+    """The outcome of a number of harvest rounds, grouped into runs of the same hive."""
+
+    total: int = 0
+    schedule: list[HarvestStep] = field(default_factory=list)
 
 
 class BeehiveSelector:
+    """
+    Picks the beehive yielding the most emeralds. Only productive hives are
+    kept in the heap: a hive whose priority drops to zero is parked outside
+    it, and comes back when update_beehive sees it replenished. Once the heap
+    is empty, a harvest still picks a parked hive that holds something (one
+    with a zero nutrient factor), draining it for 0 emeralds.
+    """
 
-    def __init__(self, max_beehives: int):
+    def __init__(self, max_beehives: int = 0):
+        """
+        :param max_beehives: how many hives to make room for up front; more
+            can be added later, the heap grows as needed
+        """
         self.capacity = max_beehives
-        self.store = MaxHeap(max_beehives)
+        self.store = IndexedMaxHeap(max_beehives, key=Beehive.priority)
+        # id(hive) -> hive, for stored hives with nothing left to harvest
+        self.parked = {}
+        # the parked hives a harvest would still take volume from
+        self.draining = {}
+
+    def __len__(self):
+        """ Number of hives stored, parked ones included. """
+        return len(self.store) + len(self.parked)
 
     def set_all_beehives(self, hive_list: list[Beehive]):
         """
@@ -55,12 +101,17 @@ class BeehiveSelector:
         - Complexity:
             O(n) where n is the length of given list of beehive
         """
-        self.store = MaxHeap(self.capacity)
-        self.store.heapify(hive_list) # O(n)
+        productive = [hive for hive in hive_list if hive.priority() != 0]
+        self.parked, self.draining = {}, {}
+        for hive in hive_list:
+            if hive.priority() == 0:
+                self.park(hive)
+        self.store = IndexedMaxHeap(max(self.capacity, len(productive)), key=Beehive.priority)
+        self.store.heapify(productive) # O(n)
 
     def add_beehive(self, hive: Beehive):
         """
-        Add given beehive into storage
+        Add given beehive into storage, parking it if it has nothing to harvest
 
         - Args:
             - Beehive: beehive to be stored
@@ -69,10 +120,68 @@ class BeehiveSelector:
         - Raises:
             -None
         - Complexity:
-            O(log n) where n is the current length of self.store
+            O(log n) amortised where n is the current length of self.store
+        """
+        if hive.priority() == 0:
+            self.park(hive)
+        else:
+            self.store.add(hive)  # O(log n) :)
+
+    def park(self, hive: Beehive):
         """
-        self.store.add(hive)  # O(log n) :)
-    
+        Files a hive with priority zero among the parked ones, noting whether a
+        harvest would still drain it. O(1)
+        """
+        self.parked[id(hive)] = hive
+        if min(hive.capacity, hive.volume) > 0:
+            self.draining[id(hive)] = hive
+        else:
+            self.draining.pop(id(hive), None)
+
+    def update_beehive(self, hive: Beehive):
+        """
+        Re-rank a stored beehive after its volume, capacity or nutrient factor
+        changed, parking it once empty and bringing it back once replenished
+
+        - Args:
+            - Beehive: the stored beehive that changed
+        - Returns:
+            - None
+        - Raises:
+            - KeyError: when hive is not stored
+        - Complexity:
+            O(log n) amortised where n is the current length of self.store
+        """
+        if id(hive) in self.parked:
+            if hive.priority() != 0:
+                del self.parked[id(hive)]
+                self.draining.pop(id(hive), None)
+                self.store.add(hive)
+            else:
+                self.park(hive)
+        elif hive.priority() == 0:
+            self.store.remove(hive)
+            self.park(hive)
+        else:
+            self.store.update(hive)
+
+    def remove_beehive(self, hive: Beehive):
+        """
+        Remove a stored beehive
+
+        - Args:
+            - Beehive: the beehive to be removed
+        - Returns:
+            - None
+        - Raises:
+            - KeyError: when hive is not stored
+        - Complexity:
+            O(log n) amortised where n is the current length of self.store
+        """
+        if self.parked.pop(id(hive), None) is None:
+            self.store.remove(hive)
+        self.draining.pop(id(hive), None)
+
     def harvest_best_beehive(self):
         """
         Returns the value can be harvested.
@@ -80,14 +189,267 @@ class BeehiveSelector:
         - Args:
             - None
         - Returns:
-            - int: the total value harvested
+            - int: the total value harvested, 0 when every hive is empty
         - Raises:
-            -None
+            - IndexError: when no hive is stored
         - Complexity:
-            O(n log n) where n is the current length of self.store
+            O(log n) where n is the current length of self.store
         """
-        best: Beehive = self.store.get_max() # O(log n) :)
-        value = min(best.capacity, best.volume)
-        best.volume -= value
-        self.store.add(best) # O(log n) :)
-        return value * best.nutrient_factor
+        return self.harvest_many(1)[0]
+
+    def harvest_many(self, k: int) -> list[int]:
+        """
+        Harvests k times, as k calls to harvest_best_beehive would. The best hive
+        is harvested again for as long as it stays ahead of the runner-up, and
+        only sifted once it falls behind, so a run of harvests from one hive
+        costs one sink instead of one per harvest.
+
+        - Args:
+            - int: number of harvests
+        - Returns:
+            - list[int]: the value of every harvest, in order
+        - Raises:
+            - IndexError: when no hive is stored
+        - Complexity:
+            O(k + r log n) where r is the number of times the best hive changes
+            and n is the current length of self.store
+        """
+        if len(self) == 0:
+            raise IndexError('No beehive stored')
+        values = []
+        while len(values) < k:
+            if len(self.store) == 0:  # no hive yields anything
+                if not self.draining:  # and none holds anything
+                    values.extend([0] * (k - len(values)))
+                    break
+                # drain a hive with a zero nutrient factor, as picking it from the heap would
+                hive = next(iter(self.draining.values()))
+                hive.volume -= min(hive.capacity, hive.volume)
+                values.append(0)
+                self.update_beehive(hive)
+                continue
+            best: Beehive = self.store.peek_max() # O(1)
+            runner_up = self.store.runner_up_key()
+            while len(values) < k:
+                value = min(best.capacity, best.volume)
+                best.volume -= value
+                values.append(value * best.nutrient_factor)
+                priority = best.priority()
+                # a tie keeps the top in place, just as sink would
+                if priority == 0 or (runner_up is not None and priority < runner_up):
+                    break
+            self.update_beehive(best) # one sink, O(log n)
+        return values
+
+    def plan_harvest(self, rounds: int, apply: bool = False) -> HarvestPlan:
+        """
+        Works out what rounds calls to harvest_best_beehive would yield without
+        running them. A hive holding at least its capacity keeps the same
+        priority, so all its full harvests while it is the best form one step;
+        the step ends when the remainder drops it behind the runner-up.
+        The heap is only read: it is explored lazily from the top, with the
+        hives already harvested pushed back at their new priority. Ties
+        between equal priorities may be broken differently from the heap, so
+        the plan can harvest a different one of two equally good hives; the
+        total is the same either way.
+
+        - Args:
+            - int: number of harvest rounds
+            - bool: whether to carry the plan out, leaving every hive as the plan
+              harvested it and the heap ordered accordingly. This matches the
+              rounds exactly when no two hives tie on priority along the way
+        - Returns:
+            - HarvestPlan: the total emeralds and the harvest steps in order. Once
+              no hive yields anything, the rounds drain the parked hives with a zero
+              nutrient factor, listed with 0 emeralds; rounds left once every hive
+              is empty yield nothing and are not listed
+        - Raises:
+            - IndexError: when no hive is stored
+        - Complexity:
+            O(c log c + d) where c is the number of steps and d the number of
+            parked hives still holding something, plus O(c log n) when applied,
+            where n is the current length of self.store
+        """
+        if len(self) == 0:
+            raise IndexError('No beehive stored')
+        heap = self.store
+        plan = HarvestPlan()
+        tiebreak = count()
+        # (-priority, tiebreak, heap slot or 0, hive or None); a slot stands for
+        # an untouched hive, whose children in the heap are explored after it
+        frontier = []
+        if len(heap) > 0:
+            heappush(frontier, (-heap.keys[1], next(tiebreak), 1, None))
+        touched = {}
+        volumes = {}
+        left = rounds
+        while left > 0 and frontier:
+            _, _, k, hive = heappop(frontier)
+            if hive is None:
+                hive = heap.the_array[k]
+                for child in (2 * k, 2 * k + 1):
+                    if child <= len(heap):
+                        heappush(frontier, (-heap.keys[child], next(tiebreak), child, None))
+            runner_up = -frontier[0][0] if frontier else None
+            volume = volumes.get(id(hive), hive.volume)
+
+            # full harvests, each at the unchanged priority capacity * nutrient_factor
+            harvests = min(volume // hive.capacity, left)
+            emeralds = harvests * hive.capacity * hive.nutrient_factor
+            volume -= harvests * hive.capacity
+            left -= harvests
+            if left > 0 and volume > 0:
+                # the remainder is harvested now if it still leads (a tie keeps
+                # the top, as sink does), otherwise it waits its turn
+                priority = volume * hive.nutrient_factor
+                if runner_up is None or priority >= runner_up:
+                    harvests += 1
+                    emeralds += priority
+                    volume = 0
+                    left -= 1
+                else:
+                    heappush(frontier, (-priority, next(tiebreak), 0, hive))
+
+            touched[id(hive)] = hive
+            volumes[id(hive)] = volume
+            plan.total += emeralds
+            if plan.schedule and plan.schedule[-1].hive is hive:
+                plan.schedule[-1].harvests += harvests
+                plan.schedule[-1].emeralds += emeralds
+            elif harvests:
+                plan.schedule.append(HarvestStep(hive, harvests, emeralds))
+
+        # the hives with a zero nutrient factor never enter the heap, so they come last
+        for hive in self.draining.values():
+            if left == 0:
+                break
+            harvests = min(-(-hive.volume // hive.capacity), left)
+            touched[id(hive)] = hive
+            volumes[id(hive)] = max(0, hive.volume - harvests * hive.capacity)
+            left -= harvests
+            plan.schedule.append(HarvestStep(hive, harvests, 0))
+
+        if apply:
+            for key, hive in touched.items():
+                hive.volume = volumes[key]
+                self.update_beehive(hive)
+        return plan
+
+
+class SpatialBeehiveSelector:
+    """
+    Picks the best beehive within a box or a radius of a point. Hives are
+    indexed by position in a MaxBeeTree that keeps the best priority of every
+    subtree, so a constrained pick skips every subtree that is out of range
+    or cannot beat the best hive found so far, and a harvest only refreshes
+    the path down to the harvested hive.
+    """
+
+    def __init__(self):
+        self.tree = MaxBeeTree(key=Beehive.priority)
+
+    def __len__(self):
+        return len(self.tree)
+
+    @staticmethod
+    def position(hive: Beehive) -> Point:
+        return (hive.x, hive.y, hive.z)
+
+    def set_all_beehives(self, hive_list: list[Beehive]):
+        """
+        Set all beehive into storage
+
+        - Args:
+            - list[Beehive]: a list of beehive to be stored
+        - Returns:
+            - None
+        - Raises:
+            - ValueError: when two hives share a position
+        - Complexity:
+            O(n D) where n is the length of given list of beehive and D the depth of the tree
+        """
+        self.tree = MaxBeeTree(key=Beehive.priority)
+        for hive in hive_list:
+            self.add_beehive(hive)
+
+    def add_beehive(self, hive: Beehive):
+        """
+        Add given beehive into storage
+
+        - Args:
+            - Beehive: beehive to be stored
+        - Returns:
+            - None
+        - Raises:
+            - ValueError: when another hive is already at its position
+        - Complexity:
+            O(D) where D is the depth of the tree
+        """
+        if self.position(hive) in self.tree:
+            raise ValueError('A beehive is already at {0}'.format(self.position(hive)))
+        self.tree[self.position(hive)] = hive
+
+    def update_beehive(self, hive: Beehive):
+        """
+        Re-rank a stored beehive after its volume, capacity or nutrient factor changed
+
+        - Args:
+            - Beehive: the stored beehive that changed
+        - Returns:
+            - None
+        - Raises:
+            - KeyError: when no hive is stored at its position
+        - Complexity:
+            O(D) where D is the depth of the tree
+        """
+        self.tree.update(self.position(hive))
+
+    def best_beehive(self) -> Beehive | None:
+        """ The best hive anywhere, or None when none is stored. O(1) """
+        return self.tree.best()
+
+    def best_in_box(self, lo: Point, hi: Point) -> Beehive | None:
+        """
+        The best hive with lo <= position <= hi on every axis, or None when there is none.
+        Complexity: see MaxBeeTree.best_matching
+        """
+        return self.tree.best_in_box(lo, hi)
+
+    def best_within(self, centre: Point, radius: float) -> Beehive | None:
+        """
+        The best hive at most radius away from centre, or None when there is none.
+        Complexity: see MaxBeeTree.best_matching
+        """
+        return self.tree.best_within(centre, radius)
+
+    def harvest(self, hive: Beehive | None) -> int:
+        """
+        Harvests a stored hive and re-ranks it.
+
+        - Args:
+            - Beehive | None: the hive to harvest, None harvesting nothing
+        - Returns:
+            - int: the value harvested, 0 for None
+        - Raises:
+            - KeyError: when no hive is stored at its position
+        - Complexity:
+            O(D) where D is the depth of the tree
+        """
+        if hive is None:
+            return 0
+        value = min(hive.capacity, hive.volume)
+        hive.volume -= value
+        self.update_beehive(hive)
+        return value * hive.nutrient_factor
+
+    def harvest_best_beehive(self) -> int:
+        """ Harvests the best hive anywhere, returning 0 when none is stored. """
+        return self.harvest(self.best_beehive())
+
+    def harvest_in_box(self, lo: Point, hi: Point) -> int:
+        """ Harvests the best hive in the closed box [lo, hi], returning 0 when there is none. """
+        return self.harvest(self.best_in_box(lo, hi))
+
+    def harvest_within(self, centre: Point, radius: float) -> int:
+        """ Harvests the best hive at most radius away from centre, returning 0 when there is none. """
+        return self.harvest(self.best_within(centre, radius))
@@ -0,0 +1,52 @@
+""" Benchmark of batch ingestion into Percentiles.
+
+    Adds and then removes the same points with the per-point loop and with
+    add_points/remove_points, for a small and a large batch against a tree
+    that already holds n points.
+
+    Usage: python -m benchmarks.bench_batch_ingest [n]
+"""
+from __future__ import annotations
+import random
+import sys
+from time import perf_counter
+
+from ratio import Percentiles
+
+
+def timed(action) -> float:
+    """ Returns the seconds action() took. """
+    start = perf_counter()
+    action()
+    return perf_counter() - start
+
+
+def per_point(p: Percentiles, batch: list) -> tuple[float, float]:
+    def add():
+        for point in batch:
+            p.add_point(point)
+
+    def remove():
+        for point in batch:
+            p.remove_point(point)
+    return timed(add), timed(remove)
+
+
+def batched(p: Percentiles, batch: list) -> tuple[float, float]:
+    return timed(lambda: p.add_points(batch)), timed(lambda: p.remove_points(batch))
+
+
+def main(n: int) -> None:
+    random.seed(2023)
+    base = [random.random() for _ in range(n)]
+    for backend in Percentiles.EXACT_BACKENDS:
+        for size in (max(1, n // 1000), n):
+            batch = [random.random() for _ in range(size)]
+            loop = per_point(Percentiles.from_points(base, backend), batch)
+            bulk = batched(Percentiles.from_points(base, backend), batch)
+            print('{0:5} batch {1:7}: add {2:8.4f}s -> {3:8.4f}s, remove {4:8.4f}s -> {5:8.4f}s'.format(
+                backend, size, loop[0], bulk[0], loop[1], bulk[1]))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,84 @@
+""" Multi-threaded throughput benchmark for ConcurrentPercentiles.
+
+    Writer threads add random points while reader threads ask for ratios, for
+    a fixed number of seconds. Compares ConcurrentPercentiles (reader-writer
+    lock) with a plain Percentiles behind one mutex, and reports the writes
+    and reads completed per second.
+
+    Usage: python -m benchmarks.bench_concurrent [seconds] [writers] [readers]
+"""
+from __future__ import annotations
+import random
+import sys
+import threading
+from time import perf_counter
+
+from ratio import ConcurrentPercentiles, Percentiles
+
+
+class MutexPercentiles:
+    """ Baseline: every call holds one mutex. """
+    def __init__(self, p: Percentiles) -> None:
+        self.p = p
+        self.mutex = threading.Lock()
+
+    def add_point(self, item) -> None:
+        with self.mutex:
+            self.p.add_point(item)
+
+    def ratio(self, x, y) -> list:
+        with self.mutex:
+            return self.p.ratio(x, y)
+
+
+def run(p, seconds: float, writers: int, readers: int) -> tuple[float, float]:
+    """ Returns the writes and reads per second. """
+    stop = threading.Event()
+    done = {'writes': 0, 'reads': 0}
+    tally = threading.Lock()
+
+    def write(seed):
+        rng = random.Random(seed)
+        n = 0
+        while not stop.is_set():
+            p.add_point(rng.random())
+            n += 1
+        with tally:
+            done['writes'] += n
+
+    def read(seed):
+        rng = random.Random(seed)
+        n = 0
+        while not stop.is_set():
+            # distinct arguments, so the ratio cache rarely answers
+            p.ratio(rng.randrange(40), rng.randrange(40))
+            n += 1
+        with tally:
+            done['reads'] += n
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=read, args=(-i,)) for i in range(1, readers + 1)]
+    start = perf_counter()
+    for thread in threads:
+        thread.start()
+    stop.wait(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - start
+    return done['writes'] / elapsed, done['reads'] / elapsed
+
+
+def main(seconds: float, writers: int, readers: int) -> None:
+    random.seed(2023)
+    points = [random.random() for _ in range(10000)]
+    for backend in ('auto', 'tree', 'numpy'):
+        shared = run(ConcurrentPercentiles.from_points(points, backend), seconds, writers, readers)
+        mutex = run(MutexPercentiles(Percentiles.from_points(points, backend)), seconds, writers, readers)
+        print('{0:5} mutex {1:9.0f} writes/s {2:7.0f} reads/s | rwlock {3:9.0f} writes/s {4:7.0f} reads/s'.format(
+            backend, mutex[0], mutex[1], shared[0], shared[1]))
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(float(args[0]) if args else 2.0, int(args[1]) if len(args) > 1 else 4, int(args[2]) if len(args) > 2 else 2)
@@ -0,0 +1,57 @@
+""" Benchmark of key-cached ordering in MaxHeap.
+
+    Harvests from n beehives with the heap comparing Beehive objects (every
+    comparison recomputes both priorities) and with key=Beehive.priority
+    (one priority per add or update), counting priority evaluations.
+
+    Usage: python -m benchmarks.bench_heap_keys [n] [harvests]
+"""
+from __future__ import annotations
+import random
+import sys
+from time import perf_counter
+
+from beehive import Beehive
+from heap import IndexedMaxHeap
+
+
+class CountingBeehive(Beehive):
+    """ Beehive counting how often its priority is computed. """
+    evaluations = 0
+
+    def priority(self):
+        CountingBeehive.evaluations += 1
+        return super().priority()
+
+
+def run(hives: list, harvests: int, key) -> tuple[int, float]:
+    """ Returns the priority evaluations and seconds spent building the heap and harvesting. """
+    CountingBeehive.evaluations = 0
+    start = perf_counter()
+    heap = IndexedMaxHeap(len(hives), key=key)
+    for hive in hives:
+        heap.add(hive)
+    for _ in range(harvests):
+        best = heap.peek_max()
+        best.volume -= min(best.capacity, best.volume)
+        heap.update(best)
+    return CountingBeehive.evaluations, perf_counter() - start
+
+
+def make_hives(n: int) -> list:
+    random.seed(2023)
+    return [CountingBeehive(i, i, i, capacity=random.randrange(1, 50), nutrient_factor=random.randrange(1, 20),
+                            volume=random.randrange(1000)) for i in range(n)]
+
+
+def main(n: int, harvests: int) -> None:
+    compared = run(make_hives(n), harvests, None)
+    keyed = run(make_hives(n), harvests, CountingBeehive.priority)
+    print('compare hives: {0:9} priority evaluations {1:8.3f}s'.format(*compared))
+    print('key=priority:  {0:9} priority evaluations {1:8.3f}s'.format(*keyed))
+    print('reduction:     {0:9.1f}x'.format(compared[0] / keyed[0]))
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 10000, int(args[1]) if len(args) > 1 else 50000)
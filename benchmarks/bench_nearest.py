@@ -0,0 +1,51 @@
+""" Benchmark of k-nearest-neighbour search on ThreeDeeBeeTree.
+
+    Answers the same random queries with ThreeDeeBeeTree.nearest and with a
+    linear scan sorting every point by distance, for each metric and for point
+    sets of 10^4 up to 10^6 points (building the largest tree takes a while).
+
+    Usage: python -m benchmarks.bench_nearest [k] [queries] [sizes...]
+"""
+from __future__ import annotations
+import heapq
+import random
+import sys
+from time import perf_counter
+
+from threedeebeetree import METRICS, ThreeDeeBeeTree
+
+
+def linear_scan(points: list, query: tuple, k: int, distance) -> list:
+    """ The k points closest to query, by comparing query with every point. """
+    return heapq.nsmallest(k, points, key=lambda point: distance(point, query))
+
+
+def main(k: int, queries: int, sizes: list) -> None:
+    random.seed(2025)
+    for n in sizes:
+        span = round(n ** (1 / 3)) * 10
+        points = list({tuple(random.randrange(span) for _ in range(3)) for _ in range(n)})
+        tree = ThreeDeeBeeTree()
+        start = perf_counter()
+        for point in points:
+            tree[point] = point
+        built = perf_counter() - start
+        targets = [tuple(random.randrange(span) for _ in range(3)) for _ in range(queries)]
+        print('{0} points, tree built in {1:.2f}s'.format(len(points), built))
+        for metric, (distance, _) in METRICS.items():
+            start = perf_counter()
+            found = [tree.nearest(query, k, metric) for query in targets]
+            searched = perf_counter() - start
+            start = perf_counter()
+            scanned = [linear_scan(points, query, k, distance) for query in targets]
+            scan = perf_counter() - start
+            assert all([distance(key, query) for key, _ in hits] == [distance(p, query) for p in expected]
+                       for query, hits, expected in zip(targets, found, scanned))
+            print('  {0:9}  nearest {1:8.4f}s  linear scan {2:8.3f}s  speedup {3:8.1f}x'.format(
+                metric, searched, scan, scan / searched))
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 10, int(args[1]) if len(args) > 1 else 20,
+         [int(size) for size in args[2:]] or [10 ** 4, 10 ** 5, 10 ** 6])
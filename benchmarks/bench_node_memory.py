@@ -0,0 +1,86 @@
+""" Memory benchmark for the slotted TreeNode and BeeNode classes.
+
+    Builds the same structure with the old dict-backed node layouts and with
+    the current slotted ones, and reports the bytes allocated per node.
+
+    Usage: python -m benchmarks.bench_node_memory [n]
+"""
+from __future__ import annotations
+import random
+import sys
+import tracemalloc
+from dataclasses import dataclass
+
+from bst import BinarySearchTree
+from threedeebeetree import ThreeDeeBeeTree
+
+
+@dataclass
+class DictTreeNode:
+    """ TreeNode as it was before __slots__. """
+    key: object
+    item: object = None
+    left: DictTreeNode | None = None
+    right: DictTreeNode | None = None
+    subtree_size: int = 1
+
+
+class DictBeeNode:
+    """ BeeNode as it was before __slots__ and the sparse child store. """
+    def __init__(self, key, item):
+        self.key = key
+        self.item = item
+        self.subtree_size = 1
+        self.children = [None] * 8
+
+
+def measure(build) -> tuple[object, int]:
+    """ Returns what build() made and the bytes it allocated. """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def copy_bst(node):
+    if node is None:
+        return None
+    return DictTreeNode(node.key, node.item, copy_bst(node.left), copy_bst(node.right), node.subtree_size)
+
+
+def copy_3dbt(node):
+    copy = DictBeeNode(node.key, node.item)
+    copy.subtree_size = node.subtree_size
+    for index, child in enumerate(node.children):
+        if child is not None:
+            copy.children[index] = copy_3dbt(child)
+    return copy
+
+
+def main(n: int) -> None:
+    random.seed(2023)
+    pairs = [(i, None) for i in range(n)]
+    tree = BinarySearchTree.from_items(pairs, presorted=True)
+    # keys/items are shared, so only node overhead is measured
+    _, dict_bytes = measure(lambda: copy_bst(tree.root))
+    _, slot_bytes = measure(lambda: BinarySearchTree.from_items(pairs, presorted=True))
+    print('TreeNode: {0:7.1f} -> {1:7.1f} bytes/node'.format(dict_bytes / n, slot_bytes / n))
+
+    points = [(random.randrange(10 ** 6), random.randrange(10 ** 6), random.randrange(10 ** 6)) for _ in range(n)]
+    points = list(dict.fromkeys(points))
+
+    def build_3dbt():
+        tdbt = ThreeDeeBeeTree()
+        for point in points:
+            tdbt[point] = None
+        return tdbt
+
+    tdbt, slot_bytes = measure(build_3dbt)
+    _, dict_bytes = measure(lambda: copy_3dbt(tdbt.root))
+    print('BeeNode:  {0:7.1f} -> {1:7.1f} bytes/node'.format(dict_bytes / len(points), slot_bytes / len(points)))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,52 @@
+""" Benchmark of the 'numpy' Percentiles backend against the tree backends.
+
+    For each size, loads n random floats, appends n / 100 more one at a time,
+    then times ratio queries (with the cache off) on every backend. The tree
+    backends are skipped above TREE_LIMIT points, where loading them alone
+    takes minutes.
+
+    Usage: python -m benchmarks.bench_numpy_ratio [n ...]
+"""
+from __future__ import annotations
+import random
+import sys
+from time import perf_counter
+
+from ratio import Percentiles
+from sorted_array import SortedArrayStore
+
+TREE_LIMIT = 10 ** 6
+QUERIES = [(0, 0), (5, 5), (25, 25), (49, 49), (90, 5)]
+
+
+def run(backend: str, points: list, extra: list) -> tuple[float, float, float]:
+    """ Returns the seconds spent loading, appending and answering QUERIES. """
+    start = perf_counter()
+    p = Percentiles.from_points(points, backend)
+    p.cache_size = 0
+    loaded = perf_counter()
+    for point in extra:
+        p.add_point(point)
+    appended = perf_counter()
+    for x, y in QUERIES:
+        p.ratio(x, y)
+    return loaded - start, appended - loaded, perf_counter() - appended
+
+
+def main(sizes: list[int]) -> None:
+    if not SortedArrayStore.available():
+        print('NumPy is not installed: the numpy backend falls back to the tree')
+    random.seed(2023)
+    for n in sizes:
+        points = [random.random() for _ in range(n)]
+        extra = [random.random() for _ in range(n // 100)]
+        for backend in ('numpy', 'array', 'tree'):
+            if backend != 'numpy' and n > TREE_LIMIT:
+                continue
+            load, append, query = run(backend, points, extra)
+            print('{0:5} n={1:<9} load {2:8.3f}s  append {3:8.3f}s  {4} ratios {5:8.3f}s'.format(
+                backend, n, load, append, len(QUERIES), query))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10 ** 5, 10 ** 6, 10 ** 7])
@@ -0,0 +1,35 @@
+""" Micro-benchmark of ratio on empty and edge windows.
+
+    Times ratio(x, y) for windows that are empty (x + y >= 100), that hold a
+    single key, and that use fractional or out-of-range percentiles, on a
+    balanced tree and on a degenerate one built from sorted keys. An empty
+    window should cost the same however many keys the tree holds.
+
+    Usage: python -m benchmarks.bench_ratio_window [n]
+"""
+from __future__ import annotations
+import sys
+import timeit
+
+from avl import AVLTree
+from bst import BinarySearchTree
+
+WINDOWS = [(100, 0), (50, 50), (0, 100), (150, -20), (49.95, 49.95), (0.25, 99.5), (99.99, 0)]
+
+
+def main(n: int) -> None:
+    degenerate = BinarySearchTree()
+    for i in range(n):
+        degenerate[i] = i
+    trees = [('balanced bst', BinarySearchTree.from_items((i, i) for i in range(n))),
+             ('degenerate bst', degenerate),
+             ('avl', AVLTree.from_items((i, i) for i in range(n)))]
+    for name, tree in trees:
+        for x, y in WINDOWS:
+            runs, total = timeit.Timer(lambda: tree.ratio(x, y)).autorange()
+            print('{0:14} n={1:<7} ratio({2}, {3}): {4:9.2f} us, {5} keys'.format(
+                name, n, x, y, total / runs * 1e6, len(tree.ratio(x, y))))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -8,8 +8,9 @@ from __future__ import annotations
 __author__ = 'Brendon Taylor, modified by Alexey Ignatiev, further modified by Jackson Goerner'
 __docformat__ = 'reStructuredText'
 
-from math import ceil
-from typing import TypeVar, Generic
+from heapq import merge
+from math import ceil, log2
+from typing import TypeVar, Generic, Iterable, Iterator
 from node import TreeNode
 import sys
 
@@ -19,17 +20,287 @@ I = TypeVar('I')
 T = TypeVar('T')
 
 
+def ratio_bounds(x: float, y: float, n: int) -> tuple[int, int]:
+    """
+        Ranks, counting from 1, of the first and last of n sorted keys that are above
+        the smallest x% and below the largest y%. They are clamped to [1, n], so any
+        x and y are accepted and lb > ub means the window is empty.
+        :complexity: O(1)
+    """
+    # x * n is exact for int percentiles, where x / 100 * n can round up past an integer
+    lb = max(1, ceil(x * n / 100) + 1)
+    ub = min(n, n - ceil(y * n / 100))
+    return lb, ub
+
+
+def check_orderable(key: K) -> None:
+    """
+        Rejects a key that is not equal to itself, such as a float NaN, which
+        compares neither less, greater nor equal to any key and so has no place
+        in sorted order.
+        :raises ValueError: when key is not equal to itself
+        :complexity: O(CompK)
+    """
+    if key != key:
+        raise ValueError('Cannot order key {0!r}'.format(key))
+
+
+def delete_each(tree, keys: Iterable[K]) -> None:
+    """
+        Deletes one copy of every key from tree one at a time. When a key is not
+        present the copies already deleted are put back, so a failed batch
+        leaves tree holding the same keys and items as before.
+        :raises ValueError: when a key is not present
+        :complexity: O(b log n) where b is the number of keys and n the length of tree
+    """
+    deleted = []
+    try:
+        for key in keys:
+            try:
+                item = tree[key]
+            except KeyError:
+                raise ValueError('Deleting non-existent item') from None
+            del tree[key]
+            deleted.append((key, item))
+    except ValueError:
+        for key, item in reversed(deleted):
+            tree[key] = item
+        raise
+
+
+def count_pairs(items: Iterable[tuple[K, I]], presorted: bool, multiset: bool) -> list[list]:
+    """
+        Groups (key, item) pairs into [key, item, count] entries in increasing key
+        order, each keeping the first item of its key. Shared by the bulk loaders
+        of the linked and array trees.
+        :raises ValueError: when two pairs share a key outside a multiset
+        :complexity: O(n) if presorted, otherwise O(n log n) where n is the number of pairs
+    """
+    pairs = list(items)
+    if not presorted:
+        pairs.sort(key=lambda pair: pair[0])
+    entries = []
+    for key, item in pairs:
+        if entries and entries[-1][0] == key:
+            if not multiset:
+                raise ValueError('Inserting duplicate item')
+            entries[-1][2] += 1
+        else:
+            entries.append([key, item, 1])
+    return entries
+
+
+def sorted_entries(entries: Iterable[tuple[K, I, int]], presorted: bool) -> list[tuple[K, I, int]]:
+    """
+        Returns (key, item, count) entries as a list in strictly increasing key order.
+        :raises ValueError: when two entries share a key, a key is NaN, or presorted entries are out of order
+        :complexity: O(n) if presorted, otherwise O(n log n) where n is the number of entries
+    """
+    entries = list(entries)
+    for entry in entries:
+        check_orderable(entry[0])
+    if not presorted:
+        entries.sort(key=lambda entry: entry[0])
+    for i in range(1, len(entries)):
+        if entries[i - 1][0] == entries[i][0]:
+            raise ValueError('Inserting duplicate item')
+        elif not entries[i - 1][0] < entries[i][0]:
+            raise ValueError('Items are not sorted by key')
+    return entries
+
+
+def rebuild_beats_walks(length: int, batch_size: int) -> bool:
+    """
+        Whether rebuilding a tree of length keys beats one root-to-leaf walk per
+        key of a batch, i.e. batch_size * log2(length) >= length.
+        :complexity: O(1)
+    """
+    return batch_size * max(1.0, log2(length + 1)) >= length
+
+
+def insert_batch(tree, items: Iterable[tuple[K, I]]) -> None:
+    """
+        Inserts a batch of (key, item) pairs into tree, which needs iter_counts,
+        rebuild and rebuild_is_cheaper. A large batch is merged with the tree's
+        sorted entries and the tree rebuilt; a small one is inserted key by key.
+        :raises ValueError: when a key is already present outside a multiset, in which case
+            pairs before it may already have been inserted when the batch was small, or
+            when a key is NaN, in which case nothing is inserted
+        :complexity: O(b log b + min(b log n, n + b)) where b is the batch size and n the length of tree
+    """
+    pairs = list(items)
+    for key, _ in pairs:
+        check_orderable(key)
+    pairs.sort(key=lambda pair: pair[0])
+    if not tree.rebuild_is_cheaper(len(pairs)):
+        for key, item in pairs:
+            tree[key] = item
+        return
+
+    entries = []
+    # existing entries come first among equal keys, so they keep their item
+    for key, item, count in merge(tree.iter_counts(), ((key, item, 1) for key, item in pairs),
+                                  key=lambda entry: entry[0]):
+        if entries and entries[-1][0] == key:
+            if not tree.multiset:
+                raise ValueError('Inserting duplicate item')
+            entries[-1][2] += count
+        else:
+            entries.append([key, item, count])
+    tree.rebuild(entries)
+
+
+def delete_batch(tree, keys: Iterable[K]) -> None:
+    """
+        Deletes one copy of every key in a batch from tree, which needs iter_counts,
+        rebuild and rebuild_is_cheaper. A large batch is applied to the tree's sorted
+        entries and the tree rebuilt; a small one is deleted key by key.
+        :raises ValueError: when a key is not present, in which case nothing is deleted
+        :complexity: O(b log b + min(b log n, n + b)) where b is the batch size and n the length of tree
+    """
+    keys = sorted(keys)
+    if not tree.rebuild_is_cheaper(len(keys)):
+        delete_each(tree, keys)
+        return
+
+    entries = []
+    i = 0
+    for key, item, count in tree.iter_counts():
+        if i < len(keys) and keys[i] < key:
+            raise ValueError('Deleting non-existent item')
+        removed = 0
+        while i < len(keys) and keys[i] == key:
+            removed += 1
+            i += 1
+        if removed > count:
+            raise ValueError('Deleting non-existent item')
+        if removed < count:
+            entries.append((key, item, count - removed))
+    if i < len(keys):
+        raise ValueError('Deleting non-existent item')
+    tree.rebuild(entries)
+
+
 class BinarySearchTree(Generic[K, I]):
     """ Basic binary search tree. """
 
-    def __init__(self) -> None:
+    def __init__(self, multiset: bool = False) -> None:
         """
             Initialises an empty Binary Search Tree
+            :param multiset: whether inserting an existing key adds one more
+                copy of it instead of raising ValueError
             :complexity: O(1)
         """
 
         self.root = None
         self.length = 0
+        self.multiset = multiset
+
+    @classmethod
+    def from_items(cls, items: Iterable[tuple[K, I]], presorted: bool = False,
+                   multiset: bool = False) -> BinarySearchTree[K, I]:
+        """
+        Bulk-load a perfectly balanced tree from (key, item) pairs.
+
+        - Args:
+            - items: the (key, item) pairs to be stored
+            - presorted: whether items are already in increasing key order
+            - multiset: whether repeated keys are kept as copies, holding the first item
+        - Returns:
+            - BinarySearchTree: a new tree holding every pair
+        - Raises:
+            - ValueError: when two pairs share a key outside a multiset, or presorted items are out of order
+        - Complexity:
+            O(n) if presorted, otherwise O(n log n) where n is the number of pairs
+        """
+        return cls.from_counts(count_pairs(items, presorted, multiset), presorted=True, multiset=multiset)
+
+    @classmethod
+    def from_counts(cls, entries: Iterable[tuple[K, I, int]], presorted: bool = False,
+                    multiset: bool = True) -> BinarySearchTree[K, I]:
+        """
+        Bulk-load a perfectly balanced tree from (key, item, count) entries.
+
+        - Args:
+            - entries: the (key, item, count) entries to be stored, with distinct keys
+            - presorted: whether entries are already in strictly increasing key order
+            - multiset: whether the new tree accepts repeated keys
+        - Returns:
+            - BinarySearchTree: a new tree holding every entry
+        - Raises:
+            - ValueError: when two entries share a key, or presorted entries are out of order
+        - Complexity:
+            O(n) if presorted, otherwise O(n log n) where n is the number of entries
+        """
+        tree = cls(multiset=multiset)
+        tree.rebuild(sorted_entries(entries, presorted))
+        return tree
+
+    def rebuild(self, entries: list[tuple[K, I, int]]) -> None:
+        """
+        Replaces the whole tree with a balanced one holding entries.
+
+        - Args:
+            - entries: (key, item, count) entries in strictly increasing key order
+        - Returns:
+            - None
+        - Raises:
+            -None
+        - Complexity:
+            O(n) where n is the number of entries
+        """
+        self.root = self.build_balanced(entries, 0, len(entries))
+        self.length = self.get_size(self.root)
+
+    def build_balanced(self, entries: list[tuple[K, I, int]], lo: int, hi: int) -> TreeNode:
+        """
+        Build a balanced subtree out of entries[lo:hi], which must be sorted by key.
+
+        - Args:
+            - entries: the sorted (key, item, count) entries
+            - lo: first index of the subtree (inclusive)
+            - hi: last index of the subtree (exclusive)
+        - Returns:
+            - TreeNode: root of the subtree, or None when the range is empty
+        - Raises:
+            -None
+        - Complexity:
+            O(hi - lo), with recursion depth O(log(hi - lo))
+        """
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        key, item, count = entries[mid]
+        current = self.new_node(key, item)
+        current.count = count
+        current.left = self.build_balanced(entries, lo, mid)
+        current.right = self.build_balanced(entries, mid + 1, hi)
+        self.update(current)
+        return current
+
+    def new_node(self, key: K, item: I) -> TreeNode:
+        """
+            Creates a detached node for key and item.
+            :complexity: O(1)
+        """
+        return TreeNode(key, item=item)
+
+    def get_size(self, current: TreeNode) -> int:
+        """
+            Get the subtree size of current, where an empty tree has size 0.
+            In a multiset every copy of a key counts towards the size.
+            :complexity: O(1)
+        """
+        if current is None:
+            return 0
+        return current.subtree_size
+
+    def update(self, current: TreeNode) -> None:
+        """
+            Recompute the subtree size of current from its children.
+            :complexity: O(1)
+        """
+        current.subtree_size = current.count + self.get_size(current.left) + self.get_size(current.right)
 
     def is_empty(self) -> bool:
         """
@@ -55,6 +326,153 @@ class BinarySearchTree(Generic[K, I]):
         else:
             return True
 
+    def __iter__(self) -> Iterator[K]:
+        """ Yields every key in increasing order. """
+
+        for key, _ in self.iter_items():
+            yield key
+
+    def iter_items(self) -> Iterator[tuple[K, I]]:
+        """
+            Yields every (key, item) pair in increasing key order, once per distinct key.
+            :complexity: O(n) overall, using an explicit stack of O(D) nodes
+        """
+        for current in self.iter_nodes():
+            yield current.key, current.item
+
+    def iter_counts(self) -> Iterator[tuple[K, I, int]]:
+        """
+            Yields every (key, item, count) entry in increasing key order.
+            :complexity: O(n) overall, using an explicit stack of O(D) nodes
+        """
+        for current in self.iter_nodes():
+            yield current.key, current.item, current.count
+
+    def iter_nodes(self) -> Iterator[TreeNode]:
+        """
+            Yields every node in increasing key order.
+            :complexity: O(n) overall, using an explicit stack of O(D) nodes
+        """
+        stack = []
+        current = self.root
+        while stack or current is not None:
+            while current is not None:
+                stack.append(current)
+                current = current.left
+            current = stack.pop()
+            yield current
+            current = current.right
+
+    def iter_from(self, key: K) -> Iterator[tuple[K, I]]:
+        """
+        Lazily yields the (key, item) pairs with keys >= key, in increasing key order.
+
+        - Args:
+            - K: the smallest key of interest, which need not be in the tree
+        - Returns:
+            - Iterator: generator of (key, item) pairs
+        - Raises:
+            -None
+        - Complexity:
+            O(D) to reach the first pair, then O(1) amortised per pair,
+            where D is the depth of the tree
+        """
+        for current in self.iter_from_aux(self.root, key):
+            yield current.key, current.item
+
+    def iter_from_aux(self, current: TreeNode, key: K) -> Iterator[TreeNode]:
+        """
+            Yields the nodes of the subtree rooted at current with keys >= key, in order.
+            Subtrees whose keys are all below key are never entered.
+        """
+        # stack of nodes with key >= key whose right subtree is still to be visited
+        stack = []
+        while current is not None:
+            if key < current.key:
+                stack.append(current)
+                current = current.left
+            elif key > current.key:
+                current = current.right
+            else:  # key == current.key, nothing on its left is needed
+                stack.append(current)
+                break
+        while stack:
+            current = stack.pop()
+            yield current
+            current = current.right
+            while current is not None:
+                stack.append(current)
+                current = current.left
+
+    def range(self, lo: K, hi: K) -> Iterator[tuple[K, I]]:
+        """
+        Lazily yields the (key, item) pairs with lo <= key <= hi, in increasing key order.
+
+        - Args:
+            - K: lower bound of the keys (inclusive)
+            - K: upper bound of the keys (inclusive)
+        - Returns:
+            - Iterator: generator of (key, item) pairs
+        - Raises:
+            -None
+        - Complexity:
+            O(D + O) where D is the depth of the tree and O is the number of pairs yielded
+        """
+        for key, item in self.iter_from(lo):
+            if key > hi:
+                return
+            yield key, item
+
+    def floor(self, key: K) -> TreeNode | None:
+        """
+        Finds the node with the largest key that is <= key.
+
+        - Args:
+            - K: key to search, which need not be in the tree
+        - Returns:
+            - TreeNode | None: the node found, or None when every key is larger
+        - Raises:
+            -None
+        - Complexity:
+            O(D) where D is the depth of the tree
+        """
+        result = None
+        current = self.root
+        while current is not None:
+            if key == current.key:
+                return current
+            elif key < current.key:
+                current = current.left
+            else:
+                result = current
+                current = current.right
+        return result
+
+    def ceiling(self, key: K) -> TreeNode | None:
+        """
+        Finds the node with the smallest key that is >= key.
+
+        - Args:
+            - K: key to search, which need not be in the tree
+        - Returns:
+            - TreeNode | None: the node found, or None when every key is smaller
+        - Raises:
+            -None
+        - Complexity:
+            O(D) where D is the depth of the tree
+        """
+        result = None
+        current = self.root
+        while current is not None:
+            if key == current.key:
+                return current
+            elif key > current.key:
+                current = current.right
+            else:
+                result = current
+                current = current.left
+        return result
+
     def __getitem__(self, key: K) -> I:
         """
             Attempts to get an item in the tree, it uses the Key to attempt to find it
@@ -68,16 +486,23 @@ class BinarySearchTree(Generic[K, I]):
         return self.get_tree_node_by_key_aux(self.root, key)
 
     def get_tree_node_by_key_aux(self, current: TreeNode, key: K) -> TreeNode:
-        if current is None:
-            raise KeyError('Key not found: {0}'.format(key))
-        elif key == current.key:
-            return current
-        elif key < current.key:
-            return self.get_tree_node_by_key_aux(current.left, key)
-        else:  # key > current.key
-            return self.get_tree_node_by_key_aux(current.right, key)
+        """
+            Walks down from current to the node holding key.
+            :complexity best: O(CompK) finds the item in current
+            :complexity worst: O(CompK * D) item is not found, where D is the depth of current
+            CompK is the complexity of comparing the keys
+        """
+        while current is not None:
+            if key == current.key:
+                return current
+            elif key < current.key:
+                current = current.left
+            else:  # key > current.key
+                current = current.right
+        raise KeyError('Key not found: {0}'.format(key))
 
     def __setitem__(self, key: K, item: I) -> None:
+        check_orderable(key)
         self.root = self.insert_aux(self.root, key, item)
 
     def insert_aux(self, current: TreeNode, key: K, item: I) -> TreeNode:
@@ -88,18 +513,36 @@ class BinarySearchTree(Generic[K, I]):
             where D is the depth of the tree
             CompK is the complexity of comparing the keys
         """
-        if current is None:  # base case: at the leaf
-            current = TreeNode(key, item=item)
-            current.subtree_size = 0
+        if current is None:  # empty tree: the new node is the root
             self.length += 1
-        elif key < current.key:
-            current.left = self.insert_aux(current.left, key, item)
-        elif key > current.key:
-            current.right = self.insert_aux(current.right, key, item)
-        else:  # key == current.key
-            raise ValueError('Inserting duplicate item')
-        current.subtree_size += 1
-        return current
+            return self.new_node(key, item)
+
+        # walk down to the leaf, remembering the path so it can be retraced afterwards
+        current = self.copy_node(current)
+        path = []
+        parent = current
+        while True:
+            path.append(parent)
+            if key < parent.key:
+                if parent.left is None:
+                    parent.left = self.new_node(key, item)
+                    break
+                parent.left = self.copy_node(parent.left)
+                parent = parent.left
+            elif key > parent.key:
+                if parent.right is None:
+                    parent.right = self.new_node(key, item)
+                    break
+                parent.right = self.copy_node(parent.right)
+                parent = parent.right
+            elif self.multiset:  # key == parent.key, keep one more copy
+                parent.count += 1
+                break
+            else:  # key == parent.key
+                raise ValueError('Inserting duplicate item')
+
+        self.length += 1
+        return self.retrace(path, current)
 
     def __delitem__(self, key: K) -> None:
         self.root = self.delete_aux(self.root, key)
@@ -108,33 +551,132 @@ class BinarySearchTree(Generic[K, I]):
         """
             Attempts to delete an item from the tree, it uses the Key to
             determine the node to delete.
+            :complexity: O(CompK * D) where D is the depth of the tree
+            CompK is the complexity of comparing the keys
         """
-
-        if current is None:  # key not found
+        # path holds every ancestor of the node that is physically unlinked
+        current = target = self.copy_node(current)
+        path = []
+        while target is not None and key != target.key:
+            path.append(target)
+            if key < target.key:
+                target.left = self.copy_node(target.left)
+                target = target.left
+            else:
+                target.right = self.copy_node(target.right)
+                target = target.right
+        if target is None:  # key not found
             raise ValueError('Deleting non-existent item')
-        elif key < current.key:
-            current.left = self.delete_aux(current.left, key)
-        elif key > current.key:
-            current.right = self.delete_aux(current.right, key)
-        else:  # we found our key => do actual deletion
-            if self.is_leaf(current):
-                self.length -= 1
-                return None
-            elif current.left is None:
-                self.length -= 1
-                return current.right
-            elif current.right is None:
-                self.length -= 1
-                return current.left
-
-            # general case => find a successor
-            succ = self.get_successor(current)
-            current.key = succ.key
-            current.item = succ.item
-            current.right = self.delete_aux(current.right, succ.key)
-        current.subtree_size -= 1
+
+        self.length -= 1
+        if target.count > 1:  # drop one copy, the node stays
+            target.count -= 1
+            path.append(target)
+            return self.retrace(path, current)
+
+        if target.left is not None and target.right is not None:
+            # general case => move the successor up and unlink the successor instead
+            path.append(target)
+            target.right = self.copy_node(target.right)
+            succ = target.right
+            while succ.left is not None:
+                path.append(succ)
+                succ.left = self.copy_node(succ.left)
+                succ = succ.left
+            target.key = succ.key
+            target.item = succ.item
+            target.count = succ.count
+            target = succ
+
+        replacement = target.left if target.left is not None else target.right
+        if not path:
+            return replacement
+        if path[-1].left is target:
+            path[-1].left = replacement
+        else:
+            path[-1].right = replacement
+        return self.retrace(path, current)
+
+    def copy_node(self, current: TreeNode) -> TreeNode:
+        """
+            Returns the node insert_aux and delete_aux modify in place of current
+            (None for None). This is current itself; a tree sharing nodes between
+            versions returns a copy.
+            :complexity: O(1)
+        """
+        return current
+
+    def retrace(self, path: list[TreeNode], current: TreeNode) -> TreeNode:
+        """
+            Repairs the nodes on path after insert_aux or delete_aux changed the
+            subtree below them, from the bottom up. Here that recomputes their
+            sizes; a self-balancing tree also rebalances them.
+
+        - Args:
+            - list[TreeNode]: nodes from current down to the modified position
+            - TreeNode: root of the whole subtree
+        - Returns:
+            - TreeNode: the new root of the subtree
+        - Raises:
+            -None
+        - Complexity:
+            O(len(path))
+        """
+        for node in reversed(path):
+            self.update(node)
         return current
 
+    def rebuild_is_cheaper(self, batch_size: int) -> bool:
+        """
+        Whether rebuilding the tree beats walking from the root once per key of a batch.
+
+        - Args:
+            - int: the number of keys in the batch
+        - Returns:
+            - bool: True when batch_size * log2(n) >= n, where n is the length of the tree
+        - Raises:
+            -None
+        - Complexity:
+            O(1)
+        """
+        return rebuild_beats_walks(self.length, batch_size)
+
+    def insert_many(self, items: Iterable[tuple[K, I]]) -> None:
+        """
+        Inserts a batch of (key, item) pairs, sorted once. A batch that is large relative
+        to the tree is merged with the tree's sorted entries and the tree is rebuilt
+        balanced in one pass; a small one is inserted key by key in sorted order.
+
+        - Args:
+            - items: the (key, item) pairs to be inserted
+        - Returns:
+            - None
+        - Raises:
+            - ValueError: when a key is already present outside a multiset, in which case
+              pairs before it may already have been inserted when the batch was small, or
+              when a key is NaN, in which case nothing is inserted
+        - Complexity:
+            O(b log b + min(b log n, n + b)) where b is the batch size and n the length of the tree
+        """
+        insert_batch(self, items)
+
+    def delete_many(self, keys: Iterable[K]) -> None:
+        """
+        Deletes one copy of every key in a batch, sorted once. A batch that is large
+        relative to the tree is applied to the tree's sorted entries and the tree is
+        rebuilt balanced in one pass; a small one is deleted key by key.
+
+        - Args:
+            - keys: the keys to be deleted, repeated to delete several copies
+        - Returns:
+            - None
+        - Raises:
+            - ValueError: when a key is not present, in which case nothing is deleted
+        - Complexity:
+            O(b log b + min(b log n, n + b)) where b is the batch size and n the length of the tree
+        """
+        delete_batch(self, keys)
+
     def get_successor(self, current: TreeNode) -> TreeNode:
         """
             Get successor of the current node.
@@ -167,9 +709,9 @@ class BinarySearchTree(Generic[K, I]):
         - Complexity:
             O(D) where D is the maximum depth of given node
         """
-        if self.is_leaf(current):
-            return current
-        return self.get_minimal(current.left)
+        while current.left is not None:
+            current = current.left
+        return current
 
     def is_leaf(self, current: TreeNode) -> bool:
         """ Simple check whether or not the node is a leaf. """
@@ -209,17 +751,101 @@ class BinarySearchTree(Generic[K, I]):
         - Complexity:
             O(D) where D is the maximum depth of given node
         """
-        if current is None:
-            return None
+        while current is not None:
+            left_size = current.left.subtree_size if current.left else 0
+
+            if k <= left_size:
+                current = current.left
+            elif k <= left_size + current.count:
+                return current
+            else:
+                k -= left_size + current.count
+                current = current.right
+        return None
+
+    def select(self, k: int) -> K:
+        """
+        Returns the kth smallest key of the whole tree.
 
-        left_size = current.left.subtree_size if current.left else 0
+        - Args:
+            - int: k, counting from 1
+        - Returns:
+            - K: the kth smallest key
+        - Raises:
+            - IndexError: when k is not between 1 and len(self)
+        - Complexity:
+            O(D) where D is the depth of the tree
+        """
+        if not 1 <= k <= self.length:
+            raise IndexError('Rank out of range: {0}'.format(k))
+        return self.kth_smallest(k, self.root).key
 
-        if k == left_size + 1:
-            return current
-        elif k <= left_size:
-            return self.kth_smallest(k, current.left)
-        else:
-            return self.kth_smallest(k - left_size - 1, current.right)
+    def count_less(self, key: K, inclusive: bool = False) -> int:
+        """
+        Counts the keys smaller than key, using the subtree sizes of the nodes passed.
+
+        - Args:
+            - K: key to compare against, which need not be in the tree
+            - bool: whether keys equal to key are counted too
+        - Returns:
+            - int: the number of keys < key (or <= key when inclusive)
+        - Raises:
+            -None
+        - Complexity:
+            O(D) where D is the depth of the tree
+        """
+        count = 0
+        current = self.root
+        while current is not None:
+            if key < current.key or (key == current.key and not inclusive):
+                current = current.left
+            else:  # current and its whole left subtree are counted
+                count += self.get_size(current.left) + current.count
+                current = current.right
+        return count
+
+    def rank(self, key: K) -> int:
+        """
+        Finds the position of key in sorted order, the inverse of kth_smallest.
+
+        - Args:
+            - K: key to search
+        - Returns:
+            - int: the smallest k such that kth_smallest(k, root) holds key, counting from 1
+        - Raises:
+            - KeyError: when key is not in the tree
+        - Complexity:
+            O(D) where D is the depth of the tree
+        """
+        count = 0
+        current = self.root
+        while current is not None:
+            if key == current.key:
+                return count + self.get_size(current.left) + 1
+            elif key < current.key:
+                current = current.left
+            else:
+                count += self.get_size(current.left) + current.count
+                current = current.right
+        raise KeyError('Key not found: {0}'.format(key))
+
+    def count_between(self, lo: K, hi: K) -> int:
+        """
+        Counts the keys with lo <= key <= hi without visiting them.
+
+        - Args:
+            - K: lower bound of the keys (inclusive)
+            - K: upper bound of the keys (inclusive)
+        - Returns:
+            - int: the number of keys within the bounds
+        - Raises:
+            -None
+        - Complexity:
+            O(D) where D is the depth of the tree
+        """
+        if hi < lo:
+            return 0
+        return self.count_less(hi, inclusive=True) - self.count_less(lo)
 
     def ratio(self, x: int, y: int) -> list[int]:
         """
@@ -235,12 +861,19 @@ class BinarySearchTree(Generic[K, I]):
         - Complexity:
             O(logn + O) where n is the number of node and O is the length of return list
         """
-        lb = ceil(x / 100 * self.length) + 1
-        ub = self.length - ceil(y / 100 * self.length)
+        lb, ub = ratio_bounds(x, y, self.length)
+        if lb > ub:  # empty window, nothing to walk
+            return []
         lnode = self.kth_smallest(lb, self.root)
         unode = self.kth_smallest(ub, self.root)
         result = []
         self.ratio_helper(self.root, result, lnode, unode)
+        if self.multiset and result:
+            # the window can start or end part-way through the copies of a key
+            del result[:lb - 1 - self.count_less(lnode.key)]
+            extra = self.count_less(unode.key, inclusive=True) - ub
+            if extra > 0:
+                del result[-extra:]
         return result
 
     def ratio_helper(self, current: TreeNode, result: list, x: TreeNode, y: TreeNode) -> None:
@@ -257,12 +890,10 @@ class BinarySearchTree(Generic[K, I]):
         - Raises:
             -None
         - Complexity:
-            O(O) O is the length of return list
-        """
-        if current:
-            if current is not x:
-                self.ratio_helper(current.left, result, x, y)
-            if x and y and x.item <= current.item <= y.item:
-                result.append(current.key)
-            if current is not y:
-                self.ratio_helper(current.right, result, x, y)
+            O(D + O) where D is the depth of current and O is the length of return list
+        """
+        if x and y:
+            for node in self.iter_from_aux(current, x.key):
+                if node.key > y.key:
+                    break
+                result.extend([node.key] * node.count)
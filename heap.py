@@ -3,43 +3,100 @@ from __future__ import annotations
 __author__ = "Brendon Taylor, modified by Jackson Goerner"
 __docformat__ = 'reStructuredText'
 
-from typing import Generic
+from typing import Callable, Generic
 from referential_array import ArrayR, T
 
 
 class MaxHeap(Generic[T]):
+    """
+    Max heap in a dynamic array: the backing ArrayR doubles when an add finds
+    it full and halves when a removal leaves it a quarter full, so both are
+    amortised O(1) on top of the O(log n) sift. Slot 0 is unused.
+    Elements are ordered by key(element), kept in the parallel array keys so
+    it is computed once per add or update rather than on every comparison.
+    """
     MIN_CAPACITY = 1
 
-    def __init__(self, max_size: int) -> None:
+    def __init__(self, max_size: int = MIN_CAPACITY, key: Callable[[T], object] = None) -> None:
+        """
+        :param max_size: capacity hint, the heap holds this many elements
+            without reallocating and never shrinks below it
+        :param key: priority of an element, compared with > and <=; the
+            elements themselves are compared when it is None
+        :complexity: O(max_size)
+        """
         self.length = 0
-        self.the_array = ArrayR(max(self.MIN_CAPACITY, max_size) + 1)
+        self.key = key
+        self.min_capacity = max(self.MIN_CAPACITY, max_size)
+        self.the_array = ArrayR(self.min_capacity + 1)
+        self.keys = ArrayR(self.min_capacity + 1)
 
     def __len__(self) -> int:
         return self.length
 
+    def capacity(self) -> int:
+        """ Number of elements the heap can hold before it next grows. """
+        return len(self.the_array) - 1
+
     def is_full(self) -> bool:
         return self.length + 1 == len(self.the_array)
 
+    def resize(self, capacity: int) -> None:
+        """
+        Moves the elements into a new backing array holding capacity elements.
+        :pre: self.length <= capacity
+        :complexity: O(capacity)
+        """
+        new_array = ArrayR(capacity + 1)
+        new_keys = ArrayR(capacity + 1)
+        for i in range(1, self.length + 1):
+            new_array[i] = self.the_array[i]
+            new_keys[i] = self.keys[i]
+        self.the_array = new_array
+        self.keys = new_keys
+
+    def priority(self, element: T) -> object:
+        """
+        The key element is ordered by.
+        :complexity: O(1) plus the cost of key
+        """
+        return element if self.key is None else self.key(element)
+
+    def reserve(self, capacity: int) -> None:
+        """
+        Makes room for capacity elements, so adding up to that many never
+        reallocates, and keeps the heap from shrinking below it.
+        :complexity: O(capacity) when it grows, O(1) otherwise
+        """
+        self.min_capacity = max(self.min_capacity, capacity)
+        if self.capacity() < capacity:
+            self.resize(capacity)
+
     def rise(self, k: int) -> None:
         """
         Rise element at index k to its correct position
         :pre: 1 <= k <= self.length
         """
         item = self.the_array[k]
-        while k > 1 and item > self.the_array[k // 2]:
+        item_key = self.keys[k]
+        while k > 1 and item_key > self.keys[k // 2]:
             self.the_array[k] = self.the_array[k // 2]
+            self.keys[k] = self.keys[k // 2]
             k = k // 2
         self.the_array[k] = item
+        self.keys[k] = item_key
 
     def add(self, element: T) -> bool:
         """
-        Swaps elements while rising
+        Swaps elements while rising, doubling the backing array first when it is full.
+        :complexity: O(log n) amortised
         """
         if self.is_full():
-            raise IndexError
+            self.resize(2 * self.capacity())
 
         self.length += 1
         self.the_array[self.length] = element
+        self.keys[self.length] = self.priority(element)
         self.rise(self.length)
 
     def largest_child(self, k: int) -> int:
@@ -49,7 +106,7 @@ class MaxHeap(Generic[T]):
         """
         
         if 2 * k == self.length or \
-                self.the_array[2 * k] > self.the_array[2 * k + 1]:
+                self.keys[2 * k] > self.keys[2 * k + 1]:
             return 2 * k
         else:
             return 2 * k + 1
@@ -57,21 +114,28 @@ class MaxHeap(Generic[T]):
     def sink(self, k: int) -> None:
         """ Make the element at index k sink to the correct position.
             :pre: 1 <= k <= self.length
-            :complexity: ???
+            :complexity: O(log n)
         """
         item = self.the_array[k]
+        item_key = self.keys[k]
 
         while 2 * k <= self.length:
             max_child = self.largest_child(k)
-            if self.the_array[max_child] <= item:
+            if self.keys[max_child] <= item_key:
                 break
             self.the_array[k] = self.the_array[max_child]
+            self.keys[k] = self.keys[max_child]
             k = max_child
 
         self.the_array[k] = item
+        self.keys[k] = item_key
         
     def get_max(self) -> T:
-        """ Remove (and return) the maximum element from the heap. """
+        """
+        Remove (and return) the maximum element from the heap, halving the
+        backing array once it is only a quarter full.
+        :complexity: O(log n) amortised
+        """
         if self.length == 0:
             raise IndexError
 
@@ -79,22 +143,232 @@ class MaxHeap(Generic[T]):
         self.length -= 1
         if self.length > 0:
             self.the_array[1] = self.the_array[self.length+1]
+            self.keys[1] = self.keys[self.length+1]
             self.sink(1)
+        # drop the stale references so the element can be collected
+        self.the_array[self.length+1] = None
+        self.keys[self.length+1] = None
+        self.shrink()
         return max_elt
 
+    def peek_max(self) -> T:
+        """
+        Return the maximum element without removing it.
+        :complexity: O(1)
+        """
+        if self.length == 0:
+            raise IndexError
+        return self.the_array[1]
+
+    def peek_max_key(self) -> object:
+        """
+        Return the key of the maximum element without removing it.
+        :complexity: O(1)
+        """
+        if self.length == 0:
+            raise IndexError
+        return self.keys[1]
+
+    def runner_up_key(self) -> object:
+        """
+        Return the key of the larger child of the maximum, which is the second
+        largest key, or None when the heap holds fewer than two elements.
+        :complexity: O(1)
+        """
+        if self.length < 2:
+            return None
+        return self.keys[self.largest_child(1)]
+
+    def shrink(self) -> None:
+        """
+        Halves the backing array once it is only a quarter full, unless that
+        would go below the capacity hint.
+        :complexity: O(n) when it shrinks, so O(1) amortised
+        """
+        if self.length <= self.capacity() // 4 and self.capacity() // 2 >= self.min_capacity:
+            self.resize(self.capacity() // 2)
+
     def heapify(self, a_list):
         """
-        A function that construct heap from bottom up.
+        A function that construct heap from bottom up, replacing the current
+        elements. The backing array grows to fit a_list if needed.
 
         Complexity:
             O(N)
         """
+        old_length = self.length
+        self.length = 0
+        if self.capacity() < len(a_list):
+            self.resize(len(a_list))
         for i in range(len(a_list)):
             self.the_array[i+1] = a_list[i]
+            self.keys[i+1] = self.priority(a_list[i])
+        for i in range(len(a_list) + 1, old_length + 1):
+            self.the_array[i] = None
+            self.keys[i] = None
+        self.length = len(a_list)
 
         for i in range(len(a_list)//2, 0, -1):
             self.sink(i)
 
+
+class IndexedMaxHeap(MaxHeap[T]):
+    """
+    MaxHeap that knows the slot of every element, so an element can be
+    re-sifted after its priority changes or removed from the middle.
+    Elements are tracked by identity: the element itself is its handle, and
+    the same object cannot be in the heap twice.
+    """
+
+    def __init__(self, max_size: int = MaxHeap.MIN_CAPACITY, key: Callable[[T], object] = None) -> None:
+        """
+        :param max_size: capacity hint, see MaxHeap
+        :param key: priority of an element, see MaxHeap
+        :complexity: O(max_size)
+        """
+        super().__init__(max_size, key)
+        # id(element) -> slot of element in the_array
+        self.index = {}
+
+    def __contains__(self, element: T) -> bool:
+        return id(element) in self.index
+
+    def slot(self, element: T) -> int:
+        """
+        Returns the slot of element.
+        :raises KeyError: when element is not in the heap
+        :complexity: O(1)
+        """
+        try:
+            return self.index[id(element)]
+        except KeyError:
+            raise KeyError('Element not in heap: {0!r}'.format(element)) from None
+
+    def rise(self, k: int) -> None:
+        """
+        Rise element at index k to its correct position, updating the slots it passes
+        :pre: 1 <= k <= self.length
+        """
+        item = self.the_array[k]
+        item_key = self.keys[k]
+        while k > 1 and item_key > self.keys[k // 2]:
+            parent = self.the_array[k // 2]
+            self.the_array[k] = parent
+            self.keys[k] = self.keys[k // 2]
+            self.index[id(parent)] = k
+            k = k // 2
+        self.the_array[k] = item
+        self.keys[k] = item_key
+        self.index[id(item)] = k
+
+    def sink(self, k: int) -> None:
+        """ Make the element at index k sink to the correct position, updating the slots it passes.
+            :pre: 1 <= k <= self.length
+            :complexity: O(log n)
+        """
+        item = self.the_array[k]
+        item_key = self.keys[k]
+
+        while 2 * k <= self.length:
+            max_child = self.largest_child(k)
+            if self.keys[max_child] <= item_key:
+                break
+            child = self.the_array[max_child]
+            self.the_array[k] = child
+            self.keys[k] = self.keys[max_child]
+            self.index[id(child)] = k
+            k = max_child
+
+        self.the_array[k] = item
+        self.keys[k] = item_key
+        self.index[id(item)] = k
+
+    def add(self, element: T) -> bool:
+        """
+        Swaps elements while rising
+        :raises ValueError: when element is already in the heap
+        :complexity: O(log n) amortised
+        """
+        if element in self:
+            raise ValueError('Element already in heap')
+        super().add(element)
+
+    def get_max(self) -> T:
+        """
+        Remove (and return) the maximum element from the heap.
+        :complexity: O(log n) amortised
+        """
+        max_elt = super().get_max()
+        del self.index[id(max_elt)]
+        return max_elt
+
+    def heapify(self, a_list):
+        """
+        A function that construct heap from bottom up, replacing the current elements.
+
+        Complexity:
+            O(N)
+        """
+        if len({id(element) for element in a_list}) != len(a_list):
+            raise ValueError('Element already in heap')
+        super().heapify(a_list)
+        # sink only records the slots it visits, so record every slot afresh
+        self.index = {id(self.the_array[i]): i for i in range(1, self.length + 1)}
+
+    def update(self, element: T) -> None:
+        """
+        Moves element to its correct position after its priority changed in
+        either direction, recomputing its key once.
+        :raises KeyError: when element is not in the heap
+        :complexity: O(log n)
+        """
+        k = self.slot(element)
+        self.keys[k] = self.priority(element)
+        self.rise(k)
+        self.sink(self.index[id(element)])
+
+    def remove(self, element: T) -> None:
+        """
+        Removes element from wherever it is in the heap.
+        :raises KeyError: when element is not in the heap
+        :complexity: O(log n) amortised
+        """
+        k = self.slot(element)
+        del self.index[id(element)]
+        last = self.the_array[self.length]
+        last_key = self.keys[self.length]
+        self.the_array[self.length] = None
+        self.keys[self.length] = None
+        self.length -= 1
+        if k <= self.length:
+            # the last element fills the hole, then moves whichever way it must
+            self.the_array[k] = last
+            self.keys[k] = last_key
+            self.rise(k)
+            self.sink(self.index[id(last)])
+        self.shrink()
+
+    def replace_top(self, element: T) -> T:
+        """
+        Removes the maximum element and adds element in its place with a single
+        sink (heapreplace semantics). element may be the current maximum itself,
+        which simply re-sifts it after a priority change.
+        :raises IndexError: when the heap is empty
+        :raises ValueError: when element is elsewhere in the heap
+        :complexity: O(log n)
+        """
+        if self.length == 0:
+            raise IndexError
+        top = self.the_array[1]
+        if element is not top and element in self:
+            raise ValueError('Element already in heap')
+        del self.index[id(top)]
+        self.the_array[1] = element
+        self.keys[1] = self.priority(element)
+        self.sink(1)
+        return top
+
+
 if __name__ == '__main__':
     items = [ int(x) for x in input('Enter a list of numbers: ').strip().split() ]
     heap = MaxHeap(len(items))
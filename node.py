@@ -11,9 +11,9 @@ __author__ = 'Maria Garcia de la Banda and Brendon Taylor. Modified by Alexey Ig
 __docformat__ = 'reStructuredText'
 
 
-@dataclass
+@dataclass(slots=True)
 class TreeNode(Generic[K, I]):
-    """ Node class represent BST nodes. """
+    """ Node class represent BST nodes, slotted so that no per-node __dict__ is allocated. """
 
     key: K
     item: I = None
@@ -21,6 +21,8 @@ class TreeNode(Generic[K, I]):
     right: TreeNode|None = None
     # This value should be maintained by yourself in bst.py
     subtree_size: int = 1
+    # How many times key was inserted, only ever above 1 in a multiset tree
+    count: int = 1
 
     def set_subtree_size(self, subtree_size: int) -> None:
         self.subtree_size = subtree_size
@@ -33,3 +35,11 @@ class TreeNode(Generic[K, I]):
         key = str(self.key) if type(self.key) != str else "'{0}'".format(self.key)
         item = str(self.item) if type(self.item) != str else "'{0}'".format(self.item)
         return '({0}, {1}, [{2}])'.format(key, item, self.subtree_size)
+
+
+@dataclass(slots=True)
+class AVLTreeNode(TreeNode[K, I]):
+    """ Node class represent AVL tree nodes, which also track their height. """
+
+    # This value is maintained by avl.py
+    height: int = 1
@@ -0,0 +1,86 @@
+""" Persistent AVL Tree ADT.
+    An AVL tree whose nodes are never modified once another version may see
+    them. Every insertion or deletion copies the O(log n) nodes on the path it
+    touches (plus the few a rotation moves) and shares every other subtree
+    with the previous version, so taking a snapshot is O(1) and the snapshot
+    stays valid while the tree keeps changing.
+"""
+
+from __future__ import annotations
+
+__docformat__ = 'reStructuredText'
+
+from dataclasses import replace
+from typing import TypeVar
+from avl import AVLTree
+from node import AVLTreeNode
+
+# generic types
+K = TypeVar('K')
+I = TypeVar('I')
+
+
+class PersistentAVLTree(AVLTree[K, I]):
+    """
+    AVL tree with O(1) snapshots. Mutating this tree never changes a snapshot,
+    and a snapshot can be read from another thread without locking.
+    """
+
+    def snapshot(self) -> PersistentAVLTree[K, I]:
+        """
+            Returns a tree holding the current version. It shares every node with
+            this tree, and neither sees the other's later changes.
+            :complexity: O(1)
+        """
+        version = type(self)(self.multiset)
+        version.root = self.root
+        version.length = self.length
+        return version
+
+    def insert(self, key: K, item: I) -> PersistentAVLTree[K, I]:
+        """
+            Returns a new version with key inserted, leaving this one unchanged.
+            :raises ValueError: when the key is already present outside a multiset
+            :complexity: O(CompK * log n)
+        """
+        version = self.snapshot()
+        version[key] = item
+        return version
+
+    def delete(self, key: K) -> PersistentAVLTree[K, I]:
+        """
+            Returns a new version with one copy of key deleted, leaving this one unchanged.
+            :raises ValueError: when the key is not present
+            :complexity: O(CompK * log n)
+        """
+        version = self.snapshot()
+        del version[key]
+        return version
+
+    def copy_node(self, current: AVLTreeNode) -> AVLTreeNode:
+        """
+            Returns a private copy of current that can be modified freely, so
+            insert_aux and delete_aux copy the path they touch (None for None).
+            :complexity: O(1)
+        """
+        if current is None:
+            return None
+        return replace(current)
+
+    def left_rotate(self, current: AVLTreeNode) -> AVLTreeNode:
+        """
+            Perform left rotation around current, copying both nodes it relinks.
+            :complexity: O(1)
+        """
+        current = self.copy_node(current)
+        current.right = self.copy_node(current.right)
+        return super().left_rotate(current)
+
+    def right_rotate(self, current: AVLTreeNode) -> AVLTreeNode:
+        """
+            Perform right rotation around current, copying both nodes it relinks.
+            :complexity: O(1)
+        """
+        current = self.copy_node(current)
+        current.left = self.copy_node(current.left)
+        return super().right_rotate(current)
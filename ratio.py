@@ -1,28 +1,482 @@
 from __future__ import annotations
-from typing import Generic, TypeVar
+from typing import Callable, Generic, Iterable, Iterator, TypeVar
+from array import array
+from collections import Counter, OrderedDict, deque, namedtuple
+from contextlib import contextmanager
+from heapq import merge
 from math import ceil
-from bst import BinarySearchTree
+import pickle
+import struct
+import sys
+import threading
+import time
+from avl import AVLTree
+from persistent_avl import PersistentAVLTree
+from array_bst import ArrayBinarySearchTree, typecode_accepts
+from sketch import LogHistogramSketch
+from sorted_array import SortedArrayStore
+from rwlock import ReadWriteLock
 
 T = TypeVar("T")
 I = TypeVar("I")
 
+def key_typecode(points: list[T]) -> str | None:
+    """
+    Picks the array typecode able to hold every point exactly.
+
+    - Args:
+        - list[T]: points to be checked
+    - Returns:
+        - str | None: 'q' for ints, 'd' for floats (and ints within 2**53), None otherwise
+    - Raises:
+        -None
+    - Complexity:
+        O(n) where n is the number of points
+    """
+    typecode = 'q'
+    for point in points:
+        if type(point) is float:
+            typecode = 'd'
+        elif not typecode_accepts('q', point):
+            return None
+    if typecode == 'd' and not all(typecode_accepts('d', point) for point in points):
+        return None
+    return typecode
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+def merge_counts(*streams: Iterable[tuple[T, I, int]]) -> Iterator[tuple[T, I, int]]:
+    """
+    Merges sorted (key, item, count) streams, adding up the counts of equal keys.
+
+    - Args:
+        - Iterable: streams in strictly increasing key order
+    - Returns:
+        - Iterator: the merged stream, in strictly increasing key order
+    - Raises:
+        -None
+    - Complexity:
+        O(N log k) where N is the total number of entries and k the number of streams
+    """
+    current = None
+    for key, item, count in merge(*streams, key=lambda entry: entry[0]):
+        if current is not None and current[0] == key:
+            current[2] += count
+        else:
+            if current is not None:
+                yield tuple(current)
+            current = [key, item, count]
+    if current is not None:
+        yield tuple(current)
+
+
+def pack_array(typecode: str, values: Iterable) -> bytes:
+    """ Little-endian bytes of values stored in an array of typecode. """
+
+    packed = array(typecode, values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_array(typecode: str, data: bytes, offset: int, n: int) -> tuple[array, int]:
+    """ Reads n little-endian values of typecode from data at offset, returning them and the new offset. """
+
+    unpacked = array(typecode)
+    end = offset + n * unpacked.itemsize
+    unpacked.frombytes(data[offset:end])
+    if sys.byteorder == 'big':
+        unpacked.byteswap()
+    return unpacked, end
+
+
 class Percentiles(Generic[T]):
+    """
+    Multiset of points answering percentile queries. Repeated points are kept
+    as a count on a single tree node, so memory grows with the number of
+    distinct points while ranks still count every copy.
+    The 'sketch' backend instead keeps an approximate LogHistogramSketch.
+    """
 
-    def __init__(self) -> None:
+    EXACT_BACKENDS = ('auto', 'tree', 'array', 'numpy', 'persistent')
+    # serialised by index, so new backends go at the end
+    BACKENDS = ('auto', 'tree', 'array', 'sketch', 'numpy', 'persistent')
+
+    def __init__(self, backend: str = 'auto', relative_accuracy: float = 0.01, cache_size: int = 128) -> None:
         """
         List initialisation.
 
+        - Args:
+            - str: 'tree' always uses a linked AVLTree, 'array' always uses an
+              ArrayBinarySearchTree (numeric points only) and 'auto' uses the
+              array engine while every point is numeric, falling back to the tree.
+              'numpy' is like 'auto' with a SortedArrayStore as the array engine,
+              and uses the tree when NumPy is not installed.
+              'persistent' always uses a PersistentAVLTree, so snapshot is O(1).
+              'sketch' uses a LogHistogramSketch (numeric points only), whose
+              answers are within relative_accuracy of the exact ones.
+            - float: relative error of the sketch backend, ignored by the others
+            - int: how many ratio answers are cached, 0 disables the cache
+        - Returns:
+            - None
+        - Raises:
+            - ValueError: when the backend is unknown
+        - Complexity:
+            O(1)
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError('Unknown backend: {0}'.format(backend))
+        self.backend = backend
+        if backend == 'sketch':
+            self.store = LogHistogramSketch(relative_accuracy)
+        else:
+            self.store = self.tree_engine()(multiset=True)
+        # bumped by every mutation, so cached answers from older versions are stale
+        self.version = 0
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def cache_info(self) -> CacheInfo:
+        """
+        Function returns the ratio cache statistics, for exporting as metrics.
+
         - Args:
             - None
         - Returns:
+            - CacheInfo: hits, misses, maxsize and currsize of the cache
+        - Raises:
+            -None
+        - Complexity:
+            O(1)
+        """
+        return CacheInfo(self.cache_hits, self.cache_misses, self.cache_size, len(self.cache))
+
+    def tree_engine(self) -> type:
+        """
+        Function returns the class non-numeric points are kept in by this backend.
+
+        - Args:
             - None
+        - Returns:
+            - type: PersistentAVLTree for the 'persistent' backend, AVLTree otherwise
+        - Raises:
+            -None
+        - Complexity:
+            O(1)
+        """
+        return PersistentAVLTree if self.backend == 'persistent' else AVLTree
+
+    def array_engine(self) -> type | None:
+        """
+        Function returns the class numeric points are kept in by this backend.
+
+        - Args:
+            - None
+        - Returns:
+            - type | None: ArrayBinarySearchTree or SortedArrayStore, or None when
+              every point goes in an AVLTree
         - Raises:
             -None
         - Complexity:
             O(1)
         """
-        self.store = BinarySearchTree()
-    
+        if self.backend in ('auto', 'array'):
+            return ArrayBinarySearchTree
+        if self.backend == 'numpy' and SortedArrayStore.available():
+            return SortedArrayStore
+        return None
+
+    def cache_clear(self) -> None:
+        """
+        Function empties the ratio cache and resets its statistics.
+
+        - Complexity:
+            O(1)
+        """
+        self.cache.clear()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @classmethod
+    def from_points(cls, points: Iterable[T], backend: str = 'auto', relative_accuracy: float = 0.01) -> Percentiles[T]:
+        """
+        Build a Percentiles holding every given point in one go.
+
+        - Args:
+            - Iterable[T]: points to be added
+            - str: the backend, see __init__
+            - float: relative error of the sketch backend
+        - Returns:
+            - Percentiles: the filled storage
+        - Raises:
+            - TypeError: when the array backend is given a non-numeric point
+        - Complexity:
+            O(n log n) where n is the number of points
+        """
+        p = cls(backend=backend, relative_accuracy=relative_accuracy)
+        if backend == 'sketch':
+            for point in points:
+                p.store.add(point)
+            return p
+        points = list(points)
+        engine = p.array_engine()
+        typecode = key_typecode(points) if engine is not None else None
+        if typecode is not None:
+            p.store = engine.from_items(((point, point) for point in points), typecode=typecode, multiset=True)
+        elif backend == 'array' and points:
+            raise TypeError('Array backend only stores int or float points')
+        else:
+            p.store = p.tree_engine().from_items(((point, point) for point in points), multiset=True)
+        return p
+
+    def load_counts(self, entries: list[tuple[T, I, int]]) -> None:
+        """
+        Replaces the exact store with a balanced one built from sorted entries.
+
+        - Args:
+            - list: (point, point, count) entries in strictly increasing order
+        - Returns:
+            - None
+        - Raises:
+            - TypeError: when the array backend is given a non-numeric point
+        - Complexity:
+            O(n) where n is the number of entries
+        """
+        typecode = None
+        engine = self.array_engine()
+        if engine is not None:
+            typecode = key_typecode([entry[0] for entry in entries])
+        if typecode is not None:
+            self.store = engine.from_counts(entries, presorted=True, typecode=typecode)
+        elif self.backend == 'array' and entries:
+            raise TypeError('Array backend only stores int or float points')
+        else:
+            self.store = self.tree_engine().from_counts(entries, presorted=True)
+        self.version += 1
+
+    def merge(self, other: Percentiles[T]) -> None:
+        """
+        Adds every point of other into this storage.
+
+        - Args:
+            - Percentiles: the storage to be merged in, which is left unchanged
+        - Returns:
+            - None
+        - Raises:
+            - TypeError: when other is approximate but this storage is exact
+            - ValueError: when both are sketches with different relative accuracies
+        - Complexity:
+            O(n + m) where n and m are the numbers of distinct points in each storage,
+            or O(B) for a sketch with B buckets
+        """
+        if self.backend == 'sketch':
+            if other.backend == 'sketch':
+                self.store.merge(other.store)
+            else:
+                for point, _, count in other.store.iter_counts():
+                    self.store.add(point, count)
+            self.version += 1
+        elif other.backend == 'sketch':
+            raise TypeError('Cannot merge an approximate sketch into exact Percentiles')
+        else:
+            self.load_counts(list(merge_counts(self.store.iter_counts(), other.store.iter_counts())))
+
+    def snapshot(self) -> Percentiles[T]:
+        """
+        Function returns an independent copy holding the current points, for
+        reporting while this storage keeps changing.
+
+        - Args:
+            - None
+        - Returns:
+            - Percentiles: a copy with the same backend and points
+        - Raises:
+            -None
+        - Complexity:
+            O(1) for the 'persistent' backend, whose copy shares every node,
+            otherwise O(n) where n is the number of distinct points, or O(B) for a sketch with B buckets
+        """
+        if isinstance(self.store, PersistentAVLTree):
+            copy = Percentiles(self.backend, cache_size=self.cache_size)
+            copy.store = self.store.snapshot()
+            return copy
+        return Percentiles.union(self)
+
+    @classmethod
+    def union(cls, *many: Percentiles[T]) -> Percentiles[T]:
+        """
+        Build a new Percentiles holding the points of every given storage.
+
+        - Args:
+            - Percentiles: the storages to be combined, which are left unchanged
+        - Returns:
+            - Percentiles: the combined storage, with the backend of the first one
+        - Raises:
+            - TypeError: when a sketch is combined into an exact first storage
+        - Complexity:
+            O(N log k) where N is the total number of distinct points and k the number of storages
+        """
+        if not many:
+            return cls()
+        first = many[0]
+        if first.backend == 'sketch':
+            result = cls(backend='sketch', relative_accuracy=first.store.relative_accuracy)
+            for p in many:
+                result.merge(p)
+            return result
+        if any(p.backend == 'sketch' for p in many):
+            raise TypeError('Cannot merge an approximate sketch into exact Percentiles')
+        result = cls(backend=first.backend)
+        result.load_counts(list(merge_counts(*(p.store.iter_counts() for p in many))))
+        return result
+
+    # magic, backend index, payload kind ('q'/'d' numeric, 'm' ints and floats, 'o' pickled objects, 's' sketch)
+    HEADER = struct.Struct('<4sBc')
+    MAGIC = b'PCTL'
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialises the storage so it can be shipped to another process.
+        Numeric points and sketches are written as packed arrays of keys and counts;
+        other points fall back to pickle.
+
+        - Args:
+            - None
+        - Returns:
+            - bytes: data accepted by from_bytes
+        - Raises:
+            -None
+        - Complexity:
+            O(n) where n is the number of distinct points, or O(B) for a sketch with B buckets
+        """
+        backend = self.BACKENDS.index(self.backend)
+        store = self.store
+        if self.backend == 'sketch':
+            parts = [self.HEADER.pack(self.MAGIC, backend, b's'),
+                     struct.pack('<dqq', store.relative_accuracy, store.max_buckets, store.zeros)]
+            for buckets in (store.positive, store.negative):
+                indices = buckets.indices()
+                floor = buckets.floor if buckets.floor is not None else 0
+                parts.append(struct.pack('<?qq', buckets.floor is not None, floor, len(indices)))
+                parts.append(pack_array('q', indices))
+                parts.append(pack_array('q', (buckets.counts[index] for index in indices)))
+            return b''.join(parts)
+
+        entries = list(store.iter_counts())
+        keys = [entry[0] for entry in entries]
+        typecode = key_typecode(keys)
+        if typecode is None:
+            return self.HEADER.pack(self.MAGIC, backend, b'o') + \
+                pickle.dumps([(entry[0], entry[2]) for entry in entries])
+        parts = [self.HEADER.pack(self.MAGIC, backend, typecode.encode()),
+                 struct.pack('<q', len(entries)),
+                 pack_array(typecode, keys),
+                 pack_array('q', (entry[2] for entry in entries))]
+        if typecode == 'd' and any(type(key) is int for key in keys):
+            # flag the ints packed as floats, so they are read back as ints
+            parts[0] = self.HEADER.pack(self.MAGIC, backend, b'm')
+            parts.append(pack_array('b', (type(key) is int for key in keys)))
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Percentiles[T]:
+        """
+        Rebuilds a storage written by to_bytes. Only load data from a trusted
+        source, as non-numeric points are unpickled.
+
+        - Args:
+            - bytes: the serialised storage
+        - Returns:
+            - Percentiles: the rebuilt storage, with its original backend
+        - Raises:
+            - ValueError: when data was not written by to_bytes
+        - Complexity:
+            O(n) where n is the number of distinct points, or O(B) for a sketch with B buckets
+        """
+        magic, backend, kind = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC:
+            raise ValueError('Not a serialised Percentiles')
+        backend = cls.BACKENDS[backend]
+        offset = cls.HEADER.size
+
+        if kind == b's':
+            relative_accuracy, max_buckets, zeros = struct.unpack_from('<dqq', data, offset)
+            offset += struct.calcsize('<dqq')
+            p = cls(backend='sketch', relative_accuracy=relative_accuracy)
+            p.store = LogHistogramSketch(relative_accuracy, max_buckets)
+            p.store.zeros = zeros
+            for buckets in (p.store.positive, p.store.negative):
+                has_floor, floor, n = struct.unpack_from('<?qq', data, offset)
+                offset += struct.calcsize('<?qq')
+                indices, offset = unpack_array('q', data, offset, n)
+                counts, offset = unpack_array('q', data, offset, n)
+                for index, count in zip(indices, counts):
+                    buckets.add(index, count)
+                if has_floor:
+                    buckets.floor = floor
+            return p
+
+        p = cls(backend=backend)
+        if kind == b'o':
+            entries = [(key, key, count) for key, count in pickle.loads(data[offset:])]
+        else:
+            (n,) = struct.unpack_from('<q', data, offset)
+            offset += struct.calcsize('<q')
+            keys, offset = unpack_array('d' if kind == b'm' else kind.decode(), data, offset, n)
+            counts, offset = unpack_array('q', data, offset, n)
+            if kind == b'm':
+                flags, offset = unpack_array('b', data, offset, n)
+                keys = [int(key) if flag else key for key, flag in zip(keys, flags)]
+            entries = [(key, key, count) for key, count in zip(keys, counts)]
+        p.load_counts(entries)
+        return p
+
+    def prepare_store(self, items: list[T]) -> None:
+        """
+        Makes sure self.store can hold every one of items, switching engines
+        at most once if it can't. The engine is chosen from the whole batch
+        together with the stored keys, so adding the items one at a time
+        would end up with the same engine.
+
+        - Args:
+            - list[T]: items about to be added
+        - Returns:
+            - None
+        - Raises:
+            - TypeError: when the array backend is given points it cannot hold exactly
+            - ValueError: when an item is NaN
+        - Complexity:
+            O(b) where b is the number of items, plus O(n) when it switches engines,
+            where n is the length of self.store
+        """
+        store = self.store
+        engine = self.array_engine()
+        if isinstance(store, engine):
+            if all(store.accepts(item) for item in items):
+                return
+            if not store.is_empty() and store.typecode == 'q':
+                # an int array meeting its first float is widened if every key stays exact
+                typecode = key_typecode([store.select(1), store.select(len(store))] + items)
+                if typecode is not None:
+                    self.store = engine.from_counts(store.iter_counts(), presorted=True, typecode=typecode)
+                    return
+        elif not store.is_empty():
+            return  # already fell back to the linked tree
+
+        if store.is_empty():
+            typecode = key_typecode(items)
+            if typecode is not None:
+                self.store = engine(typecode, multiset=True)
+                return
+        if self.backend == 'array':
+            raise TypeError('Array backend only stores int or float points that fit one array exactly, '
+                            'got {0!r}'.format(items if len(items) > 1 else items[0]))
+        self.store = self.tree_engine().from_counts(store.iter_counts(), presorted=True)
+
     def add_point(self, item: T):
         """
         Function to add T into storage.
@@ -32,26 +486,136 @@ class Percentiles(Generic[T]):
         - Returns:
             - None
         - Raises:
-            -None
+            - TypeError: when the array backend is given a non-numeric point
         - Complexity:
-            O(log n) where n is the length of self.store
+            O(log n) where n is the length of self.store, or O(n) when it switches engines
         """
+        if self.array_engine() is not None:
+            self.prepare_store([item])
         self.store[item] = item
-    
+        self.version += 1
+
     def remove_point(self, item: T):
         """
-        Function to remove T from storage.
+        Function to remove one copy of T from storage.
 
         - Args:
             - T: item to be removed.
         - Returns:
             - None
         - Raises:
-            -None
+            - ValueError: when item is not stored
         - Complexity:
             O(log n) where n is the length of self.store
         """
         del self.store[item]
+        self.version += 1
+
+    def add_points(self, items: Iterable[T]) -> None:
+        """
+        Function to add a batch of T into storage. The batch is sorted once and
+        merged into the tree in a single rebuild when it is large relative to it.
+
+        - Args:
+            - Iterable[T]: items to be added
+        - Returns:
+            - None
+        - Raises:
+            - TypeError: when the array backend is given a non-numeric point
+        - Complexity:
+            O(b log b + min(b log n, n + b)) where b is the batch size and n the length of self.store
+        """
+        items = list(items)
+        if self.array_engine() is not None and items:
+            self.prepare_store(items)
+        self.store.insert_many((item, item) for item in items)
+        self.version += 1
+
+    def remove_points(self, items: Iterable[T]) -> None:
+        """
+        Function to remove one copy of every T in a batch from storage.
+
+        - Args:
+            - Iterable[T]: items to be removed, repeated to remove several copies
+        - Returns:
+            - None
+        - Raises:
+            - ValueError: when an item is not stored, in which case none are removed
+        - Complexity:
+            O(b log b + min(b log n, n + b)) where b is the batch size and n the length of self.store
+        """
+        try:
+            self.store.delete_many(items)
+        finally:
+            # a failed batch leaves the points unchanged, but cached answers are dropped anyway
+            self.version += 1
+
+    def percentile_of(self, item: T) -> float:
+        """
+        Function returns the percentage of stored points that are smaller than item.
+
+        - Args:
+            - T: item to be ranked, which need not be stored
+        - Returns:
+            - float: a percentage between 0 and 100
+        - Raises:
+            - ValueError: when no point is stored
+        - Complexity:
+            O(log n) where n is the length of self.store
+        """
+        if len(self.store) == 0:
+            raise ValueError('No points stored')
+        return 100 * self.store.count_less(item) / len(self.store)
+
+    def quantile(self, x: float) -> T:
+        """
+        Function returns the point at the x-th percentile, using the nearest rank.
+
+        - Args:
+            - float: the percentile, between 0 and 100
+        - Returns:
+            - T: the smallest point with at least x% of the points at or below it
+        - Raises:
+            - ValueError: when no point is stored or x is out of range
+        - Complexity:
+            O(log n) where n is the length of self.store, O(B) for the sketch with B buckets
+        """
+        if len(self.store) == 0:
+            raise ValueError('No points stored')
+        if not 0 <= x <= 100:
+            raise ValueError('Percentile out of range: {0}'.format(x))
+        return self.store.select(max(1, ceil(x * len(self.store) / 100)))
+
+    def rank(self, item: T) -> int:
+        """
+        Function returns the position of a stored item in sorted order, counting from 1.
+
+        - Args:
+            - T: item to be ranked
+        - Returns:
+            - int: the rank of item
+        - Raises:
+            - KeyError: when item is not stored
+        - Complexity:
+            O(log n) where n is the length of self.store
+        """
+        return self.store.rank(item)
+
+    def count_between(self, lo: T, hi: T) -> int:
+        """
+        Function returns the number of stored points with lo <= point <= hi.
+
+        - Args:
+            - T: lower bound (inclusive)
+            - T: upper bound (inclusive)
+        - Returns:
+            - int: the number of points within the bounds
+        - Raises:
+            -None
+        - Complexity:
+            O(log n) where n is the length of self.store
+        """
+        return self.store.count_between(lo, hi)
 
     def ratio(self, x: int, y: int) -> list[int]:
         """
@@ -65,10 +629,481 @@ class Percentiles(Generic[T]):
         - Raises:
             -None
         - Complexity:
-            O()
+            O(O) on a cache hit, where O is the length of return list,
+            otherwise O(log n + O) where n is the length of self.store
+        """
+        if self.cache_size <= 0:
+            return self.store.ratio(x, y)
+        cached = self.cache_lookup((x, y))
+        if cached is not None:
+            return cached
+        result = self.store.ratio(x, y)
+        self.cache_store((x, y), result)
+        return list(result)
+
+    def cache_lookup(self, key: tuple) -> list | None:
+        """
+        Function returns a copy of the cached answer for key, if it is still current.
+
+        - Args:
+            - tuple: the (x, y) arguments of ratio
+        - Returns:
+            - list | None: the answer, or None on a miss
+        - Raises:
+            -None
+        - Complexity:
+            O(O) where O is the length of the answer
+        """
+        cached = self.cache.get(key)
+        if cached is not None and cached[0] == self.version:
+            self.cache_hits += 1
+            self.cache.move_to_end(key)
+            return list(cached[1])
+        self.cache_misses += 1
+        return None
+
+    def cache_store(self, key: tuple, result: list) -> None:
+        """
+        Function caches the answer for key, evicting the least recently used one when full.
+
+        - Args:
+            - tuple: the (x, y) arguments of ratio
+            - list: the answer, which must not be handed out uncopied
+        - Returns:
+            - None
+        - Raises:
+            -None
+        - Complexity:
+            O(1)
+        """
+        self.cache[key] = (self.version, result)
+        self.cache.move_to_end(key)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+
+class WindowedPercentiles(Percentiles[T]):
+    """
+    Percentiles over the points added in the last window seconds.
+    Points are queued in arrival order and expired in one batch whenever the
+    storage is touched, so no manual remove_point calls are needed.
+    """
+
+    def __init__(self, window: float, backend: str = 'auto', relative_accuracy: float = 0.01,
+                 clock: Callable[[], float] = time.monotonic, cache_size: int = 128) -> None:
+        """
+        List initialisation.
+
+        - Args:
+            - float: how many seconds a point stays in the storage
+            - str: the backend, see Percentiles. 'numpy' is refused: a SortedArrayStore
+              copies its whole array on every removal, so expiring points as the
+              window slides would cost O(n) per add; the tree backends cost O(log n)
+            - float: relative error of the sketch backend
+            - Callable: returns the current time, in the same unit as the timestamps
+            - int: how many ratio answers are cached, 0 disables the cache
+        - Returns:
+            - None
+        - Raises:
+            - ValueError: when the window is not positive, or the backend is unknown or 'numpy'
+        - Complexity:
+            O(1)
+        """
+        if window <= 0:
+            raise ValueError('Window must be positive')
+        if backend == 'numpy':
+            raise ValueError("The 'numpy' backend removes points in O(n), use 'auto', 'tree' or 'persistent'")
+        super().__init__(backend, relative_accuracy, cache_size)
+        self.window = window
+        self.clock = clock
+        # (timestamp, point) in arrival order
+        self.queue = deque()
+        # points removed by hand that are still waiting in the queue
+        self.removed = Counter()
+
+    @classmethod
+    def from_points(cls, points: Iterable[T], window: float, backend: str = 'auto', relative_accuracy: float = 0.01,
+                    clock: Callable[[], float] = time.monotonic, timestamp: float = None) -> WindowedPercentiles[T]:
+        """
+        Build a WindowedPercentiles holding every given point, all recorded at timestamp.
+
+        - Args:
+            - Iterable[T]: points to be added
+            - float: how many seconds a point stays in the storage
+            - str: the backend, see Percentiles
+            - float: relative error of the sketch backend
+            - Callable: returns the current time, in the same unit as the timestamps
+            - float: when the points were recorded, defaults to now
+        - Returns:
+            - WindowedPercentiles: the filled storage
+        - Raises:
+            - TypeError: when the array backend is given a non-numeric point
+            - ValueError: when the window is not positive, or the backend is unknown or 'numpy'
+        - Complexity:
+            see Percentiles.add_points
+        """
+        p = cls(window, backend, relative_accuracy, clock)
+        p.add_points(points, timestamp)
+        return p
+
+    @classmethod
+    def union(cls, *many: Percentiles[T]) -> Percentiles[T]:
+        """
+        Not supported: the combined points would have no timestamps to expire
+        by. Use Percentiles.union, or merge into a WindowedPercentiles instead.
+
+        - Raises:
+            - TypeError: always
+        """
+        raise TypeError('WindowedPercentiles cannot be built by union, use Percentiles.union or merge')
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Percentiles[T]:
+        """
+        Not supported: to_bytes does not write timestamps, so the points could
+        not expire. Use Percentiles.from_bytes instead.
+
+        - Raises:
+            - TypeError: always
+        """
+        raise TypeError('WindowedPercentiles cannot be loaded from bytes, use Percentiles.from_bytes')
+
+    def advance(self, timestamp: float = None) -> float:
+        """
+        Checks that timestamp is not older than the last point added, and expires
+        every point it puts out of the window.
+
+        - Args:
+            - float: when the next points were recorded, defaults to now
+        - Returns:
+            - float: the timestamp to record them with
+        - Raises:
+            - ValueError: when timestamp is older than the last one added
+        - Complexity:
+            see expire
+        """
+        if timestamp is None:
+            timestamp = self.clock()
+        if self.queue and timestamp < self.queue[-1][0]:
+            raise ValueError('Timestamps must not decrease')
+        self.expire(timestamp)
+        return timestamp
+
+    def add_point(self, item: T, timestamp: float = None):
+        """
+        Function to add T into storage, expiring it window seconds after timestamp.
+
+        - Args:
+            - T: item to be added
+            - float: when the item was recorded, defaults to now
+        - Returns:
+            - None
+        - Raises:
+            - ValueError: when timestamp is older than the last one added
+        - Complexity:
+            O(log n) amortised where n is the length of self.store
+        """
+        timestamp = self.advance(timestamp)
+        super().add_point(item)
+        self.queue.append((timestamp, item))
+
+    def add_points(self, items: Iterable[T], timestamp: float = None) -> None:
+        """
+        Function to add a batch of T recorded at the same time into storage.
+
+        - Args:
+            - Iterable[T]: items to be added
+            - float: when the items were recorded, defaults to now
+        - Returns:
+            - None
+        - Raises:
+            - ValueError: when timestamp is older than the last one added
+        - Complexity:
+            see Percentiles.add_points
+        """
+        timestamp = self.advance(timestamp)
+        items = list(items)
+        super().add_points(items)
+        self.queue.extend((timestamp, item) for item in items)
+
+    def merge(self, other: Percentiles[T], timestamp: float = None) -> None:
+        """
+        Adds every point of other into this storage, all recorded at timestamp,
+        so they expire like points added by add_points.
+
+        - Args:
+            - Percentiles: the storage to be merged in, which is left unchanged
+            - float: when the points were recorded, defaults to now
+        - Returns:
+            - None
+        - Raises:
+            - TypeError: when other is a sketch, whose points cannot be time-stamped
+            - ValueError: when timestamp is older than the last one added
+        - Complexity:
+            see Percentiles.merge
+        """
+        if other.backend == 'sketch':
+            raise TypeError('Cannot time-stamp the points of a sketch')
+        timestamp = self.advance(timestamp)
+        # expires a windowed other, and copies a shared one under its lock
+        other = other.snapshot()
+        super().merge(other)
+        self.queue.extend((timestamp, point) for point, _, count in other.store.iter_counts() for _ in range(count))
+
+    def remove_points(self, items: Iterable[T]) -> None:
+        """
+        Function to remove one copy of every T in a batch before they expire.
+
+        - Args:
+            - Iterable[T]: items to be removed
+        - Returns:
+            - None
+        - Raises:
+            - ValueError: when an item is not stored, in which case none are removed
+        - Complexity:
+            see Percentiles.remove_points
+        """
+        self.expire()
+        items = list(items)
+        super().remove_points(items)
+        # reached only when every item was removed, so none is expired twice
+        self.removed.update(items)
+
+    def remove_point(self, item: T):
+        """
+        Function to remove one copy of T from storage before it expires.
+
+        - Args:
+            - T: item to be removed.
+        - Returns:
+            - None
+        - Raises:
+            - ValueError: when item is not stored
+        - Complexity:
+            O(log n) where n is the length of self.store
+        """
+        self.expire()
+        super().remove_point(item)
+        self.removed[item] += 1
+
+    def expire(self, now: float = None) -> None:
+        """
+        Removes every point recorded at or before now - window, in one batch.
+
+        - Args:
+            - float: the current time, defaults to the clock
+        - Returns:
+            - None
+        - Raises:
+            -None
+        - Complexity:
+            O(E log n) where E is the number of expired points, so O(log n) amortised per point
+        """
+        if now is None:
+            now = self.clock()
+        cutoff = now - self.window
+        expired = []
+        while self.queue and self.queue[0][0] <= cutoff:
+            item = self.queue.popleft()[1]
+            if self.removed[item]:
+                self.removed[item] -= 1
+                if not self.removed[item]:
+                    del self.removed[item]
+            else:
+                expired.append(item)
+        if expired:
+            super().remove_points(expired)
+
+    def snapshot(self) -> Percentiles[T]:
+        self.expire()
+        return super().snapshot()
+
+    def to_bytes(self) -> bytes:
+        self.expire()
+        return super().to_bytes()
+
+    def percentile_of(self, item: T) -> float:
+        self.expire()
+        return super().percentile_of(item)
+
+    def quantile(self, x: float) -> T:
+        self.expire()
+        return super().quantile(x)
+
+    def rank(self, item: T) -> int:
+        self.expire()
+        return super().rank(item)
+
+    def count_between(self, lo: T, hi: T) -> int:
+        self.expire()
+        return super().count_between(lo, hi)
+
+    def ratio(self, x: int, y: int) -> list[int]:
+        self.expire()
+        return super().ratio(x, y)
+
+
+class ConcurrentPercentiles(Percentiles[T]):
+    """
+    Percentiles that may be shared between threads. Mutations hold a write
+    lock and queries a read lock, so any number of ratio calls run together
+    while add_point waits for them, and no query sees a half-updated tree.
+    The ratio cache and the lazy sort of the 'numpy' backend have their own
+    small locks, as readers update them.
+
+    The lock is phase-fair, so a busy reader cannot stall add_point forever,
+    but each batch of writes waits for the reads already running. With long
+    ratio calls in flight, writes therefore run far slower than behind a
+    single mutex (benchmarks/bench_concurrent.py shows 15-60x fewer writes
+    per second), in exchange for reads that are not starved by writers.
+    Prefer add_points for bursts of writes.
+    """
+
+    def __init__(self, backend: str = 'auto', relative_accuracy: float = 0.01, cache_size: int = 128) -> None:
+        """
+        List initialisation.
+
+        - Args:
+            - str: the backend, see Percentiles
+            - float: relative error of the sketch backend
+            - int: how many ratio answers are cached, 0 disables the cache
+        - Returns:
+            - None
+        - Raises:
+            - ValueError: when the backend is unknown
+        - Complexity:
+            O(1)
+        """
+        super().__init__(backend, relative_accuracy, cache_size)
+        self.lock = ReadWriteLock()
+        self.cache_lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+
+    @contextmanager
+    def reading(self) -> Iterator[None]:
+        """ Holds the read lock for a query, first sorting any points a lazy store has pending. """
+
+        with self.lock.read_locked():
+            flush = getattr(self.store, 'flush', None)
+            if flush is not None:
+                # writers are shut out, so only this flush can touch the pending points
+                with self.flush_lock:
+                    flush()
+            yield
+
+    def snapshot(self) -> Percentiles[T]:
+        """ See Percentiles.snapshot, holding the read lock. The copy is unshared, so it needs no locking. """
+
+        with self.reading():
+            return super().snapshot()
+
+    def add_point(self, item: T):
+        """ See Percentiles.add_point, holding the write lock. """
+
+        with self.lock.write_locked():
+            super().add_point(item)
+
+    def remove_point(self, item: T):
+        """ See Percentiles.remove_point, holding the write lock. """
+
+        with self.lock.write_locked():
+            super().remove_point(item)
+
+    def add_points(self, items: Iterable[T]) -> None:
+        """ See Percentiles.add_points, holding the write lock. """
+
+        items = list(items)
+        with self.lock.write_locked():
+            super().add_points(items)
+
+    def remove_points(self, items: Iterable[T]) -> None:
+        """ See Percentiles.remove_points, holding the write lock. """
+
+        items = list(items)
+        with self.lock.write_locked():
+            super().remove_points(items)
+
+    def load_counts(self, entries: list[tuple[T, I, int]]) -> None:
+        """ See Percentiles.load_counts, holding the write lock. """
+
+        with self.lock.write_locked():
+            super().load_counts(entries)
+
+    def merge(self, other: Percentiles[T]) -> None:
         """
-        return self.store.ratio(x,y)
+        See Percentiles.merge. A shared other is copied under its own read lock
+        first, so two storages merging into each other cannot deadlock.
+        """
+        if isinstance(other, ConcurrentPercentiles):
+            other = other.snapshot()
+        with self.lock.write_locked():
+            super().merge(other)
+
+    @classmethod
+    def union(cls, *many: Percentiles[T]) -> Percentiles[T]:
+        """ See Percentiles.union, copying every shared storage first. """
+
+        return super().union(*(p.snapshot() if isinstance(p, ConcurrentPercentiles) else p for p in many))
+
+    def to_bytes(self) -> bytes:
+        """ See Percentiles.to_bytes, holding the read lock. """
+
+        with self.reading():
+            return super().to_bytes()
+
+    def percentile_of(self, item: T) -> float:
+        """ See Percentiles.percentile_of, holding the read lock. """
+
+        with self.reading():
+            return super().percentile_of(item)
+
+    def quantile(self, x: float) -> T:
+        """ See Percentiles.quantile, holding the read lock. """
+
+        with self.reading():
+            return super().quantile(x)
+
+    def rank(self, item: T) -> int:
+        """ See Percentiles.rank, holding the read lock. """
+
+        with self.reading():
+            return super().rank(item)
+
+    def count_between(self, lo: T, hi: T) -> int:
+        """ See Percentiles.count_between, holding the read lock. """
+
+        with self.reading():
+            return super().count_between(lo, hi)
+
+    def ratio(self, x: int, y: int) -> list[int]:
+        """ See Percentiles.ratio, holding the read lock. """
+
+        with self.reading():
+            return super().ratio(x, y)
+
+    def cache_lookup(self, key: tuple) -> list | None:
+        """ See Percentiles.cache_lookup, holding the cache lock. """
+
+        with self.cache_lock:
+            return super().cache_lookup(key)
+
+    def cache_store(self, key: tuple, result: list) -> None:
+        """ See Percentiles.cache_store, holding the cache lock. """
+
+        with self.cache_lock:
+            super().cache_store(key, result)
+
+    def cache_info(self) -> CacheInfo:
+        """ See Percentiles.cache_info, holding the cache lock. """
+
+        with self.cache_lock:
+            return super().cache_info()
+
+    def cache_clear(self) -> None:
+        """ See Percentiles.cache_clear, holding the cache lock. """
 
+        with self.cache_lock:
+            super().cache_clear()
 
 
 if __name__ == "__main__":
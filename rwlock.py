@@ -0,0 +1,148 @@
+""" Reader-writer lock.
+    Any number of readers may hold the lock together, or a single writer may
+    hold it alone. Once a writer is waiting no new reader is let in, so a
+    steady stream of readers cannot starve writers; and the readers waiting
+    when a writer leaves all go before the next writer, so a steady stream of
+    writers cannot starve readers either. Likewise the writers waiting when
+    the last reader leaves all go before the next readers, so each phase
+    change is paid for once per batch of writers rather than once per write.
+    The writer may take the write lock again while holding it, so locked
+    methods can call each other.
+
+    Fairness has a price under contention: each write waits for the reads
+    already admitted, so writes run at about the rate of reader phases rather
+    than back to back, far below what a plain mutex (which lets a writer
+    re-acquire ahead of the readers it starves) reports.
+"""
+
+from __future__ import annotations
+
+__docformat__ = 'reStructuredText'
+
+from contextlib import contextmanager
+from typing import Iterator
+import threading
+
+
+class ReadWriteLock:
+    """ Phase-fair reader-writer lock with a reentrant write side. """
+
+    def __init__(self) -> None:
+        """
+            Initialises an unlocked lock.
+            :complexity: O(1)
+        """
+        self.condition = threading.Condition(threading.Lock())
+        self.readers = 0
+        self.waiting_readers = 0
+        self.waiting_writers = 0
+        # set when a writer leaves with readers waiting, until they are all in
+        self.readers_turn = False
+        # writers still to go before the readers, counted when the last reader left
+        self.writers_turn = 0
+        # thread holding the write lock, and how many times it took it
+        self.writer = None
+        self.depth = 0
+
+    def acquire_read(self) -> None:
+        """
+            Blocks until no writer holds the lock and none is waiting (unless it is
+            the readers' turn), then joins the readers.
+            :raises RuntimeError: when the calling thread holds the write lock
+            :complexity: O(1) once woken
+        """
+        with self.condition:
+            if self.writer is threading.current_thread():
+                raise RuntimeError('Cannot read-lock while holding the write lock')
+            self.waiting_readers += 1
+            try:
+                while self.writer is not None or (self.waiting_writers and not self.readers_turn):
+                    self.condition.wait()
+            finally:
+                self.waiting_readers -= 1
+            self.readers += 1
+            if self.waiting_readers == 0:
+                self.readers_turn = False
+
+    def release_read(self) -> None:
+        """
+            Leaves the readers, waking the waiting writers when it was the last one
+            and letting all of them go before the next readers.
+            :raises RuntimeError: when no reader holds the lock
+            :complexity: O(1)
+        """
+        with self.condition:
+            if self.readers == 0:
+                raise RuntimeError('Read lock is not held')
+            self.readers -= 1
+            if self.readers == 0 and self.waiting_writers:
+                self.writers_turn = self.waiting_writers
+                self.condition.notify_all()
+
+    def acquire_write(self) -> None:
+        """
+            Blocks until no reader or other writer holds the lock and the readers
+            let in by the last writer are all in, then takes it.
+            :complexity: O(1) once woken
+        """
+        me = threading.current_thread()
+        with self.condition:
+            if self.writer is me:
+                self.depth += 1
+                return
+            if self.writer is None and not self.readers and not self.readers_turn:
+                # uncontended, skip the bookkeeping of waiting
+                self.writer = me
+                self.depth = 1
+                return
+            self.waiting_writers += 1
+            try:
+                while self.writer is not None or self.readers or self.readers_turn:
+                    self.condition.wait()
+            finally:
+                self.waiting_writers -= 1
+            self.writer = me
+            self.depth = 1
+
+    def release_write(self) -> None:
+        """
+            Releases one hold of the write lock. After the last, hands the lock to the
+            waiting readers unless writers of the current batch are still waiting,
+            and wakes the waiting threads, if any.
+            :raises RuntimeError: when the calling thread does not hold the write lock
+            :complexity: O(1)
+        """
+        with self.condition:
+            if self.writer is not threading.current_thread():
+                raise RuntimeError('Write lock is not held by this thread')
+            self.depth -= 1
+            if self.depth == 0:
+                self.writer = None
+                if self.writers_turn:
+                    self.writers_turn -= 1
+                if not self.waiting_writers:
+                    self.writers_turn = 0
+                if self.waiting_readers and not self.writers_turn:
+                    self.readers_turn = True
+                if self.waiting_readers or self.waiting_writers:
+                    self.condition.notify_all()
+
+    @contextmanager
+    def read_locked(self) -> Iterator[None]:
+        """ Holds the read lock for the body of a with statement. """
+
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self) -> Iterator[None]:
+        """ Holds the write lock for the body of a with statement. """
+
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
@@ -0,0 +1,325 @@
+""" Approximate quantile sketch.
+    A DDSketch-style logarithmic histogram: every value x is counted in the
+    bucket ceil(log_gamma(|x|)), where gamma = (1 + a) / (1 - a) for a
+    relative accuracy a. A bucket's representative is within a relative error
+    of a of every value it holds, so each quantile answer is within a factor
+    (1 +- a) of the exact sample at that rank.
+    Memory is bounded by the number of buckets, not by the number of samples.
+"""
+
+from __future__ import annotations
+
+__docformat__ = 'reStructuredText'
+
+from math import ceil, log
+from typing import Iterable, Iterator
+import sys
+from bst import check_orderable, ratio_bounds
+
+
+class BucketStore:
+    """ Counts per bucket index for values of one sign, with at most max_buckets buckets. """
+
+    def __init__(self, max_buckets: int) -> None:
+        """
+            Initialises an empty store.
+            :complexity: O(1)
+        """
+        self.counts = {}
+        self.max_buckets = max_buckets
+        # indices below floor have been collapsed into floor
+        self.floor = None
+        self.length = 0
+        self.sorted_indices = []
+        self.sorted_valid = True
+
+    def __len__(self) -> int:
+        """ Returns the number of values counted. """
+
+        return self.length
+
+    def add(self, index: int, count: int = 1) -> None:
+        """
+            Counts a value in bucket index.
+            :complexity: O(1) amortised, see collapse
+        """
+        if self.floor is not None and index < self.floor:
+            index = self.floor
+        if index not in self.counts:
+            self.counts[index] = 0
+            self.sorted_valid = False
+        self.counts[index] += count
+        self.length += count
+        if len(self.counts) > self.max_buckets:
+            self.collapse()
+
+    def remove(self, index: int) -> None:
+        """
+            Uncounts a value from bucket index.
+            :raises ValueError: when the bucket is empty
+            :complexity: O(1)
+        """
+        if self.floor is not None and index < self.floor:
+            index = self.floor
+        if index not in self.counts:
+            raise ValueError('Deleting non-existent item')
+        self.counts[index] -= 1
+        self.length -= 1
+        if self.counts[index] == 0:
+            del self.counts[index]
+            self.sorted_valid = False
+
+    def collapse(self) -> None:
+        """
+            Merges the lowest buckets (smallest magnitudes) so only 7/8 of
+            max_buckets remain, leaving room before the next collapse.
+            :complexity: O(B log B) where B is max_buckets, so O(log B)
+            amortised over the B / 8 new buckets that can trigger it
+        """
+        indices = self.indices()
+        keep = max(1, self.max_buckets * 7 // 8)
+        self.floor = indices[len(indices) - keep]
+        for index in indices[:len(indices) - keep]:
+            self.counts[self.floor] += self.counts.pop(index)
+        self.sorted_valid = False
+
+    def indices(self) -> list[int]:
+        """
+            Returns the non-empty bucket indices in increasing order.
+            :complexity: O(B log B) when buckets were added or emptied since the last call, O(1) otherwise
+        """
+        if not self.sorted_valid:
+            self.sorted_indices = sorted(self.counts)
+            self.sorted_valid = True
+        return self.sorted_indices
+
+
+class LogHistogramSketch:
+    """ Approximate multiset of numbers with bounded memory and O(1) amortised insertion. """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048) -> None:
+        """
+            Initialises an empty sketch.
+            :param relative_accuracy: the relative error a of every answer, 0 < a < 1
+            :param max_buckets: the most buckets kept for each sign; once exceeded,
+                the values closest to zero are merged and lose accuracy first
+            :complexity: O(1)
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError('Relative accuracy must be between 0 and 1')
+        if max_buckets < 1:
+            raise ValueError('There must be at least one bucket')
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = log(self.gamma)
+        # magnitudes below this are counted as zero
+        self.min_indexable = sys.float_info.min * self.gamma
+        self.positive = BucketStore(max_buckets)
+        self.negative = BucketStore(max_buckets)
+        self.zeros = 0
+
+    def __len__(self) -> int:
+        """ Returns the number of values counted. """
+
+        return len(self.negative) + self.zeros + len(self.positive)
+
+    def is_empty(self) -> bool:
+        """ Checks to see if the sketch is empty. """
+
+        return len(self) == 0
+
+    def index(self, magnitude: float) -> int:
+        """
+            Bucket index of a positive magnitude.
+            :complexity: O(1)
+        """
+        return ceil(log(magnitude) / self.log_gamma)
+
+    def value(self, index: int) -> float:
+        """
+            Representative of bucket index, within the relative accuracy of all its values.
+            :complexity: O(1)
+        """
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def __setitem__(self, key: float, item=None) -> None:
+        """
+            Counts key, mirroring the tree API. item is ignored: a sketch keeps only counts.
+            :complexity: O(1) amortised
+        """
+        self.add(key)
+
+    def __delitem__(self, key: float) -> None:
+        """
+            Uncounts key, mirroring the tree API.
+            :complexity: O(1)
+        """
+        self.remove(key)
+
+    def add(self, value: float, count: int = 1) -> None:
+        """
+            Counts value.
+            :raises ValueError: when value is NaN
+            :complexity: O(1) amortised
+        """
+        check_orderable(value)
+        if value > self.min_indexable:
+            self.positive.add(self.index(value), count)
+        elif value < -self.min_indexable:
+            self.negative.add(self.index(-value), count)
+        else:
+            self.zeros += count
+
+    def remove(self, value: float) -> None:
+        """
+            Uncounts value. Any value in the same bucket as a counted one is accepted.
+            :raises ValueError: when the bucket of value is empty, or value is NaN
+            :complexity: O(1)
+        """
+        check_orderable(value)
+        if value > self.min_indexable:
+            self.positive.remove(self.index(value))
+        elif value < -self.min_indexable:
+            self.negative.remove(self.index(-value))
+        elif self.zeros > 0:
+            self.zeros -= 1
+        else:
+            raise ValueError('Deleting non-existent item')
+
+    def insert_many(self, items: Iterable[tuple[float, object]]) -> None:
+        """
+            Counts the key of every (key, item) pair, mirroring the tree API.
+            :raises ValueError: when a key is NaN, in which case nothing is counted
+            :complexity: O(b) amortised where b is the batch size
+        """
+        keys = [pair[0] for pair in items]
+        for key in keys:
+            check_orderable(key)
+        for key in keys:
+            self.add(key)
+
+    def delete_many(self, keys: Iterable[float]) -> None:
+        """
+            Uncounts every key, mirroring the tree API.
+            :raises ValueError: when the bucket of a key is empty, in which case nothing is uncounted
+            :complexity: O(b) where b is the batch size
+        """
+        removed = []
+        try:
+            for key in keys:
+                self.remove(key)
+                removed.append(key)
+        except ValueError:
+            for key in removed:
+                self.add(key)
+            raise
+
+    def merge(self, other: LogHistogramSketch) -> None:
+        """
+            Adds every count of other into this sketch, as if its values had been added here.
+            :raises ValueError: when the sketches have different relative accuracies
+            :complexity: O(B) where B is the number of buckets of other
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Cannot merge sketches with different relative accuracies')
+        for index, count in other.positive.counts.items():
+            self.positive.add(index, count)
+        for index, count in other.negative.counts.items():
+            self.negative.add(index, count)
+        self.zeros += other.zeros
+
+    def iter_buckets(self) -> Iterator[tuple[float, int]]:
+        """
+            Yields (representative, count) for every non-empty bucket in increasing value order.
+            :complexity: O(B) where B is the number of buckets
+        """
+        for index in reversed(self.negative.indices()):
+            yield -self.value(index), self.negative.counts[index]
+        if self.zeros:
+            yield 0.0, self.zeros
+        for index in self.positive.indices():
+            yield self.value(index), self.positive.counts[index]
+
+    def select(self, k: int) -> float:
+        """
+            Approximates the kth smallest value, counting from 1.
+            :raises IndexError: when k is not between 1 and len(self)
+            :complexity: O(B) where B is the number of buckets
+        """
+        if not 1 <= k <= len(self):
+            raise IndexError('Rank out of range: {0}'.format(k))
+        for value, count in self.iter_buckets():
+            if k <= count:
+                return value
+            k -= count
+
+    def count_less(self, value: float, inclusive: bool = False) -> int:
+        """
+            Approximates the number of values smaller than value (or equal to it
+            when inclusive). Values sharing value's bucket count as equal to it.
+            :complexity: O(B) where B is the number of buckets
+        """
+        if value > self.min_indexable:
+            bound, sign = self.index(value), 1
+        elif value < -self.min_indexable:
+            bound, sign = self.index(-value), -1
+        else:
+            bound, sign = None, 0
+        count = 0
+        for index, bucket in self.negative.counts.items():
+            if sign >= 0 or index > bound or (inclusive and index == bound):
+                count += bucket
+        if sign > 0 or (sign == 0 and inclusive):
+            count += self.zeros
+        if sign > 0:
+            for index, bucket in self.positive.counts.items():
+                if index < bound or (inclusive and index == bound):
+                    count += bucket
+        return count
+
+    def rank(self, value: float) -> int:
+        """
+            Approximates the position of value in sorted order, counting from 1.
+            :complexity: O(B) where B is the number of buckets
+        """
+        return self.count_less(value) + 1
+
+    def count_between(self, lo: float, hi: float) -> int:
+        """
+            Approximates the number of values with lo <= value <= hi.
+            :complexity: O(B) where B is the number of buckets
+        """
+        if hi < lo:
+            return 0
+        return self.count_less(hi, inclusive=True) - self.count_less(lo)
+
+    def ratio(self, x: float, y: float) -> list[float]:
+        """
+        Function returns the values above the smallest x% and below the largest y%.
+        Each bucket overlapping that window is reported once by its representative,
+        so the list is bounded by the number of buckets.
+
+        - Args:
+            - float: the values have to be greater than x% amongst them
+            - float: the values have to be less than y% amongst them
+        - Returns:
+            - list: bucket representatives within the ratio, in increasing order
+        - Raises:
+            -None
+        - Complexity:
+            O(B) where B is the number of buckets
+        """
+        length = len(self)
+        lb, ub = ratio_bounds(x, y, length)
+        result = []
+        if lb > ub:
+            return result
+        seen = 0
+        for value, count in self.iter_buckets():
+            if seen + count >= lb:
+                result.append(value)
+            seen += count
+            if seen >= ub:
+                break
+        return result
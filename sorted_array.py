@@ -0,0 +1,354 @@
+""" Sorted NumPy array store for numeric keys.
+    Keeps every copy of every key in one sorted NumPy array, plus a plain list
+    of keys added since the last sort. The list is merged in by the first
+    query that needs sorted order, so a burst of insertions costs O(1) each
+    and a single sort. Queries use searchsorted and slicing instead of walking
+    a tree, so they run in NumPy's C loops.
+    NumPy is optional: without it, available() is False and Percentiles keeps
+    its points in a tree instead.
+"""
+
+from __future__ import annotations
+
+__docformat__ = 'reStructuredText'
+
+from typing import Iterable, Iterator, TypeVar
+from array_bst import typecode_accepts
+from bst import check_orderable, ratio_bounds
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# generic types
+K = TypeVar('K')
+I = TypeVar('I')
+
+
+class SortedArrayStore:
+    """ Multiset of int or float keys in a lazily sorted NumPy array. Items are not kept: each key is its own item. """
+
+    TYPECODES = ('q', 'd')
+    DTYPES = {'q': 'int64', 'd': 'float64'}
+
+    def __init__(self, typecode: str = 'd', multiset: bool = True) -> None:
+        """
+            Initialises an empty store.
+            :param typecode: 'q' for int keys or 'd' for float keys
+            :param multiset: must be True, repeated keys are always kept
+            :raises ValueError: when the typecode is unknown or multiset is False
+            :raises ImportError: when NumPy is not installed
+            :complexity: O(1)
+        """
+        if typecode not in self.TYPECODES:
+            raise ValueError('Unknown typecode: {0}'.format(typecode))
+        if not multiset:
+            raise ValueError('SortedArrayStore always keeps repeated keys')
+        if np is None:
+            raise ImportError('SortedArrayStore needs NumPy')
+        self.typecode = typecode
+        self.dtype = np.dtype(self.DTYPES[typecode])
+        self.multiset = True
+        self.values = np.empty(0, self.dtype)
+        # True where an int key was widened to fit a float array, so it is handed
+        # back as an int; None while there is no such key
+        self.int_keys = None
+        # keys added since values was last sorted
+        self.pending = []
+
+    @staticmethod
+    def available() -> bool:
+        """ Whether NumPy is installed, so the store can be used. """
+
+        return np is not None
+
+    @classmethod
+    def from_items(cls, items: Iterable[tuple[K, I]], presorted: bool = False,
+                   typecode: str = 'd', multiset: bool = True) -> SortedArrayStore:
+        """
+            Bulk-loads a store from (key, item) pairs; the items are dropped.
+            :complexity: O(n) if presorted, otherwise O(n log n) where n is the number of pairs
+        """
+        store = cls(typecode, multiset)
+        keys = [pair[0] for pair in items]
+        for key in keys:
+            check_orderable(key)
+        store.values = np.array(keys, store.dtype)
+        store.int_keys = store.widened(keys)
+        if not presorted:
+            store.sort()
+        return store
+
+    @classmethod
+    def from_counts(cls, entries: Iterable[tuple[K, I, int]], presorted: bool = False,
+                    typecode: str = 'd', multiset: bool = True) -> SortedArrayStore:
+        """
+            Bulk-loads a store from (key, item, count) entries; the items are dropped.
+            :complexity: O(n) if presorted, otherwise O(n log n) where n is the number of keys counted
+        """
+        store = cls(typecode, multiset)
+        entries = list(entries)
+        for entry in entries:
+            check_orderable(entry[0])
+        keys = np.fromiter((entry[0] for entry in entries), store.dtype, len(entries))
+        counts = np.fromiter((entry[2] for entry in entries), np.int64, len(entries))
+        store.values = np.repeat(keys, counts)
+        int_keys = store.widened([entry[0] for entry in entries])
+        store.int_keys = None if int_keys is None else np.repeat(int_keys, counts)
+        if not presorted:
+            store.sort()
+        return store
+
+    def accepts(self, key) -> bool:
+        """
+            Checks whether key can be stored exactly in this store's array.
+            :complexity: O(1)
+        """
+        return typecode_accepts(self.typecode, key)
+
+    def widened(self, keys: list[K]):
+        """
+            Flags the int keys this store's float array would widen, or returns
+            None when there are none.
+            :complexity: O(b) where b is the number of keys
+        """
+        if self.typecode != 'd' or not any(type(key) is int for key in keys):
+            return None
+        return np.fromiter((type(key) is int for key in keys), bool, len(keys))
+
+    def sort(self) -> None:
+        """
+            Sorts values, moving the int flags along with them.
+            :complexity: O(n log n)
+        """
+        # stable sort is a merge sort for floats, so a sorted prefix is cheap
+        if self.int_keys is None:
+            self.values.sort(kind='stable')
+        else:
+            order = self.values.argsort(kind='stable')
+            self.values = self.values[order]
+            self.int_keys = self.int_keys[order]
+
+    def flush(self):
+        """
+            Merges the pending keys into the sorted array and returns it.
+            :complexity: O((n + p) log (n + p)) when p keys are pending, O(1) otherwise
+        """
+        if self.pending:
+            pending_ints = self.widened(self.pending)
+            if pending_ints is not None and self.int_keys is None:
+                self.int_keys = np.zeros(len(self.values), bool)
+            if self.int_keys is not None:
+                if pending_ints is None:
+                    pending_ints = np.zeros(len(self.pending), bool)
+                self.int_keys = np.concatenate((self.int_keys, pending_ints))
+            self.values = np.concatenate((self.values, np.array(self.pending, self.dtype)))
+            self.pending = []
+            self.sort()
+        return self.values
+
+    def keys_between(self, start: int, stop: int) -> list[K]:
+        """
+            Returns the sorted keys in positions start to stop - 1 as they were
+            given, so widened ints come back as ints.
+            :complexity: O(stop - start) once sorted
+        """
+        keys = self.flush()[start:stop].tolist()
+        if self.int_keys is not None:
+            for i in np.flatnonzero(self.int_keys[start:stop]).tolist():
+                keys[i] = int(keys[i])
+        return keys
+
+    def distinct(self) -> tuple[list[K], list[int]]:
+        """
+            Returns the distinct keys in increasing order, each as its first copy
+            was given, and how many copies of each are stored.
+            :complexity: O(n) once sorted
+        """
+        values = self.flush()
+        keys, first, counts = np.unique(values, return_index=True, return_counts=True)
+        keys = keys.tolist()
+        if self.int_keys is not None:
+            for i in np.flatnonzero(self.int_keys[first]).tolist():
+                keys[i] = int(keys[i])
+        return keys, counts.tolist()
+
+    def is_empty(self) -> bool:
+        """ Checks to see if the store is empty. """
+
+        return len(self) == 0
+
+    def __len__(self) -> int:
+        """ Returns the number of keys counted, with repeats. """
+
+        return len(self.values) + len(self.pending)
+
+    def __contains__(self, key: K) -> bool:
+        """ Checks to see if key is stored. """
+
+        if key != key or not self.accepts(key):  # a key the array cannot hold exactly is never stored
+            return False
+        values = self.flush()
+        i = int(values.searchsorted(key, 'left'))
+        return i < len(values) and values[i] == key
+
+    def __getitem__(self, key: K) -> K:
+        """
+            Returns key, which is its own item.
+            :raises KeyError: when key is not stored
+            :complexity: O(log n)
+        """
+        if key not in self:
+            raise KeyError('Key not found: {0}'.format(key))
+        return key
+
+    def __setitem__(self, key: K, item: I = None) -> None:
+        """
+            Adds one copy of key. item is ignored.
+            :raises TypeError: when key cannot be stored exactly
+            :raises ValueError: when key is NaN
+            :complexity: O(1) amortised, the sort is deferred to the next query
+        """
+        if not self.accepts(key):
+            raise TypeError('Cannot store {0!r} in a {1} array'.format(key, self.dtype))
+        self.pending.append(key)
+
+    def __delitem__(self, key: K) -> None:
+        """
+            Removes one copy of key.
+            :raises ValueError: when key is not stored
+            :complexity: O(n)
+        """
+        if key not in self:
+            raise ValueError('Deleting non-existent item')
+        values = self.flush()
+        i = int(values.searchsorted(key, 'left'))
+        self.values = np.delete(values, i)
+        if self.int_keys is not None:
+            self.int_keys = np.delete(self.int_keys, i)
+
+    def insert_many(self, items: Iterable[tuple[K, I]]) -> None:
+        """
+            Adds every key of a batch of (key, item) pairs.
+            :raises TypeError: when a key cannot be stored exactly, in which case nothing is added
+            :complexity: O(b) where b is the batch size, the sort is deferred to the next query
+        """
+        keys = [pair[0] for pair in items]
+        for key in keys:
+            if not self.accepts(key):
+                raise TypeError('Cannot store {0!r} in a {1} array'.format(key, self.dtype))
+        self.pending.extend(keys)
+
+    def delete_many(self, keys: Iterable[K]) -> None:
+        """
+            Removes one copy of every key in a batch in a single pass over the array.
+            :raises ValueError: when a key is not stored often enough, in which case nothing is removed
+            :complexity: O(n + b log b) where b is the batch size
+        """
+        values = self.flush()
+        keys = list(keys)
+        if not keys:
+            return
+        for key in keys:
+            if key != key or not self.accepts(key):  # a key the array cannot hold exactly is never stored
+                raise ValueError('Deleting non-existent item')
+        batch = np.array(keys, self.dtype)
+        unique, removed = np.unique(batch, return_counts=True)
+        start = values.searchsorted(unique, 'left')
+        stored = values.searchsorted(unique, 'right') - start
+        if (stored < removed).any():
+            raise ValueError('Deleting non-existent item')
+        # drop the first `removed` copies of each key
+        drop = np.repeat(start, removed) + (np.arange(len(batch)) - np.repeat(np.cumsum(removed) - removed, removed))
+        self.values = np.delete(values, drop)
+        if self.int_keys is not None:
+            self.int_keys = np.delete(self.int_keys, drop)
+
+    def select(self, k: int) -> K:
+        """
+            Returns the kth smallest key, counting from 1.
+            :raises IndexError: when k is not between 1 and len(self)
+            :complexity: O(1) once sorted
+        """
+        if not 1 <= k <= len(self):
+            raise IndexError('Rank out of range: {0}'.format(k))
+        return self.keys_between(k - 1, k)[0]
+
+    def count_less(self, key: K, inclusive: bool = False) -> int:
+        """
+            Counts the keys smaller than key (or equal to it when inclusive).
+            key may be an int the array cannot hold, such as one beyond int64 or
+            one a float array would round.
+            :complexity: O(log n) once sorted
+        """
+        values = self.flush()
+        side = 'right' if inclusive else 'left'
+        if type(key) is int and not self.accepts(key):
+            try:
+                near = float(key) if self.typecode == 'd' else None
+            except OverflowError:
+                near = None
+            if near is None:
+                return 0 if key < 0 else len(values)
+            # stored floats equal to near sit below key when near rounded down
+            side = 'right' if near < key or (near == key and inclusive) else 'left'
+            key = near
+        return int(values.searchsorted(key, side))
+
+    def rank(self, key: K) -> int:
+        """
+            Finds the position of the first copy of key in sorted order, counting from 1.
+            :raises KeyError: when key is not stored
+            :complexity: O(log n) once sorted
+        """
+        if key not in self:
+            raise KeyError('Key not found: {0}'.format(key))
+        return self.count_less(key) + 1
+
+    def count_between(self, lo: K, hi: K) -> int:
+        """
+            Counts the keys with lo <= key <= hi.
+            :complexity: O(log n) once sorted
+        """
+        if hi < lo:
+            return 0
+        return self.count_less(hi, inclusive=True) - self.count_less(lo)
+
+    def __iter__(self) -> Iterator[K]:
+        """ Yields every key in increasing order, once per distinct key. """
+
+        return iter(self.distinct()[0])
+
+    def iter_items(self) -> Iterator[tuple[K, K]]:
+        """ Yields every (key, key) pair in increasing key order, once per distinct key. """
+
+        for key in self:
+            yield key, key
+
+    def iter_counts(self) -> Iterator[tuple[K, K, int]]:
+        """ Yields every (key, key, count) entry in increasing key order. """
+
+        keys, counts = self.distinct()
+        for key, count in zip(keys, counts):
+            yield key, key, count
+
+    def ratio(self, x: float, y: float) -> list[K]:
+        """
+        Function returns the keys above the smallest x% and below the largest y%.
+
+        - Args:
+            - float: the keys have to be greater than x% amongst them
+            - float: the keys have to be less than y% amongst them
+        - Returns:
+            - list: keys within the ratio, in increasing order
+        - Raises:
+            -None
+        - Complexity:
+            O(O) once sorted, where O is the length of return list
+        """
+        length = len(self)
+        lb, ub = ratio_bounds(x, y, length)
+        if lb > ub:
+            return []
+        return self.keys_between(lb - 1, ub)
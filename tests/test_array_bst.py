@@ -0,0 +1,74 @@
+import random
+import unittest
+from ed_utils.decorators import number, visibility
+from ed_utils.timeout import timeout
+
+from array_bst import ArrayBinarySearchTree, NIL
+
+
+class ArrayBSTTest(unittest.TestCase):
+
+    @timeout()
+    @number("1.9")
+    def test_insert_delete(self):
+        random.seed(71)
+        keys = random.sample(range(-10000, 10000), 2000)
+        tree = ArrayBinarySearchTree('q')
+        for key in keys:
+            tree[key] = str(key)
+        self.assertEqual(len(tree), 2000)
+        self.assertEqual(tree.size[tree.root], 2000)
+        self.assertLessEqual(tree.height[tree.root], 16)
+        self.assertEqual(tree[keys[7]], str(keys[7]))
+        with self.assertRaises(ValueError):
+            tree[keys[0]] = "again"
+
+        for key in keys[:1500]:
+            del tree[key]
+        self.assertEqual(len(tree), 500)
+        self.assertNotIn(keys[0], tree)
+        with self.assertRaises(KeyError):
+            tree[keys[0]]
+        with self.assertRaises(ValueError):
+            del tree[keys[0]]
+        self.assertEqual(list(tree), sorted(keys[1500:]))
+
+        # freed slots are reused before the arrays grow
+        slots = len(tree.items)
+        for key in keys[:1000]:
+            tree[key] = key
+        self.assertEqual(len(tree.items), slots)
+
+    @timeout()
+    @number("1.10")
+    def test_kth_and_ratio(self):
+        tree = ArrayBinarySearchTree.from_items([(float(i), i) for i in range(100)], presorted=True)
+        self.assertEqual(tree.keys[tree.kth_smallest(1)], 0.0)
+        self.assertEqual(tree.keys[tree.kth_smallest(100)], 99.0)
+        self.assertEqual(tree.kth_smallest(101), NIL)
+        for i in range(100, 200):
+            tree[float(i)] = i
+        self.assertEqual(tree.ratio(10, 10), [float(i) for i in range(20, 180)])
+        self.assertEqual(tree.ratio(60, 60), [])
+        self.assertEqual(list(tree.iter_items())[:2], [(0.0, 0), (1.0, 1)])
+
+    @timeout()
+    @number("1.17")
+    def test_widened_int_keys(self):
+        tree = ArrayBinarySearchTree.from_items([(i, i) for i in range(1, 6)], typecode='d', multiset=True)
+        tree[2.5] = 2.5
+        tree[3] = 3
+        for key in tree:
+            self.assertIs(type(key), float if key == 2.5 else int)
+        self.assertEqual(tree.ratio(0, 0), [1, 2, 2.5, 3, 3, 4, 5])
+        self.assertEqual([type(key) for key in tree.ratio(0, 0)], [int, int, float, int, int, int, int])
+        self.assertIs(type(tree.select(1)), int)
+        self.assertIs(type(tree.select(3)), float)
+        self.assertEqual([type(entry[0]) for entry in tree.iter_counts()], [int, int, float, int, int, int])
+
+        # a key moved up over a deleted one keeps its type, and so does a reused slot
+        for key in [2, 1, 3, 3]:
+            del tree[key]
+        tree[7] = 7
+        self.assertEqual([type(key) for key, _ in tree.iter_items()], [float, int, int, int])
+        self.assertEqual(list(tree), [2.5, 4, 5, 7])
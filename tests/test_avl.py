@@ -0,0 +1,91 @@
+import random
+import unittest
+from ed_utils.decorators import number, visibility
+from ed_utils.timeout import timeout
+
+from avl import AVLTree
+
+
+def check_node(tree, node):
+    """ Returns the height of node, asserting sizes and balance factors along the way. """
+    if node is None:
+        return 0
+    left = check_node(tree, node.left)
+    right = check_node(tree, node.right)
+    assert abs(left - right) <= 1, "Node {0} is unbalanced".format(node.key)
+    assert node.height == 1 + max(left, right), "Wrong height at {0}".format(node.key)
+    assert node.subtree_size == 1 + tree.get_size(node.left) + tree.get_size(node.right), \
+        "Wrong subtree size at {0}".format(node.key)
+    return node.height
+
+
+class AVLTest(unittest.TestCase):
+
+    @timeout()
+    @number("1.4")
+    def test_sorted_inserts(self):
+        tree = AVLTree()
+        for i in range(1000):
+            tree[i] = str(i)
+        self.assertEqual(len(tree), 1000)
+        self.assertLessEqual(check_node(tree, tree.root), 15)
+        self.assertEqual(tree[500], "500")
+        self.assertEqual(tree.kth_smallest(1, tree.root).key, 0)
+        self.assertEqual(tree.kth_smallest(1000, tree.root).key, 999)
+        with self.assertRaises(ValueError):
+            tree[10] = "again"
+
+    @timeout()
+    @number("1.5")
+    def test_deletions(self):
+        random.seed(1231)
+        keys = list(range(500))
+        random.shuffle(keys)
+        tree = AVLTree()
+        for key in keys:
+            tree[key] = key
+        random.shuffle(keys)
+        for key in keys[:300]:
+            del tree[key]
+            check_node(tree, tree.root)
+        remaining = sorted(keys[300:])
+        self.assertEqual(len(tree), 200)
+        self.assertEqual(tree.root.subtree_size, 200)
+        for k, key in enumerate(remaining, start=1):
+            self.assertEqual(tree.kth_smallest(k, tree.root).key, key)
+        self.assertNotIn(keys[0], tree)
+        with self.assertRaises(ValueError):
+            del tree[keys[0]]
+
+    @timeout()
+    @number("1.8")
+    def test_from_items(self):
+        tree = AVLTree.from_items((i, i) for i in range(1000, 0, -1))
+        check_node(tree, tree.root)
+        for i in range(1001, 1500):
+            tree[i] = i
+        for i in range(1, 400):
+            del tree[i]
+        check_node(tree, tree.root)
+        self.assertEqual(len(tree), 1100)
+        self.assertEqual(tree.kth_smallest(1, tree.root).key, 400)
+
+    @timeout()
+    @number("1.14")
+    def test_batch_updates(self):
+        tree = AVLTree.from_items((i, i) for i in range(0, 1000, 2))
+        # small batch: inserted one key at a time
+        tree.insert_many((i, i) for i in (7, 3, 5))
+        check_node(tree, tree.root)
+        # large batch: merged and rebuilt
+        tree.insert_many((i, i) for i in range(1, 1000, 2) if i not in (3, 5, 7))
+        check_node(tree, tree.root)
+        self.assertEqual(list(tree), list(range(1000)))
+        tree.delete_many([10, 0, 999])
+        tree.delete_many(range(100, 900))
+        check_node(tree, tree.root)
+        self.assertEqual(list(tree), [i for i in range(1, 100) if i != 10] + list(range(900, 999)))
+        with self.assertRaises(ValueError):
+            tree.insert_many([(1, 1)])
+        with self.assertRaises(ValueError):
+            tree.delete_many(range(500))
@@ -1,8 +1,9 @@
+import random
 import unittest
 from ed_utils.decorators import number, visibility
 from ed_utils.timeout import timeout
 
-from beehive import BeehiveSelector, Beehive
+from beehive import BeehiveSelector, Beehive, SpatialBeehiveSelector
 
 class TestBeehiveSelector(unittest.TestCase):
 
@@ -47,3 +48,181 @@ class TestBeehiveSelector(unittest.TestCase):
         for actual, ex in zip(all_emeralds, expected):
             self.assertAlmostEqual(actual, ex, 0)
         
+
+    @timeout()
+    @number("5.4")
+    def test_growth(self):
+        s = BeehiveSelector(2)
+        hives = [Beehive(i, i, i, capacity=10, nutrient_factor=i, volume=10) for i in range(1, 6)]
+        s.set_all_beehives(hives)
+        s.add_beehive(Beehive(0, 0, 0, capacity=10, nutrient_factor=100, volume=5))
+        self.assertEqual(s.harvest_best_beehive(), 500)
+        self.assertEqual(s.harvest_best_beehive(), 50)
+        self.assertEqual(len(s), 6)
+
+    @timeout()
+    @number("5.6")
+    def test_update_and_remove(self):
+        s = BeehiveSelector()
+        b1 = Beehive(1, 1, 1, capacity=10, nutrient_factor=2, volume=10)
+        b2 = Beehive(2, 2, 2, capacity=10, nutrient_factor=3, volume=10)
+        b3 = Beehive(3, 3, 3, capacity=10, nutrient_factor=4, volume=10)
+        s.set_all_beehives([b1, b2, b3])
+        b1.volume = 100
+        b1.nutrient_factor = 10
+        s.update_beehive(b1)
+        s.remove_beehive(b3)
+        self.assertEqual(s.harvest_best_beehive(), 100)
+        self.assertEqual(s.harvest_best_beehive(), 100)
+        self.assertEqual(s.harvest_best_beehive(), 100)
+        b1.volume = 0
+        s.update_beehive(b1)
+        self.assertEqual(s.harvest_best_beehive(), 30)
+        with self.assertRaises(KeyError):
+            s.remove_beehive(b3)
+
+    @timeout()
+    @number("5.8")
+    def test_harvest_many_and_parking(self):
+        def hives():
+            return [
+                Beehive(15, 12, 13, capacity=40, nutrient_factor=5, volume=15),
+                Beehive(25, 22, 23, capacity=15, nutrient_factor=8, volume=40),
+                Beehive(35, 32, 33, capacity=40, nutrient_factor=3, volume=40),
+                Beehive(45, 42, 43, capacity=1, nutrient_factor=85, volume=10),
+                Beehive(55, 52, 53, capacity=400, nutrient_factor=5000, volume=0),
+            ]
+        one_by_one = BeehiveSelector(5)
+        batched = BeehiveSelector(5)
+        for hive in hives():
+            one_by_one.add_beehive(hive)
+        batched.set_all_beehives(hives())
+        expected = [one_by_one.harvest_best_beehive() for _ in range(20)]
+        self.assertEqual(batched.harvest_many(7) + batched.harvest_many(13), expected)
+        self.assertEqual(expected[-3:], [0, 0, 0])
+
+        # every hive is empty and parked, so the heap is too
+        self.assertEqual(len(batched.store), 0)
+        self.assertEqual(len(batched), 5)
+        empty = next(iter(batched.parked.values()))
+        empty.volume = 2
+        batched.update_beehive(empty)
+        self.assertEqual(len(batched.store), 1)
+        self.assertEqual(batched.harvest_best_beehive(), min(empty.capacity, 2) * empty.nutrient_factor)
+        batched.remove_beehive(empty)
+        self.assertEqual(len(batched), 4)
+        with self.assertRaises(IndexError):
+            BeehiveSelector().harvest_many(1)
+
+    @timeout()
+    @number("5.9")
+    def test_plan_harvest(self):
+        random.seed(1022)
+        # every priority min(capacity, volume) * nutrient_factor is distinct when the
+        # factors are distinct primes above every capacity, so ties cannot pick different hives
+        primes = [p for p in range(31, 2000) if all(p % d for d in range(2, int(p ** 0.5) + 1))]
+        for trial in range(30):
+            factors = random.sample(primes, 40)
+            def hives():
+                rng = random.Random(trial)
+                return [Beehive(i, i, i, capacity=rng.randrange(1, 30), nutrient_factor=factors[i],
+                                volume=rng.randrange(0, 200)) for i in range(40)]
+            rounds = random.randrange(1, 400)
+            planner, looper = BeehiveSelector(), BeehiveSelector()
+            plan_hives = hives()
+            planner.set_all_beehives(plan_hives)
+            loop_hives = hives()
+            looper.set_all_beehives(loop_hives)
+            values, picked = [], []
+            for _ in range(rounds):
+                before = [hive.volume for hive in loop_hives]
+                values.append(looper.harvest_best_beehive())
+                picked.extend(hive.x for hive, volume in zip(loop_hives, before) if hive.volume != volume)
+
+            plan = planner.plan_harvest(rounds)
+            self.assertEqual(plan.total, sum(values))
+            expanded = []
+            for step in plan.schedule:
+                self.assertEqual(step.emeralds % step.hive.nutrient_factor, 0)
+                expanded.extend([step.hive.x] * step.harvests)
+            self.assertEqual(sum(step.emeralds for step in plan.schedule), plan.total)
+            self.assertEqual(expanded, picked)
+
+            # planning alone changes nothing; applying matches the loop
+            self.assertEqual([hive.volume for hive in plan_hives], [hive.volume for hive in hives()])
+            planner.plan_harvest(rounds, apply=True)
+            self.assertEqual(planner.harvest_many(25), looper.harvest_many(25))
+
+    @timeout()
+    @number("5.10")
+    def test_plan_many_rounds(self):
+        s = BeehiveSelector()
+        big = Beehive(0, 0, 0, capacity=3, nutrient_factor=7, volume=10 ** 9)
+        small = Beehive(1, 1, 1, capacity=5, nutrient_factor=2, volume=11)
+        s.set_all_beehives([big, small])
+        plan = s.plan_harvest(10 ** 9, apply=True)
+        full = 10 ** 9 // 3
+        # big's remainder (priority 7) falls behind small (10), whose remainder (2) falls behind big
+        self.assertEqual([(step.hive, step.harvests) for step in plan.schedule],
+                         [(big, full), (small, 2), (big, 1), (small, 1)])
+        self.assertEqual(plan.total, full * 21 + 10 + 10 + 7 + 2)
+        self.assertEqual(len(s.store), 0)
+        self.assertEqual(s.harvest_best_beehive(), 0)
+
+    @timeout()
+    @number("5.11")
+    def test_spatial(self):
+        random.seed(1023)
+        positions = random.sample([(x, y, z) for x in range(20) for y in range(20) for z in range(20)], 300)
+        hives = [Beehive(*position, capacity=random.randrange(1, 20), nutrient_factor=random.randrange(1, 50),
+                         volume=random.randrange(0, 100)) for position in positions]
+        s = SpatialBeehiveSelector()
+        s.set_all_beehives(hives)
+        self.assertEqual(len(s), 300)
+        for _ in range(200):
+            lo = tuple(random.randrange(0, 15) for _ in range(3))
+            hi = tuple(axis + random.randrange(0, 8) for axis in lo)
+            inside = [hive for hive in hives if all(lo[i] <= p <= hi[i] for i, p in enumerate((hive.x, hive.y, hive.z)))]
+            expected = max((hive.priority() for hive in inside), default=0)
+            self.assertEqual(s.harvest_in_box(lo, hi), expected)
+
+            centre = tuple(random.randrange(0, 20) for _ in range(3))
+            near = [hive for hive in hives
+                    if (hive.x - centre[0]) ** 2 + (hive.y - centre[1]) ** 2 + (hive.z - centre[2]) ** 2 <= 9]
+            expected = max((hive.priority() for hive in near), default=0)
+            self.assertEqual(s.harvest_within(centre, 3), expected)
+        self.assertEqual(s.harvest_best_beehive(), max(hive.priority() for hive in hives))
+        with self.assertRaises(ValueError):
+            s.add_beehive(Beehive(*positions[0], capacity=1, nutrient_factor=1, volume=1))
+        self.assertEqual(SpatialBeehiveSelector().harvest_best_beehive(), 0)
+
+    @timeout()
+    @number("5.12")
+    def test_zero_nutrient_factor(self):
+        def hives():
+            return [
+                Beehive(1, 1, 1, capacity=4, nutrient_factor=0, volume=10),
+                Beehive(2, 2, 2, capacity=5, nutrient_factor=3, volume=7),
+                Beehive(3, 3, 3, capacity=6, nutrient_factor=0, volume=0),
+                Beehive(4, 4, 4, capacity=2, nutrient_factor=0, volume=3),
+            ]
+        s = BeehiveSelector()
+        stored = hives()
+        s.set_all_beehives(stored)
+        self.assertEqual(len(s.store), 1)
+        # the productive hive goes first; the hives with a zero factor are then drained for nothing
+        self.assertEqual(s.harvest_many(9), [15, 6, 0, 0, 0, 0, 0, 0, 0])
+        self.assertEqual([hive.volume for hive in stored], [0, 0, 0, 0])
+        self.assertEqual(len(s.draining), 0)
+
+        planner = BeehiveSelector()
+        stored = hives()
+        planner.set_all_beehives(stored)
+        plan = planner.plan_harvest(6, apply=True)
+        self.assertEqual([(step.hive.x, step.harvests, step.emeralds) for step in plan.schedule],
+                         [(2, 2, 21), (1, 3, 0), (4, 1, 0)])
+        self.assertEqual([hive.volume for hive in stored], [0, 0, 0, 1])
+        self.assertEqual(planner.harvest_many(2), [0, 0])
+        self.assertEqual(stored[3].volume, 0)
+        planner.remove_beehive(stored[3])
+        self.assertEqual((len(planner), len(planner.draining)), (3, 0))
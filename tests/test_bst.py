@@ -77,3 +77,122 @@ class BSTTest(unittest.TestCase):
         kth = BST.kth_smallest(5, BST.root)
         self.assertEqual(kth.key, 95)
         self.assertEqual(kth.item, 1)
+
+    @timeout()
+    @number("1.6")
+    def test_degenerate_tree(self):
+        # deeper than the default recursion limit
+        BST = BinarySearchTree()
+        for i in range(3000):
+            BST[i] = i
+        self.assertEqual(BST.root.subtree_size, 3000)
+        self.assertEqual(BST[2999], 2999)
+        self.assertEqual(BST.get_minimal(BST.root).key, 0)
+        self.assertEqual(BST.kth_smallest(2500, BST.root).key, 2499)
+        self.assertEqual(len(BST.ratio(10, 10)), 2400)
+
+        del BST[1500]
+        del BST[0]
+        self.assertEqual(len(BST), 2998)
+        self.assertEqual(BST.root.subtree_size, 2998)
+        self.assertNotIn(1500, BST)
+        self.assertEqual(BST.kth_smallest(1500, BST.root).key, 1501)
+
+    @timeout()
+    @number("1.7")
+    def test_from_items(self):
+        keys = [95, 73, 99, 50, 85, 80, 10]
+        BST = BinarySearchTree.from_items((key, -key) for key in keys)
+        self.assertEqual(len(BST), 7)
+        self.assertEqual(BST.root.key, 80)
+        self.assertEqual(BST.root.subtree_size, 7)
+        self.assertEqual(BST.root.left.subtree_size, 3)
+        self.assertEqual(BST.root.right.subtree_size, 3)
+        self.assertEqual(BST[99], -99)
+        for k, key in enumerate(sorted(keys), start=1):
+            self.assertEqual(BST.kth_smallest(k, BST.root).key, key)
+
+        BST = BinarySearchTree.from_items([(i, i) for i in range(1023)], presorted=True)
+        self.assertEqual(BST.root.key, 511)
+        self.assertEqual(BST.kth_smallest(1023, BST.root).key, 1022)
+        BST[2000] = 2000
+        self.assertEqual(BST.root.subtree_size, 1024)
+
+        empty = BinarySearchTree.from_items([])
+        self.assertTrue(empty.is_empty())
+        with self.assertRaises(ValueError):
+            BinarySearchTree.from_items([(1, 1), (2, 2), (1, 3)])
+        with self.assertRaises(ValueError):
+            BinarySearchTree.from_items([(2, 2), (1, 1)], presorted=True)
+
+    @timeout()
+    @number("1.11")
+    def test_ordered_queries(self):
+        BST = BinarySearchTree()
+        for key in [95, 73, 99, 50, 85, 80, 10]:
+            BST[key] = str(key)
+
+        self.assertEqual(list(BST), [10, 50, 73, 80, 85, 95, 99])
+        self.assertEqual(list(BST.range(50, 85)), [(50, '50'), (73, '73'), (80, '80'), (85, '85')])
+        self.assertEqual([key for key, _ in BST.range(51, 84)], [73, 80])
+        self.assertEqual(list(BST.range(86, 94)), [])
+        self.assertEqual([key for key, _ in BST.iter_from(81)], [85, 95, 99])
+        self.assertEqual([key for key, _ in BST.iter_from(0)], [10, 50, 73, 80, 85, 95, 99])
+        self.assertEqual(list(BST.iter_from(100)), [])
+
+        self.assertEqual(BST.floor(84).key, 80)
+        self.assertEqual(BST.floor(85).key, 85)
+        self.assertIsNone(BST.floor(9))
+        self.assertEqual(BST.ceiling(84).key, 85)
+        self.assertEqual(BST.ceiling(10).key, 10)
+        self.assertIsNone(BST.ceiling(100))
+
+        # the generator is lazy, so the tree is not walked past what is consumed
+        window = BST.range(0, 1000)
+        self.assertEqual(next(window), (10, '10'))
+        self.assertEqual(next(window), (50, '50'))
+
+    @timeout()
+    @number("1.12")
+    def test_rank(self):
+        BST = BinarySearchTree()
+        keys = [95, 73, 99, 50, 85, 80, 10]
+        for key in keys:
+            BST[key] = key
+        for k, key in enumerate(sorted(keys), start=1):
+            self.assertEqual(BST.rank(key), k)
+            self.assertEqual(BST.kth_smallest(BST.rank(key), BST.root).key, key)
+        with self.assertRaises(KeyError):
+            BST.rank(81)
+        self.assertEqual(BST.count_less(10), 0)
+        self.assertEqual(BST.count_less(81), 4)
+        self.assertEqual(BST.count_less(80, inclusive=True), 4)
+        self.assertEqual(BST.count_less(1000), 7)
+        self.assertEqual(BST.count_between(50, 85), 4)
+        self.assertEqual(BST.count_between(51, 84), 2)
+        self.assertEqual(BST.count_between(85, 50), 0)
+
+    @timeout()
+    @number("1.13")
+    def test_multiset(self):
+        BST = BinarySearchTree(multiset=True)
+        for key in [5, 3, 8, 3, 5, 5, 9]:
+            BST[key] = key
+        self.assertEqual(len(BST), 7)
+        self.assertEqual(BST.root.count, 3)
+        self.assertEqual(BST.root.subtree_size, 7)
+        self.assertEqual([BST.kth_smallest(k, BST.root).key for k in range(1, 8)], [3, 3, 5, 5, 5, 8, 9])
+        self.assertEqual(BST.rank(5), 3)
+        self.assertEqual(BST.count_between(4, 8), 4)
+        self.assertEqual(BST.ratio(20, 20), [5, 5, 5])
+        self.assertEqual(BST.ratio(20, 0), [5, 5, 5, 8, 9])
+        self.assertEqual(list(BST.iter_counts()), [(3, 3, 2), (5, 5, 3), (8, 8, 1), (9, 9, 1)])
+
+        del BST[5]
+        del BST[3]
+        self.assertEqual(BST.root.subtree_size, 5)
+        del BST[5]
+        del BST[5]
+        self.assertNotIn(5, BST)
+        self.assertEqual(BST.root.subtree_size, 3)
+        self.assertEqual(list(BST), [3, 8, 9])
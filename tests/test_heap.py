@@ -0,0 +1,153 @@
+import random
+import unittest
+from ed_utils.decorators import number, visibility
+from ed_utils.timeout import timeout
+
+from heap import IndexedMaxHeap, MaxHeap
+
+
+class MaxHeapTest(unittest.TestCase):
+
+    @timeout()
+    @number("5.2")
+    def test_grow_and_shrink(self):
+        random.seed(1018)
+        heap = MaxHeap(4)
+        items = [random.randrange(1000) for _ in range(1000)]
+        capacities = set()
+        for item in items:
+            heap.add(item)
+            capacities.add(heap.capacity())
+        # doubling means only a logarithmic number of reallocations
+        self.assertEqual(sorted(capacities), [4, 8, 16, 32, 64, 128, 256, 512, 1024])
+        self.assertEqual(len(heap), 1000)
+
+        result = [heap.get_max() for _ in range(990)]
+        self.assertEqual(result, sorted(items, reverse=True)[:990])
+        self.assertLessEqual(heap.capacity(), 40)
+        while len(heap):
+            heap.get_max()
+        # never below the hint given at construction
+        self.assertEqual(heap.capacity(), 4)
+        with self.assertRaises(IndexError):
+            heap.get_max()
+
+    @timeout()
+    @number("5.3")
+    def test_reserve_and_heapify(self):
+        heap = MaxHeap()
+        heap.reserve(100)
+        array = heap.the_array
+        for i in range(100):
+            heap.add(i)
+        self.assertIs(heap.the_array, array)
+        for _ in range(99):
+            heap.get_max()
+        self.assertEqual(heap.capacity(), 100)
+
+        heap.heapify([3, 9, 1, 7, 5] * 50)
+        self.assertEqual(len(heap), 250)
+        self.assertEqual([heap.get_max() for _ in range(6)], [9] * 6)
+        heap.heapify([2, 1])
+        self.assertEqual(len(heap), 2)
+        self.assertEqual([heap.get_max(), heap.get_max()], [2, 1])
+
+    @timeout()
+    @number("5.5")
+    def test_indexed(self):
+        random.seed(1019)
+
+        class Box:
+            def __init__(self, value):
+                self.value = value
+
+            def __gt__(self, other):
+                return self.value > other.value
+
+            def __le__(self, other):
+                return self.value <= other.value
+
+        def check(heap):
+            for k in range(1, len(heap) + 1):
+                self.assertEqual(heap.slot(heap.the_array[k]), k)
+                if k > 1:
+                    self.assertLessEqual(heap.the_array[k], heap.the_array[k // 2])
+
+        boxes = [Box(random.randrange(100)) for _ in range(200)]
+        heap = IndexedMaxHeap()
+        heap.heapify(boxes[:100])
+        for box in boxes[100:]:
+            heap.add(box)
+        check(heap)
+        live = list(boxes)
+        for _ in range(300):
+            box = random.choice(live)
+            action = random.randrange(3)
+            if action == 0:
+                box.value = random.randrange(100)
+                heap.update(box)
+            elif action == 1:
+                heap.remove(box)
+                live.remove(box)
+                self.assertNotIn(box, heap)
+            else:
+                new = Box(random.randrange(100))
+                top = heap.replace_top(new)
+                self.assertEqual(top.value, max(b.value for b in live))
+                live.remove(top)
+                live.append(new)
+            check(heap)
+        self.assertEqual(len(heap), len(live))
+        self.assertEqual([heap.get_max().value for _ in range(len(live))],
+                         sorted((b.value for b in live), reverse=True))
+        self.assertEqual(heap.index, {})
+
+        heap.add(boxes[0])
+        with self.assertRaises(ValueError):
+            heap.add(boxes[0])
+        with self.assertRaises(KeyError):
+            heap.update(boxes[1])
+        with self.assertRaises(KeyError):
+            heap.remove(boxes[1])
+        # re-sifting the top in place
+        boxes[0].value = -1
+        self.assertIs(heap.replace_top(boxes[0]), boxes[0])
+        self.assertIs(heap.peek_max(), boxes[0])
+
+    @timeout()
+    @number("5.7")
+    def test_key(self):
+        random.seed(1020)
+        calls = []
+
+        def negate(x):
+            calls.append(x)
+            return -x
+
+        items = [random.randrange(1000) for _ in range(300)]
+        heap = MaxHeap(key=negate)
+        heap.heapify(items[:100])
+        for item in items[100:]:
+            heap.add(item)
+        # one key per element, however many comparisons the sifts made
+        self.assertEqual(len(calls), 300)
+        self.assertEqual(heap.peek_max_key(), -min(items))
+        self.assertEqual([heap.get_max() for _ in range(300)], sorted(items))
+        with self.assertRaises(IndexError):
+            heap.peek_max_key()
+        self.assertEqual(len(calls), 300)
+
+        scores = {'a': 1, 'b': 2, 'c': 3}
+        indexed = IndexedMaxHeap(key=lambda name: scores[name])
+        for name in scores:
+            indexed.add(name)
+        scores['a'] = 10
+        indexed.update('a')
+        self.assertEqual(indexed.get_max(), 'a')
+        scores['b'] = 0
+        # a stale key keeps the old order until the element is updated
+        self.assertEqual(indexed.peek_max(), 'c')
+        self.assertEqual(indexed.peek_max_key(), 3)
+        scores['d'] = -5
+        self.assertEqual(indexed.replace_top('d'), 'c')
+        self.assertEqual(indexed.get_max(), 'b')
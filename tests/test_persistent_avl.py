@@ -0,0 +1,94 @@
+import random
+import threading
+import unittest
+from ed_utils.decorators import number, visibility
+from ed_utils.timeout import timeout
+
+from persistent_avl import PersistentAVLTree
+from ratio import Percentiles
+
+
+def check_node(tree, node):
+    """ Returns the height of node, asserting sizes and balance factors along the way. """
+    if node is None:
+        return 0
+    left = check_node(tree, node.left)
+    right = check_node(tree, node.right)
+    assert abs(left - right) <= 1, "Node {0} is unbalanced".format(node.key)
+    assert node.height == 1 + max(left, right), "Wrong height at {0}".format(node.key)
+    assert node.subtree_size == node.count + tree.get_size(node.left) + tree.get_size(node.right), \
+        "Wrong subtree size at {0}".format(node.key)
+    return node.height
+
+
+def node_ids(node, seen):
+    while node is not None:
+        seen.add(id(node))
+        node_ids(node.left, seen)
+        node = node.right
+    return seen
+
+
+class PersistentAVLTest(unittest.TestCase):
+
+    @timeout()
+    @number("1.15")
+    def test_versions(self):
+        random.seed(1016)
+        keys = list(range(300))
+        random.shuffle(keys)
+        tree = PersistentAVLTree()
+        versions = []
+        for key in keys:
+            versions.append(tree.snapshot())
+            tree[key] = str(key)
+        random.shuffle(keys)
+        for key in keys[:200]:
+            versions.append(tree.snapshot())
+            del tree[key]
+
+        # every snapshot still holds exactly what the tree held when it was taken
+        for i, version in enumerate(versions[:300]):
+            check_node(version, version.root)
+            self.assertEqual(len(version), i)
+        for i, version in enumerate(versions[300:]):
+            check_node(version, version.root)
+            self.assertEqual(list(version), sorted(keys[i:]))
+        self.assertEqual(list(tree), sorted(keys[200:]))
+
+        # an update only allocates the nodes near its path
+        before = node_ids(tree.root, set())
+        after = tree.insert(1000, "1000")
+        self.assertNotIn(1000, tree)
+        self.assertEqual(after[1000], "1000")
+        self.assertLessEqual(len(node_ids(after.root, set()) - before), 3 * after.root.height)
+        self.assertEqual(list(after.delete(1000)), list(tree))
+
+        with self.assertRaises(ValueError):
+            tree.insert(keys[250], "again")
+        with self.assertRaises(ValueError):
+            tree.delete(keys[0])
+        self.assertEqual(list(tree), sorted(keys[200:]))
+
+    @timeout()
+    @number("1.16")
+    def test_snapshot_while_writing(self):
+        p = Percentiles.from_points(range(1000), 'persistent')
+        snapshot = p.snapshot()
+        self.assertIsNot(snapshot.store, p.store)
+        self.assertIs(snapshot.store.root, p.store.root)
+        answers = []
+
+        def report():
+            for _ in range(20):
+                answers.append(snapshot.ratio(10, 10))
+
+        reader = threading.Thread(target=report)
+        reader.start()
+        for i in range(1000, 3000):
+            p.add_point(i)
+        p.remove_points(range(500))
+        reader.join()
+        self.assertEqual(answers, [list(range(100, 900))] * 20)
+        self.assertEqual(p.ratio(0, 0), list(range(500, 3000)))
+        check_node(p.store, p.store.root)
@@ -1,9 +1,12 @@
 import random
+import threading
 import unittest
 from ed_utils.decorators import number, visibility
 from ed_utils.timeout import timeout
 
-from ratio import Percentiles
+from array_bst import ArrayBinarySearchTree
+from avl import AVLTree
+from ratio import ConcurrentPercentiles, Percentiles, WindowedPercentiles
 
 class RatioTest(unittest.TestCase):
 
@@ -39,4 +42,418 @@ class RatioTest(unittest.TestCase):
 
         p.remove_point(82)
         res = p.ratio(13, 10)
-        self.assertSetEqual(set(res), {14, 15, 16, 87, 91})
\ No newline at end of file
+        self.assertSetEqual(set(res), {14, 15, 16, 87, 91})
+
+    @timeout()
+    @number("2.3")
+    def test_backends(self):
+        points = [4, 9, 14, 15, 16, 82, 87, 91, 92, 99]
+
+        p = Percentiles()
+        for point in points:
+            p.add_point(point)
+        self.assertIsInstance(p.store, ArrayBinarySearchTree)
+        self.assertEqual(p.store.typecode, 'q')
+        p.add_point(50.5)
+        self.assertEqual(p.store.typecode, 'd')
+        self.assertSetEqual(set(p.ratio(13, 10)), {14, 15, 16, 50.5, 82, 87, 91})
+        p.add_point(2 ** 60)
+        self.assertIsInstance(p.store, AVLTree)
+        self.assertSetEqual(set(p.ratio(0, 50)), {4, 9, 14, 15, 16, 50.5})
+
+        p = Percentiles(backend='tree')
+        p.add_point(1)
+        self.assertIsInstance(p.store, AVLTree)
+
+        p = Percentiles(backend='array')
+        with self.assertRaises(TypeError):
+            p.add_point('a')
+        p = Percentiles.from_points(points)
+        self.assertIsInstance(p.store, ArrayBinarySearchTree)
+        self.assertSetEqual(set(p.ratio(13, 10)), {14, 15, 16, 82, 87, 91, 92})
+        p = Percentiles.from_points(['b', 'a'])
+        self.assertIsInstance(p.store, AVLTree)
+
+    @timeout()
+    @number("2.4")
+    def test_percentile_of(self):
+        for backend in Percentiles.EXACT_BACKENDS:
+            p = Percentiles(backend)
+            with self.assertRaises(ValueError):
+                p.percentile_of(5)
+            for point in [4, 9, 14, 15, 16, 82, 87, 91, 92, 99]:
+                p.add_point(point)
+            self.assertEqual(p.percentile_of(4), 0)
+            self.assertEqual(p.percentile_of(15), 30)
+            self.assertEqual(p.percentile_of(50), 50)
+            self.assertEqual(p.percentile_of(1000), 100)
+            self.assertEqual(p.rank(82), 6)
+            self.assertEqual(p.count_between(10, 90), 5)
+
+    @timeout()
+    @number("2.5")
+    def test_duplicates(self):
+        random.seed(99182)
+        points = [random.randint(0, 20) for _ in range(500)]
+        for backend in Percentiles.EXACT_BACKENDS:
+            p = Percentiles(backend)
+            for point in points:
+                p.add_point(point)
+            expected = sorted(points)
+            self.assertEqual(p.ratio(0, 0), expected)
+            self.assertEqual(p.ratio(13, 10), expected[65:450])
+            self.assertEqual(p.rank(expected[100]), expected.index(expected[100]) + 1)
+            self.assertEqual(p.percentile_of(10), 100 * expected.index(10) / 500)
+
+            for point in points[:250]:
+                p.remove_point(point)
+            expected = sorted(points[250:])
+            self.assertEqual(p.ratio(20.5, 33.3), expected[52:166])
+            with self.assertRaises(ValueError):
+                p.remove_point(21)
+            # one node per distinct value, however many copies were added
+            self.assertLessEqual(len(list(p.store.iter_items())), 21)
+
+        p = Percentiles.from_points(['b', 'a', 'b'])
+        self.assertEqual(p.ratio(0, 0), ['a', 'b', 'b'])
+
+    @timeout()
+    @number("2.6")
+    def test_sketch_backend(self):
+        random.seed(4123)
+        points = [random.randint(1, 10 ** 6) for _ in range(5000)]
+        exact = Percentiles.from_points(points)
+        approx = Percentiles(backend='sketch', relative_accuracy=0.01)
+        for point in points:
+            approx.add_point(point)
+        for x in [0, 1, 25, 50, 99, 100]:
+            self.assertLessEqual(abs(approx.quantile(x) - exact.quantile(x)), 0.01 * exact.quantile(x))
+        self.assertAlmostEqual(approx.percentile_of(500000), exact.percentile_of(500000), delta=1)
+        window = approx.ratio(10, 10)
+        self.assertLessEqual(len(window), len(approx.store.positive.counts))
+        approx.remove_point(points[0])
+        self.assertEqual(len(approx.store), 4999)
+        self.assertEqual(Percentiles.from_points(points, backend='sketch').quantile(50), approx.quantile(50))
+        with self.assertRaises(ValueError):
+            Percentiles().quantile(50)
+
+    @timeout()
+    @number("2.9")
+    def test_merge(self):
+        random.seed(3321)
+        shards = [[random.randint(0, 100) for _ in range(300)] for _ in range(4)]
+        everything = sorted(sum(shards, []))
+
+        p = Percentiles.from_points(shards[0])
+        p.merge(Percentiles.from_points(shards[1]))
+        self.assertEqual(p.ratio(0, 0), sorted(shards[0] + shards[1]))
+
+        union = Percentiles.union(*(Percentiles.from_points(shard) for shard in shards))
+        self.assertEqual(union.ratio(0, 0), everything)
+        self.assertEqual(union.ratio(13, 10), everything[156:1080])
+
+        mixed = Percentiles.union(Percentiles.from_points([1, 2]), Percentiles.from_points([1.5, 2.0]))
+        self.assertEqual(mixed.ratio(0, 0), [1, 1.5, 2, 2])
+        words = Percentiles.union(Percentiles.from_points(['b', 'a']), Percentiles.from_points(['b', 'c']))
+        self.assertEqual(words.ratio(0, 0), ['a', 'b', 'b', 'c'])
+
+        approx = Percentiles.union(*(Percentiles.from_points(shard, backend='sketch') for shard in shards))
+        self.assertEqual(len(approx.store), 1200)
+        approx.merge(Percentiles.from_points([50] * 10))
+        self.assertEqual(len(approx.store), 1210)
+        with self.assertRaises(TypeError):
+            union.merge(approx)
+
+    @timeout()
+    @number("2.10")
+    def test_serialisation(self):
+        random.seed(12)
+        points = [random.randint(-10 ** 12, 10 ** 12) for _ in range(1000)] + [7] * 5
+        for p in [Percentiles.from_points(points),
+                  Percentiles.from_points(points, backend='tree'),
+                  Percentiles.from_points([point / 3 for point in points]),
+                  Percentiles.from_points([str(point) for point in points]),
+                  Percentiles.from_points(points, backend='sketch')]:
+            data = p.to_bytes()
+            copy = Percentiles.from_bytes(data)
+            self.assertEqual(copy.backend, p.backend)
+            self.assertEqual(len(copy.store), len(p.store))
+            self.assertEqual(copy.ratio(10, 20), p.ratio(10, 20))
+            self.assertEqual(copy.quantile(50), p.quantile(50))
+        # numeric shards cost 16 bytes per distinct point
+        self.assertLess(len(Percentiles.from_points(points).to_bytes()), 16 * 1000 + 32)
+        with self.assertRaises(ValueError):
+            Percentiles.from_bytes(b'nope' + bytes(10))
+
+    @timeout()
+    @number("2.11")
+    def test_window(self):
+        now = [0.0]
+        p = WindowedPercentiles(10, clock=lambda: now[0])
+        for t in range(30):
+            p.add_point(t % 7, timestamp=t)
+        now[0] = 29.5
+        # points recorded at 20..29 are inside the window
+        self.assertEqual(p.ratio(0, 0), sorted(t % 7 for t in range(20, 30)))
+        self.assertEqual(len(p.store), 10)
+
+        p.remove_point(6)  # recorded at t=20
+        now[0] = 30.5
+        self.assertEqual(p.ratio(0, 0), sorted(t % 7 for t in range(21, 30)))
+        now[0] = 100
+        self.assertEqual(p.ratio(0, 0), [])
+        self.assertEqual(len(p.queue), 0)
+        self.assertEqual(len(p.removed), 0)
+
+        p.add_point(3)
+        self.assertEqual(p.quantile(50), 3)
+        with self.assertRaises(ValueError):
+            p.add_point(1, timestamp=50)
+        with self.assertRaises(ValueError):
+            WindowedPercentiles(10, backend='numpy')
+
+    @timeout()
+    @number("2.12")
+    def test_cache(self):
+        p = Percentiles(cache_size=2)
+        for point in [4, 9, 14, 15, 16, 82, 87, 91, 92, 99]:
+            p.add_point(point)
+        first = p.ratio(13, 10)
+        first.append('mutated by caller')
+        self.assertEqual(p.ratio(13, 10), [14, 15, 16, 82, 87, 91, 92])
+        self.assertEqual(p.cache_info(), (1, 1, 2, 1))
+
+        p.add_point(50)
+        self.assertEqual(p.ratio(13, 10), [14, 15, 16, 50, 82, 87, 91])
+        self.assertEqual(p.cache_info().misses, 2)
+        p.remove_point(50)
+        self.assertEqual(p.ratio(13, 10), [14, 15, 16, 82, 87, 91, 92])
+        self.assertEqual(p.cache_info().misses, 3)
+
+        # least recently used answer is evicted
+        p.ratio(0, 0)
+        p.ratio(13, 10)
+        p.ratio(50, 0)
+        self.assertEqual(p.cache_info().currsize, 2)
+        self.assertIn((13, 10), p.cache)
+        self.assertNotIn((0, 0), p.cache)
+
+        p.merge(Percentiles.from_points([1]))
+        self.assertEqual(p.ratio(13, 10)[0], 9)
+        p.cache_clear()
+        self.assertEqual(p.cache_info(), (0, 0, 2, 0))
+
+    @timeout()
+    @number("2.13")
+    def test_batch_points(self):
+        points = [4, 9, 14, 15, 16, 82, 87, 91, 92, 99]
+        for backend in Percentiles.EXACT_BACKENDS:
+            p = Percentiles(backend=backend)
+            p.add_points(reversed(points))
+            self.assertEqual(p.ratio(13, 10), [14, 15, 16, 82, 87, 91, 92], backend)
+            p.add_points([50, 50, 51])
+            p.remove_points([50, 51, 4])
+            self.assertEqual(p.ratio(13, 10), [15, 16, 50, 82, 87, 91, 92], backend)
+            with self.assertRaises(ValueError):
+                p.remove_points([1000])
+        p = Percentiles()
+        p.add_points([1, 2])
+        p.add_points([2.5])
+        self.assertEqual(p.quantile(100), 2.5)
+
+        clock = [0.0]
+        w = WindowedPercentiles(10, clock=lambda: clock[0])
+        w.add_points(points[:5])
+        clock[0] = 5.0
+        w.add_points(points[5:])
+        w.remove_points([99])
+        clock[0] = 12.0
+        self.assertEqual(w.ratio(0, 0), [82, 87, 91, 92])
+
+    @timeout()
+    @number("2.18")
+    def test_concurrent(self):
+        for backend in Percentiles.EXACT_BACKENDS:
+            p = ConcurrentPercentiles(backend)
+            errors = []
+
+            def write(start):
+                for i in range(start, 2000, 4):
+                    p.add_point(i)
+
+            def read():
+                try:
+                    for _ in range(50):
+                        answer = p.ratio(10, 10)
+                        self.assertEqual(answer, sorted(answer))
+                        p.count_between(0, 2000)
+                except Exception as e:
+                    errors.append(e)
+
+            threads = [threading.Thread(target=write, args=(start,)) for start in range(4)]
+            threads += [threading.Thread(target=read) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(errors, [], backend)
+            self.assertEqual(p.ratio(0, 0), list(range(2000)), backend)
+            self.assertEqual(p.rank(1500), 1501, backend)
+
+        q = ConcurrentPercentiles.from_points([1, 2])
+        r = ConcurrentPercentiles.from_points([3])
+        q.merge(r)
+        r.merge(q)
+        self.assertEqual(r.ratio(0, 0), [1, 2, 3, 3])
+        self.assertEqual(ConcurrentPercentiles.union(q, r).quantile(100), 3)
+        self.assertIsInstance(q.snapshot(), Percentiles)
+
+    @timeout()
+    @number("2.21")
+    def test_window_inherited(self):
+        now = [0.0]
+        w = WindowedPercentiles.from_points([1, 2], 10, clock=lambda: now[0])
+        self.assertIsInstance(w, WindowedPercentiles)
+        self.assertEqual(w.ratio(0, 0), [1, 2])
+
+        # merged points are time-stamped, so they expire like added ones
+        now[0] = 5.0
+        w.merge(Percentiles.from_points([5, 6]))
+        self.assertEqual(w.ratio(0, 0), [1, 2, 5, 6])
+        now[0] = 12.0
+        self.assertEqual(w.ratio(0, 0), [5, 6])
+        now[0] = 20.0
+        self.assertEqual(w.ratio(0, 0), [])
+        self.assertEqual(len(w.store), 0)
+
+        # a windowed source only contributes its unexpired points
+        other = WindowedPercentiles(3, clock=lambda: now[0])
+        other.add_points([7], timestamp=16.0)
+        other.add_points([8], timestamp=19.0)
+        w.merge(other)
+        self.assertEqual(w.ratio(0, 0), [8])
+        with self.assertRaises(TypeError):
+            w.merge(Percentiles.from_points([1.0], backend='sketch'))
+        with self.assertRaises(ValueError):
+            w.merge(other, timestamp=0.0)
+
+        # union and from_bytes have no timestamps to give the points
+        with self.assertRaises(TypeError):
+            WindowedPercentiles.union(w)
+        with self.assertRaises(TypeError):
+            WindowedPercentiles.from_bytes(w.to_bytes())
+        self.assertEqual(Percentiles.from_bytes(w.to_bytes()).ratio(0, 0), [8])
+        now[0] = 30.0
+        self.assertEqual(Percentiles.from_bytes(w.to_bytes()).ratio(0, 0), [])
+
+    @timeout()
+    @number("2.22")
+    def test_failed_batch_removal(self):
+        for backend in Percentiles.BACKENDS:
+            points = [float(i) for i in range(1, 1001)]
+            p = Percentiles.from_points(points, backend=backend)
+            before = p.ratio(0, 99.5)
+            for batch in ([1.0, 2.0, 99999.0], points[:600] + [99999.0]):
+                with self.assertRaises(ValueError):
+                    p.remove_points(batch)
+                self.assertEqual(len(p.store), 1000, backend)
+                self.assertEqual(p.ratio(0, 99.5), before, backend)
+            p.remove_points([1.0, 2.0])
+            self.assertNotEqual(p.ratio(0, 99.5), before, backend)
+
+        p = Percentiles.from_points(range(1000))
+        self.assertEqual(p.ratio(0, 99.5), [0, 1, 2, 3, 4])
+        with self.assertRaises(ValueError):
+            p.remove_points([0, 1, 99999])
+        self.assertEqual(p.ratio(0, 99.5), [0, 1, 2, 3, 4])
+        p.store.delete_many([0, 1])  # behind the cache's back
+        with self.assertRaises(ValueError):
+            p.remove_points([99999])
+        self.assertEqual(p.ratio(0, 99.5), [2, 3, 4, 5])
+
+        # a failed batch leaves nothing to be expired twice
+        now = [0.0]
+        w = WindowedPercentiles(10, clock=lambda: now[0])
+        w.add_points([1, 2, 3])
+        with self.assertRaises(ValueError):
+            w.remove_points([1, 99])
+        self.assertEqual(len(w.removed), 0)
+        now[0] = 20.0
+        self.assertEqual(w.ratio(0, 0), [])
+        self.assertEqual(len(w.store), 0)
+
+    @timeout()
+    @number("2.23")
+    def test_point_types(self):
+        for backend in Percentiles.EXACT_BACKENDS:
+            p = Percentiles(backend=backend)
+            p.add_points([1, 2, 3, 4, 5])
+            p.add_point(2.5)
+            expected = [int, int, float, int, int]
+            self.assertEqual([type(point) for point in p.ratio(0, 1)], expected, backend)
+            self.assertIs(type(p.quantile(1)), int, backend)
+            self.assertIs(type(p.quantile(40)), float, backend)
+            copies = [Percentiles.from_bytes(p.to_bytes()), Percentiles.union(p), p.snapshot(),
+                      Percentiles.from_points([1, 2, 2.5, 3, 4, 5], backend=backend)]
+            for copy in copies:
+                self.assertEqual([type(point) for point in copy.ratio(0, 1)], expected, backend)
+            q = Percentiles(backend=backend)
+            q.merge(p)
+            self.assertEqual([type(point) for point in q.ratio(0, 1)], expected, backend)
+
+    @timeout()
+    @number("2.25")
+    def test_nan_rejected(self):
+        nan = float('nan')
+        for backend in Percentiles.BACKENDS:
+            p = Percentiles(backend=backend)
+            p.add_point(1.0)
+            with self.assertRaises(ValueError):
+                p.add_point(nan)
+            with self.assertRaises(ValueError):
+                p.add_points([2.0, nan, 3.0])
+            with self.assertRaises(ValueError):
+                Percentiles.from_points([1.0, nan, 2.0, 3.0], backend=backend)
+            p.add_points([2.0, 3.0])
+            self.assertEqual(len(p.store), 3, backend)
+            self.assertAlmostEqual(p.quantile(50), 2.0, delta=0.05)
+
+        # the first key of an empty tree is compared with nothing, and a repeat would fold into its count
+        for tree in (AVLTree(multiset=True), ArrayBinarySearchTree('d', multiset=True)):
+            with self.assertRaises(ValueError):
+                tree[nan] = nan
+            tree[1.0] = 1.0
+            with self.assertRaises(ValueError):
+                tree[nan] = nan
+            with self.assertRaises(ValueError):
+                tree.insert_many([(nan, nan)] * 10)
+            self.assertEqual(len(tree), 1)
+
+    @timeout()
+    @number("2.26")
+    def test_batch_engine_matches_sequential(self):
+        big = 2 ** 60 + 1
+        batches = [[big, 1.5], [1.5, big], [3, 2 ** 53 + 1, 0.5], [3, 2 ** 53, 0.5], [1, 2, 3], [1, 'a']]
+        for backend in Percentiles.EXACT_BACKENDS:
+            for start in ([], [7], [7.5]):
+                for batch in batches:
+                    sequential = Percentiles(backend=backend)
+                    batched = Percentiles(backend=backend)
+                    sequential.add_points(start)
+                    batched.add_points(start)
+                    try:
+                        for point in batch:
+                            sequential.add_point(point)
+                    except TypeError:
+                        with self.assertRaises(TypeError):
+                            batched.add_points(batch)
+                        continue
+                    batched.add_points(batch)
+                    label = (backend, start, batch)
+                    self.assertIs(type(batched.store), type(sequential.store), label)
+                    self.assertEqual(batched.ratio(0, 0), sequential.ratio(0, 0), label)
+                    self.assertEqual([type(point) for point in batched.ratio(0, 0)],
+                                     [type(point) for point in sequential.ratio(0, 0)], label)
+        p = Percentiles()
+        p.add_points([big, 1.5])
+        self.assertEqual(p.quantile(100), big)
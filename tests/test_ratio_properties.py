@@ -0,0 +1,85 @@
+import random
+import unittest
+from fractions import Fraction
+from math import ceil
+from unittest import mock
+from ed_utils.decorators import number, visibility
+from ed_utils.timeout import timeout
+
+from array_bst import ArrayBinarySearchTree
+from avl import AVLTree
+from bst import BinarySearchTree
+from persistent_avl import PersistentAVLTree
+from ratio import Percentiles
+from sorted_array import SortedArrayStore
+
+# exact in binary, so the oracle's Fraction arithmetic matches the stores' floats
+PERCENTS = list(range(0, 101)) + [0.25, 12.5, 33.75, 99.5, -10, 150]
+
+
+def oracle(points, x, y):
+    """ The keys above the smallest x% and below the largest y%, by slicing the sorted points. """
+    n = len(points)
+    lb = max(1, ceil(Fraction(x) * n / 100) + 1)
+    ub = min(n, n - ceil(Fraction(y) * n / 100))
+    return sorted(points)[lb - 1:ub] if lb <= ub else []
+
+
+def stores(points, distinct):
+    pairs = [(point, point) for point in points]
+    yield BinarySearchTree.from_items(pairs, multiset=True)
+    yield AVLTree.from_items(pairs, multiset=True)
+    yield PersistentAVLTree.from_items(pairs, multiset=True)
+    yield ArrayBinarySearchTree.from_items(pairs, typecode='q', multiset=True)
+    if SortedArrayStore.available():
+        yield SortedArrayStore.from_items(pairs, typecode='q')
+    # a tree grown one key at a time has a different shape from a bulk-loaded one
+    tree = BinarySearchTree(multiset=not distinct)
+    for point in points:
+        tree[point] = point
+    yield tree
+
+
+class RatioPropertyTest(unittest.TestCase):
+
+    @timeout()
+    @number("2.19")
+    def test_against_sorted_list(self):
+        random.seed(1017)
+        for trial in range(60):
+            n = random.choice([0, 1, 2, 3, 5, 10, random.randrange(200)])
+            distinct = trial % 2 == 0
+            if distinct:
+                points = random.sample(range(1000), n)
+            else:
+                points = [random.randrange(max(1, n // 3)) for _ in range(n)]
+            cases = [(random.choice(PERCENTS), random.choice(PERCENTS)) for _ in range(20)]
+            cases += [(0, 0), (100, 0), (0, 100), (50, 50), (49.5, 49.5)]
+            for store in stores(points, distinct):
+                for x, y in cases:
+                    self.assertEqual(store.ratio(x, y), oracle(points, x, y),
+                                     "{0} n={1} ratio({2}, {3})".format(type(store).__name__, n, x, y))
+
+            p = Percentiles.from_points(points)
+            for x, y in cases:
+                self.assertEqual(p.ratio(x, y), oracle(points, x, y))
+            for x in PERCENTS:
+                if points and 0 <= x <= 100:
+                    expected = sorted(points)[max(1, ceil(Fraction(x) * n / 100)) - 1]
+                    self.assertEqual(p.quantile(x), expected)
+
+    @timeout()
+    @number("2.20")
+    def test_empty_window_short_circuits(self):
+        # a degenerate tree, where walking to a missing rank would visit every node
+        tree = BinarySearchTree()
+        for i in range(2000):
+            tree[i] = i
+        with mock.patch.object(tree, 'ratio_helper') as helper, \
+                mock.patch.object(tree, 'kth_smallest') as kth_smallest:
+            for x, y in [(100, 0), (50, 50), (60, 45), (0, 100), (150, -20)]:
+                self.assertEqual(tree.ratio(x, y), [])
+            helper.assert_not_called()
+            kth_smallest.assert_not_called()
+        self.assertEqual(tree.ratio(-5, 99.95), [0])
+        self.assertEqual(BinarySearchTree().ratio(0, 0), [])
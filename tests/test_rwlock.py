@@ -0,0 +1,70 @@
+import threading
+import time
+import unittest
+from ed_utils.decorators import number, visibility
+from ed_utils.timeout import timeout
+
+from rwlock import ReadWriteLock
+
+
+class ReadWriteLockTest(unittest.TestCase):
+
+    @timeout()
+    @number("2.17")
+    def test_exclusion(self):
+        lock = ReadWriteLock()
+        # readers share the lock
+        lock.acquire_read()
+        lock.acquire_read()
+        self.assertEqual(lock.readers, 2)
+
+        events = []
+        writer = threading.Thread(target=lambda: (lock.acquire_write(), events.append('write'), lock.release_write()))
+        writer.start()
+        while not lock.waiting_writers:
+            time.sleep(0.001)
+        # a waiting writer keeps new readers out
+        reader = threading.Thread(target=lambda: (lock.acquire_read(), events.append('read'), lock.release_read()))
+        reader.start()
+        time.sleep(0.01)
+        self.assertEqual(events, [])
+        lock.release_read()
+        lock.release_read()
+        writer.join()
+        reader.join()
+        self.assertEqual(events, ['write', 'read'])
+
+        # the writer may take the write lock again, but not the read lock
+        with lock.write_locked():
+            with lock.write_locked():
+                self.assertEqual(lock.depth, 2)
+            with self.assertRaises(RuntimeError):
+                lock.acquire_read()
+        self.assertIsNone(lock.writer)
+        with self.assertRaises(RuntimeError):
+            lock.release_write()
+        with self.assertRaises(RuntimeError):
+            lock.release_read()
+
+    @timeout()
+    @number("2.28")
+    def test_writer_batch(self):
+        lock = ReadWriteLock()
+        lock.acquire_read()
+        events = []
+        writers = [threading.Thread(target=lambda: (lock.acquire_write(), events.append('write'), lock.release_write()))
+                   for _ in range(2)]
+        for writer in writers:
+            writer.start()
+        while lock.waiting_writers < 2:
+            time.sleep(0.001)
+        reader = threading.Thread(target=lambda: (lock.acquire_read(), events.append('read'), lock.release_read()))
+        reader.start()
+        while not lock.waiting_readers:
+            time.sleep(0.001)
+        # both writers waiting when the last reader leaves go before the next reader
+        lock.release_read()
+        for thread in writers + [reader]:
+            thread.join()
+        self.assertEqual(events, ['write', 'write', 'read'])
+        self.assertEqual((lock.writers_turn, lock.readers_turn), (0, False))
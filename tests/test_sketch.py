@@ -0,0 +1,51 @@
+import random
+import unittest
+from ed_utils.decorators import number, visibility
+from ed_utils.timeout import timeout
+
+from sketch import LogHistogramSketch
+
+
+class SketchTest(unittest.TestCase):
+
+    @timeout()
+    @number("2.7")
+    def test_relative_error(self):
+        random.seed(5521)
+        values = [random.lognormvariate(0, 2) * random.choice([-1, 1]) for _ in range(20000)] + [0.0] * 50
+        sketch = LogHistogramSketch(relative_accuracy=0.02)
+        for value in values:
+            sketch.add(value)
+        values.sort()
+        self.assertEqual(len(sketch), len(values))
+        for k in [1, 100, 5000, 10000, 10025, 15000, 20050]:
+            exact = values[k - 1]
+            self.assertLessEqual(abs(sketch.select(k) - exact), 0.02 * abs(exact))
+        with self.assertRaises(IndexError):
+            sketch.select(0)
+
+        less = sketch.count_less(values[12000])
+        self.assertLessEqual(abs(less - 12000), 200)
+        self.assertEqual(sketch.count_less(values[0]), 0)
+        self.assertEqual(sketch.count_less(values[-1], inclusive=True), len(values))
+
+        window = sketch.ratio(10, 10)
+        self.assertEqual(window, sorted(window))
+        self.assertLessEqual(abs(window[0] - values[2005]), 0.02 * abs(values[2005]))
+        self.assertLessEqual(abs(window[-1] - values[18044]), 0.02 * abs(values[18044]))
+
+    @timeout()
+    @number("2.8")
+    def test_bounded_memory(self):
+        sketch = LogHistogramSketch(relative_accuracy=0.01, max_buckets=64)
+        for i in range(1, 100000):
+            sketch.add(float(i))
+        self.assertLessEqual(len(sketch.positive.counts), 64)
+        self.assertEqual(len(sketch), 99999)
+        # the largest values keep full accuracy
+        self.assertLessEqual(abs(sketch.select(99999) - 99999), 0.01 * 99999)
+
+        sketch.remove(99999.0)
+        self.assertEqual(len(sketch), 99998)
+        with self.assertRaises(ValueError):
+            sketch.remove(-5.0)
@@ -0,0 +1,122 @@
+import random
+import unittest
+from unittest import mock
+from ed_utils.decorators import number, visibility
+from ed_utils.timeout import timeout
+
+import sorted_array
+from avl import AVLTree
+from ratio import Percentiles
+from sorted_array import SortedArrayStore
+
+
+@unittest.skipUnless(SortedArrayStore.available(), "NumPy is not installed")
+class SortedArrayStoreTest(unittest.TestCase):
+
+    @timeout()
+    @number("2.14")
+    def test_matches_tree(self):
+        random.seed(2014)
+        points = [random.randrange(50) for _ in range(500)]
+        store = SortedArrayStore('q')
+        tree = AVLTree(multiset=True)
+        for point in points:
+            store[point] = point
+            tree[point] = point
+        store.delete_many(points[:100])
+        tree.delete_many(points[:100])
+        del store[points[100]]
+        del tree[points[100]]
+        self.assertEqual(list(store), list(tree))
+        self.assertEqual(list(store.iter_counts()), list(tree.iter_counts()))
+        for x, y in [(0, 0), (13, 10), (50, 49), (99, 0), (60, 60)]:
+            self.assertEqual(store.ratio(x, y), tree.ratio(x, y))
+        for key in range(-1, 51):
+            self.assertEqual(store.count_less(key), tree.count_less(key))
+            self.assertEqual(key in store, key in tree)
+        self.assertEqual(store.select(1), tree.select(1))
+        self.assertEqual(store.count_between(10, 20), tree.count_between(10, 20))
+
+        with self.assertRaises(ValueError):
+            store.delete_many([1000])
+        with self.assertRaises(ValueError):
+            store.delete_many([2.5])
+        with self.assertRaises(TypeError):
+            store[2.5] = 2.5
+        with self.assertRaises(KeyError):
+            store.rank(1000)
+        with self.assertRaises(IndexError):
+            store.select(0)
+
+    @timeout()
+    @number("2.15")
+    def test_numpy_backend(self):
+        p = Percentiles.from_points([4, 9, 14, 15, 16, 82, 87, 91, 92, 99], 'numpy')
+        self.assertIsInstance(p.store, SortedArrayStore)
+        self.assertEqual(p.ratio(13, 10), [14, 15, 16, 82, 87, 91, 92])
+        p.add_point(2.5)
+        self.assertEqual(p.store.typecode, 'd')
+        self.assertEqual(p.quantile(0), 2.5)
+        p = Percentiles.from_points(["b", "a"], 'numpy')
+        self.assertIsInstance(p.store, AVLTree)
+        self.assertEqual(p.ratio(0, 0), ["a", "b"])
+
+    @timeout()
+    @number("2.24")
+    def test_widened_int_keys(self):
+        store = SortedArrayStore.from_items([(3, 3), (1.5, 1.5), (2, 2)])
+        store[1] = 1
+        store[2.0] = 2.0
+        self.assertEqual([type(key) for key in store.ratio(0, 0)], [int, float, int, float, int])
+        self.assertIs(type(store.select(1)), int)
+        self.assertEqual([type(key) for key in store], [int, float, int, int])
+        self.assertEqual([(type(key), count) for key, _, count in store.iter_counts()],
+                         [(int, 1), (float, 1), (int, 2), (int, 1)])
+        store.delete_many([1, 2])
+        del store[3]
+        self.assertEqual([type(key) for key in store.ratio(0, 0)], [float, float])
+        plain = SortedArrayStore.from_counts([(0.5, 0.5, 2)])
+        plain[1.5] = 1.5
+        self.assertIsNone(plain.int_keys)
+        self.assertEqual(plain.ratio(0, 0), [0.5, 0.5, 1.5])
+
+    @timeout()
+    @number("2.27")
+    def test_keys_out_of_range(self):
+        store = SortedArrayStore.from_items([(1, 1), (5, 5)], typecode='q')
+        tree = AVLTree.from_items([(1, 1), (5, 5)])
+        for key in [2 ** 70, -2 ** 70]:
+            self.assertEqual(store.count_less(key), tree.count_less(key))
+            self.assertNotIn(key, store)
+            with self.assertRaises(ValueError):
+                store.delete_many([1, key])
+            with self.assertRaises(ValueError):
+                del store[key]
+        self.assertEqual(list(store), [1, 5])
+
+        store = SortedArrayStore.from_items([(1.0, 1.0), (2 ** 53, 2 ** 53)])
+        self.assertEqual(store.count_less(2 ** 53 + 1), 2)
+        self.assertEqual(store.count_less(2 ** 60, inclusive=True), 2)
+        self.assertEqual(store.count_less(-2 ** 1100), 0)
+        self.assertEqual(store.count_between(2 ** 53 + 1, 2 ** 1100), 0)
+        self.assertNotIn(2 ** 53 + 1, store)
+        with self.assertRaises(ValueError):
+            del store[2 ** 53 + 1]
+        with self.assertRaises(ValueError):
+            store.delete_many([float('nan')])
+        self.assertEqual(list(store), [1.0, 2 ** 53])
+
+
+class FallbackTest(unittest.TestCase):
+
+    @timeout()
+    @number("2.16")
+    def test_without_numpy(self):
+        with mock.patch.object(sorted_array, 'np', None):
+            self.assertFalse(SortedArrayStore.available())
+            p = Percentiles.from_points([3, 1, 2], 'numpy')
+            self.assertIsInstance(p.store, AVLTree)
+            p.add_point(4)
+            self.assertEqual(p.ratio(0, 0), [1, 2, 3, 4])
+            with self.assertRaises(ImportError):
+                SortedArrayStore()
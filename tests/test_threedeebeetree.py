@@ -1,8 +1,9 @@
+import random
 import unittest
 from ed_utils.decorators import number, visibility
 from ed_utils.timeout import timeout
 
-from threedeebeetree import ThreeDeeBeeTree
+from threedeebeetree import METRICS, MaxBeeTree, ThreeDeeBeeTree, box_contains, box_overlaps, distance_squared, in_box
 
 class TestThreeDeeBeeTree(unittest.TestCase):
 
@@ -64,3 +65,151 @@ class TestThreeDeeBeeTree(unittest.TestCase):
         
         self.assertEqual(tdbt.get_tree_node_by_key((16, 0, -14)).item, 7)
         self.assertEqual(tdbt.get_tree_node_by_key((6, -1, -17)).item, 0)
+
+    @timeout()
+    @number("3.4")
+    def test_sparse_children(self):
+        tdbt = ThreeDeeBeeTree()
+        for i, point in enumerate(self.TESTING_POINTS):
+            tdbt[point] = i
+
+        root = tdbt.root
+        self.assertFalse(hasattr(root, "__dict__"))
+        self.assertEqual(len(root.children), 8)
+        present = [child for child in root.children if child is not None]
+        self.assertEqual(present, root.non_empty_children())
+        self.assertEqual(sum(child.subtree_size for child in present) + 1, root.subtree_size)
+        for index, child in enumerate(root.children):
+            self.assertIs(root.get_child(index), child)
+        self.assertIsInstance(root.children, tuple)
+
+        # changing the returned children leaves the node intact
+        root.non_empty_children().clear()
+        self.assertEqual(root.non_empty_children(), present)
+        self.assertEqual(tdbt.get_tree_node_by_key((4, 6, 19)).item, 9)
+
+        leaf = tdbt.get_tree_node_by_key((4, 6, 19))
+        self.assertTrue(tdbt.is_leaf(leaf))
+        self.assertFalse(tdbt.is_leaf(root))
+        self.assertEqual(leaf.children, (None,) * 8)
+
+    @timeout()
+    @number("3.5")
+    def test_best_in_region(self):
+        random.seed(1023)
+        values = {}
+        tdbt = MaxBeeTree(key=lambda point: values[point])
+        while len(values) < 2000:
+            point = tuple(random.randrange(-100, 100) for _ in range(3))
+            if point not in values:
+                values[point] = random.randrange(10 ** 6)
+                tdbt[point] = point
+        self.assertEqual(tdbt.best(), max(values, key=values.get))
+
+        for _ in range(50):
+            lo = tuple(random.randrange(-110, 90) for _ in range(3))
+            hi = tuple(axis + random.randrange(0, 60) for axis in lo)
+            inside = [point for point in values if in_box(point, lo, hi)]
+            self.assertEqual(tdbt.best_in_box(lo, hi), max(inside, key=values.get) if inside else None)
+
+            centre = tuple(random.randrange(-100, 100) for _ in range(3))
+            radius = random.randrange(0, 50)
+            near = [point for point in values if distance_squared(point, centre) <= radius ** 2]
+            self.assertEqual(tdbt.best_within(centre, radius), max(near, key=values.get) if near else None)
+
+        # a change of key is pushed up to every subtree containing the node
+        point = random.choice(list(values))
+        values[point] = 10 ** 7
+        tdbt.update(point)
+        self.assertEqual(tdbt.best(), point)
+        self.assertEqual(tdbt.best_within(point, 0), point)
+        with self.assertRaises(KeyError):
+            tdbt.update((1000, 1000, 1000))
+
+        # a small box only visits a small part of the tree
+        visited = []
+        tdbt.best_matching(lambda p: visited.append(p) or in_box(p, (0, 0, 0), (10, 10, 10)),
+                           lambda bounds: box_overlaps(bounds, (0, 0, 0), (10, 10, 10)))
+        self.assertLess(len(visited), len(values) // 4)
+
+    @timeout()
+    @number("3.6")
+    def test_range_queries(self):
+        random.seed(1024)
+        tdbt = ThreeDeeBeeTree()
+        points = set()
+        while len(points) < 2000:
+            point = tuple(random.randrange(-100, 100) for _ in range(3))
+            if point not in points:
+                points.add(point)
+                tdbt[point] = -point[0]
+        self.assertEqual(list(ThreeDeeBeeTree().iter_box((0, 0, 0), (1, 1, 1))), [])
+        self.assertEqual(ThreeDeeBeeTree().count_within((0, 0, 0), 5), 0)
+
+        for _ in range(50):
+            lo = tuple(random.randrange(-110, 90) for _ in range(3))
+            hi = tuple(axis + random.randrange(0, 120) for axis in lo)
+            inside = {point for point in points if in_box(point, lo, hi)}
+            found = list(tdbt.iter_box(lo, hi))
+            self.assertEqual({key for key, _ in found}, inside)
+            self.assertEqual(len(found), len(inside))
+            self.assertTrue(all(item == -key[0] for key, item in found))
+            self.assertEqual(tdbt.count_in_box(lo, hi), len(inside))
+
+            centre = tuple(random.randrange(-100, 100) for _ in range(3))
+            radius = random.randrange(0, 120)
+            near = {point for point in points if distance_squared(point, centre) <= radius ** 2}
+            self.assertEqual({key for key, _ in tdbt.iter_within(centre, radius)}, near)
+            self.assertEqual(tdbt.count_within(centre, radius), len(near))
+
+        # the generator is lazy: taking one result does not walk the tree
+        visited = []
+        results = tdbt.iter_matching(lambda p: visited.append(p) or True, lambda bounds: True)
+        next(results)
+        self.assertEqual(len(visited), 1)
+
+        # a box covering most of the space counts whole subtrees without visiting them
+        visited = []
+        lo, hi = (-90, -90, -90), (1000, 1000, 1000)
+        count = tdbt.count_matching(lambda p: visited.append(p) or in_box(p, lo, hi),
+                                    lambda bounds: box_overlaps(bounds, lo, hi),
+                                    lambda bounds: box_contains(bounds, lo, hi))
+        self.assertEqual(count, sum(in_box(point, lo, hi) for point in points))
+        self.assertLess(len(visited), len(points) // 4)
+
+    @timeout()
+    @number("3.7")
+    def test_nearest(self):
+        random.seed(1025)
+        tdbt = ThreeDeeBeeTree()
+        points = set()
+        while len(points) < 2000:
+            point = tuple(random.randrange(-100, 100) for _ in range(3))
+            if point not in points:
+                points.add(point)
+                tdbt[point] = -point[0]
+        self.assertEqual(ThreeDeeBeeTree().nearest((0, 0, 0), 3), [])
+        self.assertEqual(tdbt.nearest((0, 0, 0), 0), [])
+
+        for metric in METRICS:
+            distance = METRICS[metric][0]
+            for _ in range(50):
+                query = tuple(random.randrange(-120, 120) for _ in range(3))
+                k = random.randrange(1, 20)
+                found = tdbt.nearest(query, k, metric)
+                self.assertTrue(all(item == -key[0] for key, item in found))
+                self.assertEqual([distance(key, query) for key, _ in found],
+                                 sorted(distance(point, query) for point in points)[:k])
+
+        # an exact hit is its own nearest neighbour, and k beyond the size returns everything
+        point = random.choice(list(points))
+        self.assertEqual(tdbt.nearest(point), [(point, -point[0])])
+        self.assertEqual(len(tdbt.nearest(point, 5000, 'manhattan')), len(points))
+        # the bounded heap is sized by the tree, not by k
+        single = ThreeDeeBeeTree()
+        single[point] = 'only'
+        self.assertEqual(single.nearest((0, 0, 0), 10 ** 9), [(point, 'only')])
+        with self.assertRaises(ValueError):
+            tdbt.nearest(point, -1)
+        with self.assertRaises(ValueError):
+            tdbt.nearest(point, 1, 'chebyshev')
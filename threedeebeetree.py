@@ -1,26 +1,205 @@
 from __future__ import annotations
-from typing import Generic, TypeVar, Tuple
+from typing import Callable, Generic, Iterator, TypeVar, Tuple
 from dataclasses import dataclass, field
+from math import inf
+import heapq
+
+from heap import MaxHeap
 
 I = TypeVar('I')
 Point = Tuple[int, int, int]
+# Half-open box [lo, hi) per axis holding every point of a subtree
+Bounds = Tuple[Tuple[float, float, float], Tuple[float, float, float]]
+
+
+# Shared, read-only children of a node without any child
+EMPTY_CHILDREN = (None,) * 8
+
+# The whole space, the bounds of the root
+UNBOUNDED: Bounds = ((-inf, -inf, -inf), (inf, inf, inf))
+
+
+def child_bounds(key: Point, index: int, bounds: Bounds) -> Bounds:
+    """
+    Bounds of the child in octant index of a node with the given key and bounds.
+    A point goes in the 'l' half of an axis when it is below the key there,
+    and in the 'g' half (which includes the key) otherwise.
+
+    - Args:
+        - Point: key of the parent
+        - int: octant index as returned by BeeNode.compare
+        - Bounds: bounds of the parent
+    - Returns:
+        - Bounds: the half-open box of the child
+    - Raises:
+        -None
+    - Complexity:
+        O(1)
+    """
+    lo, hi = list(bounds[0]), list(bounds[1])
+    for axis in range(3):
+        if index >> (2 - axis) & 1:  # l
+            hi[axis] = key[axis]
+        else:  # g
+            lo[axis] = key[axis]
+    return tuple(lo), tuple(hi)
+
+
+def box_overlaps(bounds: Bounds, lo: Point, hi: Point) -> bool:
+    """ Whether the half-open bounds meet the closed box [lo, hi]. O(1) """
+
+    return all(bounds[0][axis] <= hi[axis] and lo[axis] < bounds[1][axis] for axis in range(3))
+
+
+def box_contains(bounds: Bounds, lo: Point, hi: Point) -> bool:
+    """ Whether the half-open bounds lie wholly inside the closed box [lo, hi]. O(1) """
+
+    return all(lo[axis] <= bounds[0][axis] and bounds[1][axis] <= hi[axis] for axis in range(3))
+
+
+def in_box(point: Point, lo: Point, hi: Point) -> bool:
+    """ Whether point lies in the closed box [lo, hi]. O(1) """
+
+    return all(lo[axis] <= point[axis] <= hi[axis] for axis in range(3))
+
+
+def distance_squared(point: Point, other: Point) -> float:
+    """ Squared Euclidean distance between two points. O(1) """
+
+    return sum((point[axis] - other[axis]) ** 2 for axis in range(3))
+
+
+def bounds_distance_squared(bounds: Bounds, point: Point) -> float:
+    """ Squared Euclidean distance from point to the nearest point of bounds. O(1) """
+
+    total = 0
+    for axis in range(3):
+        if point[axis] < bounds[0][axis]:
+            total += (bounds[0][axis] - point[axis]) ** 2
+        elif point[axis] > bounds[1][axis]:
+            total += (point[axis] - bounds[1][axis]) ** 2
+    return total
+
 
+def manhattan_distance(point: Point, other: Point) -> float:
+    """ Manhattan (L1) distance between two points. O(1) """
 
-@dataclass
+    return sum(abs(point[axis] - other[axis]) for axis in range(3))
+
+
+def bounds_manhattan_distance(bounds: Bounds, point: Point) -> float:
+    """ Manhattan distance from point to the nearest point of bounds. O(1) """
+
+    total = 0
+    for axis in range(3):
+        if point[axis] < bounds[0][axis]:
+            total += bounds[0][axis] - point[axis]
+        elif point[axis] > bounds[1][axis]:
+            total += point[axis] - bounds[1][axis]
+    return total
+
+
+# metric name -> (distance between points, lower bound on the distance from a point to bounds)
+METRICS = {
+    'euclidean': (distance_squared, bounds_distance_squared),
+    'manhattan': (manhattan_distance, bounds_manhattan_distance),
+}
+
+
+def bounds_max_distance_squared(bounds: Bounds, point: Point) -> float:
+    """ Squared Euclidean distance from point to the farthest corner of bounds. O(1) """
+
+    return sum(max(point[axis] - bounds[0][axis], bounds[1][axis] - point[axis]) ** 2 for axis in range(3))
+
+
+@dataclass(slots=True)
 class BeeNode:
     key: Point
     item: I
     subtree_size: int = 1
+    # Bit i of _mask is set when octant i has a child, and _packed holds only
+    # those children in octant order, so leaves allocate no child store at all.
+    _mask: int = field(default=0, repr=False, compare=False)
+    _packed: list | None = field(default=None, repr=False, compare=False)
 
     def __init__(self, key, item):
         self.key = key
         self.item = item
-        # Order: ggg, ggl, glg, gll, lgg, lgl, llg, lll
-        self.children = [None] * 8
+        self.subtree_size = 1
+        self._mask = 0
+        self._packed = None
+
+    @property
+    def children(self) -> tuple[BeeNode | None, ...]:
+        """
+        Read-only snapshot of the 8 octant children, None where empty.
+        Order: ggg, ggl, glg, gll, lgg, lgl, llg, lll
+
+        - Complexity:
+            O(1) we know it has maximum of 8 children
+        """
+        if self._packed is None:
+            return EMPTY_CHILDREN
+        return tuple(self.get_child(index) for index in range(8))
+
+    def non_empty_children(self) -> list[BeeNode]:
+        """
+        Returns a copy of only the children that exist, in octant order, so
+        changing it cannot desynchronise the node's packed children from its mask.
+
+        - Complexity:
+            O(1) we know it has maximum of 8 children
+        """
+        if self._packed is None:
+            return []
+        return list(self._packed)
+
+    def get_child(self, index: int) -> BeeNode | None:
+        """
+        Returns the child in octant index, or None if that octant is empty.
+
+        - Args:
+            - int: octant index as returned by compare
+        - Returns:
+            - BeeNode | None: the child in that octant
+        - Raises:
+            -None
+        - Complexity:
+            O(1)
+        """
+        bit = 1 << index
+        if not self._mask & bit:
+            return None
+        return self._packed[(self._mask & (bit - 1)).bit_count()]
+
+    def set_child(self, index: int, child: BeeNode) -> None:
+        """
+        Stores child in octant index, allocating a slot only for a new octant.
+
+        - Args:
+            - int: octant index as returned by compare
+            - BeeNode: the non-empty child to be stored
+        - Returns:
+            - None
+        - Raises:
+            -None
+        - Complexity:
+            O(1) we know it has maximum of 8 children
+        """
+        bit = 1 << index
+        position = (self._mask & (bit - 1)).bit_count()
+        if self._mask & bit:
+            self._packed[position] = child
+        elif self._packed is None:
+            self._mask = bit
+            self._packed = [child]
+        else:
+            self._mask |= bit
+            self._packed.insert(position, child)
 
     def get_child_for_key(self, point: Point) -> BeeNode | None:
         index = self.compare(point)
-        return self.children[index]
+        return self.get_child(index)
 
     def compare(self, point2: Point) -> int:
         """
@@ -39,6 +218,22 @@ class BeeNode:
         # l__, _l_, __l
         return (int(self.key[0] > point2[0]) << 2) + (int(self.key[1] > point2[1]) << 1) + (int(self.key[2] > point2[2]) << 0)
 
+
+@dataclass(slots=True)
+class MaxBeeNode(BeeNode):
+    """ BeeNode that also tracks the node with the largest key(item) in its subtree. """
+
+    own_key: object = field(default=None, repr=False, compare=False)
+    best: MaxBeeNode | None = field(default=None, repr=False, compare=False)
+    best_key: object = field(default=None, repr=False, compare=False)
+
+    def __init__(self, key, item, own_key):
+        BeeNode.__init__(self, key, item)
+        self.own_key = own_key
+        self.best = self
+        self.best_key = own_key
+
+
 class ThreeDeeBeeTree(Generic[I]):
     """ 3️⃣🇩🐝🌳 tree. """
 
@@ -94,7 +289,7 @@ class ThreeDeeBeeTree(Generic[I]):
         while current:
             if current.key == key:
                 return current
-            current = current.children[current.compare(key)]
+            current = current.get_child(current.compare(key))
         raise KeyError('Key not found!')
 
     def __setitem__(self, key: Point, item: I) -> None:
@@ -117,16 +312,60 @@ class ThreeDeeBeeTree(Generic[I]):
         """
         if not current:
             self.length += 1
-            return BeeNode(key, item)
+            return self.new_node(key, item)
         elif current.key == key:
-            current.item = item
+            self.store_item(current, item)
+            self.refresh(current)
             return current
         else:
             index = current.compare(key)
-            current.children[index] = self.insert_aux(current.children[index], key, item)
-            current.subtree_size = sum([child.subtree_size for child in current.children if child]) + 1  # O(1): always loop 8 times
+            current.set_child(index, self.insert_aux(current.get_child(index), key, item))
+            self.refresh(current)
             return current
 
+    def new_node(self, key: Point, item: I) -> BeeNode:
+        """
+            Creates a detached node for key and item.
+            :complexity: O(1)
+        """
+        return BeeNode(key, item)
+
+    def store_item(self, current: BeeNode, item: I) -> None:
+        """
+            Replaces the item of an existing node.
+            :complexity: O(1)
+        """
+        current.item = item
+
+    def refresh(self, current: BeeNode) -> None:
+        """
+            Recomputes what current summarises about its subtree from its children.
+            :complexity: O(1) we know it has maximum of 8 children
+        """
+        current.subtree_size = sum([child.subtree_size for child in current.non_empty_children()]) + 1
+
+    def path_to(self, key: Point) -> list[BeeNode]:
+        """
+        Returns the nodes from the root down to the node holding key.
+
+        - Args:
+            - Point: key to search
+        - Returns:
+            - list[BeeNode]: the path, ending with the node holding key
+        - Raises:
+            -KeyError: when key is not found in the tree
+        - Complexity:
+            O(D) where D is the maximum depth of root
+        """
+        path = []
+        current = self.root
+        while current:
+            path.append(current)
+            if current.key == key:
+                return path
+            current = current.get_child(current.compare(key))
+        raise KeyError('Key not found!')
+
     def is_leaf(self, current: BeeNode) -> bool:
         """
         Simple check whether or not the node is a leaf.
@@ -140,10 +379,285 @@ class ThreeDeeBeeTree(Generic[I]):
         - Complexity:
             O(1) we know it has maximum of 8 children
         """
-        for child in current.children:
-            if not child:
-                return False
-        return True
+        return not current.non_empty_children()
+
+    def iter_matching(self, point_test: Callable[[Point], bool],
+                      bounds_test: Callable[[Bounds], bool]) -> Iterator[tuple[Point, I]]:
+        """
+        Lazily yields every (key, item) whose key passes point_test, in depth-first order.
+
+        - Args:
+            - Callable: whether a point is in the region
+            - Callable: whether some point of a half-open box may be in the region;
+              it may err on the side of True
+        - Returns:
+            - Iterator: the matching (key, item) pairs
+        - Raises:
+            -None
+        - Complexity:
+            O(V) where V is the number of nodes whose octant meets the region
+        """
+        stack = [(self.root, UNBOUNDED)] if self.root else []
+        while stack:
+            current, bounds = stack.pop()
+            if point_test(current.key):
+                yield current.key, current.item
+            for index in range(7, -1, -1):
+                child = current.get_child(index)
+                if child is not None:
+                    child_box = child_bounds(current.key, index, bounds)
+                    if bounds_test(child_box):
+                        stack.append((child, child_box))
+
+    def count_matching(self, point_test: Callable[[Point], bool], bounds_test: Callable[[Bounds], bool],
+                       bounds_inside: Callable[[Bounds], bool]) -> int:
+        """
+        Counts the keys passing point_test, using subtree_size for every child
+        whose octant lies wholly inside the region instead of visiting it.
+
+        - Args:
+            - Callable: whether a point is in the region
+            - Callable: whether some point of a half-open box may be in the region
+            - Callable: whether every point of a half-open box is in the region;
+              it may err on the side of False
+        - Returns:
+            - int: the number of matching keys
+        - Raises:
+            -None
+        - Complexity:
+            O(V) where V is the number of nodes whose octant meets the boundary of the region
+        """
+        total = 0
+        stack = [(self.root, UNBOUNDED)] if self.root else []
+        while stack:
+            current, bounds = stack.pop()
+            if point_test(current.key):
+                total += 1
+            for index in range(8):
+                child = current.get_child(index)
+                if child is not None:
+                    child_box = child_bounds(current.key, index, bounds)
+                    if bounds_inside(child_box):
+                        total += child.subtree_size
+                    elif bounds_test(child_box):
+                        stack.append((child, child_box))
+        return total
+
+    def iter_box(self, lo: Point, hi: Point) -> Iterator[tuple[Point, I]]:
+        """
+            Lazily yields every (key, item) with lo <= key <= hi on every axis.
+            :complexity: see iter_matching
+        """
+        return self.iter_matching(lambda point: in_box(point, lo, hi),
+                                  lambda bounds: box_overlaps(bounds, lo, hi))
+
+    def count_in_box(self, lo: Point, hi: Point) -> int:
+        """
+            Counts the keys with lo <= key <= hi on every axis.
+            :complexity: see count_matching
+        """
+        return self.count_matching(lambda point: in_box(point, lo, hi),
+                                   lambda bounds: box_overlaps(bounds, lo, hi),
+                                   lambda bounds: box_contains(bounds, lo, hi))
+
+    def iter_within(self, centre: Point, radius: float) -> Iterator[tuple[Point, I]]:
+        """
+            Lazily yields every (key, item) at most radius away from centre.
+            :complexity: see iter_matching
+        """
+        limit = radius * radius
+        return self.iter_matching(lambda point: distance_squared(point, centre) <= limit,
+                                  lambda bounds: bounds_distance_squared(bounds, centre) <= limit)
+
+    def count_within(self, centre: Point, radius: float) -> int:
+        """
+            Counts the keys at most radius away from centre.
+            :complexity: see count_matching
+        """
+        limit = radius * radius
+        return self.count_matching(lambda point: distance_squared(point, centre) <= limit,
+                                   lambda bounds: bounds_distance_squared(bounds, centre) <= limit,
+                                   lambda bounds: bounds_max_distance_squared(bounds, centre) <= limit)
+
+    def nearest(self, point: Point, k: int = 1, metric: str = 'euclidean') -> list[tuple[Point, I]]:
+        """
+        Finds the k keys closest to point by a best-first search: octants are
+        visited nearest first, and the search stops once the nearest unvisited
+        octant is no closer than the kth closest key found so far.
+
+        - Args:
+            - Point: the query point, which need not be a key
+            - int: how many keys to return
+            - str: 'euclidean' (compared as squared distance) or 'manhattan'
+        - Returns:
+            - list: up to k (key, item) pairs, closest first; ties are broken arbitrarily
+        - Raises:
+            - ValueError: when k is negative or the metric is unknown
+        - Complexity:
+            O(V log V) where V is the number of nodes whose octant is closer than the kth closest key
+        """
+        if k < 0:
+            raise ValueError('k must not be negative')
+        if metric not in METRICS:
+            raise ValueError('Unknown metric: {0}'.format(metric))
+        distance, bounds_distance = METRICS[metric]
+        k = min(k, len(self))
+        if k == 0:
+            return []
+
+        # the k closest so far as (distance, key, item), the farthest of them on top
+        closest = MaxHeap(k, key=lambda entry: entry[0])
+        # unvisited nodes as (distance to their octant, tiebreak, node, octant)
+        frontier = [(0, 0, self.root, UNBOUNDED)]
+        pushed = 1
+        while frontier:
+            reach, _, current, bounds = heapq.heappop(frontier)
+            if len(closest) == k and reach >= closest.peek_max_key():
+                break
+            gap = distance(current.key, point)
+            if len(closest) < k:
+                closest.add((gap, current.key, current.item))
+            elif gap < closest.peek_max_key():
+                closest.get_max()
+                closest.add((gap, current.key, current.item))
+            for index in range(8):
+                child = current.get_child(index)
+                if child is not None:
+                    child_box = child_bounds(current.key, index, bounds)
+                    child_reach = bounds_distance(child_box, point)
+                    if len(closest) < k or child_reach < closest.peek_max_key():
+                        heapq.heappush(frontier, (child_reach, pushed, child, child_box))
+                        pushed += 1
+
+        result = []
+        while len(closest) > 0:
+            _, key, item = closest.get_max()
+            result.append((key, item))
+        result.reverse()
+        return result
+
+
+class MaxBeeTree(ThreeDeeBeeTree[I]):
+    """
+    3DBT where every node knows the item with the largest key(item) in its
+    subtree, so the best item in a region can be found by pruning every
+    subtree that lies outside the region or cannot beat the best found so far.
+    """
+
+    def __init__(self, key: Callable[[I], object]) -> None:
+        """
+            Initialises an empty tree ordering items by key(item).
+        """
+        super().__init__()
+        self.key = key
+
+    def new_node(self, key: Point, item: I) -> MaxBeeNode:
+        """
+            Creates a detached node for key and item, computing key(item) once.
+            :complexity: O(1)
+        """
+        return MaxBeeNode(key, item, self.key(item))
+
+    def store_item(self, current: MaxBeeNode, item: I) -> None:
+        """
+            Replaces the item of an existing node and recomputes its key.
+            :complexity: O(1)
+        """
+        current.item = item
+        current.own_key = self.key(item)
+
+    def refresh(self, current: MaxBeeNode) -> None:
+        """
+            Recomputes the subtree size and best node of current from its children.
+            :complexity: O(1) we know it has maximum of 8 children
+        """
+        super().refresh(current)
+        best, best_key = current, current.own_key
+        for child in current.non_empty_children():
+            if child.best_key > best_key:
+                best, best_key = child.best, child.best_key
+        current.best = best
+        current.best_key = best_key
+
+    def update(self, key: Point) -> None:
+        """
+        Recomputes key(item) for the node at key after its item changed, and the
+        best node of every subtree containing it.
+
+        - Args:
+            - Point: key of the changed node
+        - Returns:
+            - None
+        - Raises:
+            -KeyError: when key is not found in the tree
+        - Complexity:
+            O(D) where D is the maximum depth of root
+        """
+        path = self.path_to(key)
+        path[-1].own_key = self.key(path[-1].item)
+        for node in reversed(path):
+            self.refresh(node)
+
+    def best(self) -> I | None:
+        """
+            Returns the item with the largest key, or None when the tree is empty.
+            :complexity: O(1)
+        """
+        return self.root.best.item if self.root else None
+
+    def best_matching(self, point_test: Callable[[Point], bool],
+                      bounds_test: Callable[[Bounds], bool]) -> I | None:
+        """
+        Branch and bound search for the item with the largest key whose point passes point_test.
+
+        - Args:
+            - Callable: whether a point is in the region
+            - Callable: whether some point of a half-open box may be in the region;
+              it may err on the side of True
+        - Returns:
+            - I | None: the best item in the region, or None when there is none
+        - Raises:
+            -None
+        - Complexity:
+            O(n) in the worst case, but subtrees outside the region or whose best
+            key is no better than the best found so far are skipped whole
+        """
+        found, found_key = None, None
+        stack = [(self.root, UNBOUNDED)] if self.root else []
+        while stack:
+            current, bounds = stack.pop()
+            if found is not None and current.best_key <= found_key:
+                continue
+            if (found is None or current.own_key > found_key) and point_test(current.key):
+                found, found_key = current, current.own_key
+            children = []
+            for index in range(8):
+                child = current.get_child(index)
+                if child is not None and (found is None or child.best_key > found_key):
+                    child_box = child_bounds(current.key, index, bounds)
+                    if bounds_test(child_box):
+                        children.append((child, child_box))
+            # most promising subtree last, so it is searched first
+            children.sort(key=lambda entry: entry[0].best_key)
+            stack.extend(children)
+        return found.item if found is not None else None
+
+    def best_in_box(self, lo: Point, hi: Point) -> I | None:
+        """
+            Returns the item with the largest key in the closed box [lo, hi], or None.
+            :complexity: see best_matching
+        """
+        return self.best_matching(lambda point: in_box(point, lo, hi),
+                                  lambda bounds: box_overlaps(bounds, lo, hi))
+
+    def best_within(self, centre: Point, radius: float) -> I | None:
+        """
+            Returns the item with the largest key at most radius away from centre, or None.
+            :complexity: see best_matching
+        """
+        limit = radius * radius
+        return self.best_matching(lambda point: distance_squared(point, centre) <= limit,
+                                  lambda bounds: bounds_distance_squared(bounds, centre) <= limit)
 
 
 if __name__ == "__main__":